@@ -0,0 +1,665 @@
+"""
+Backends for mkdir command
+
+Backend gets the final command (list of strings - the same list that would
+be passed to a subprocess) and returns (exit_code, stdout, stderr):
+* SubprocessBackend - runs the real mkdir binary (default)
+* SpawnBackend - runs the real mkdir binary by posix_spawn with minimal
+  Python side overhead (used by worker pool - see helper.pool), it also
+  provides resources used by mkdir process (execute_with_usage)
+* SyscallBackend - executes the same command directly by os.mkdir/os.chmod,
+  it is much faster as there is no fork/exec for every call
+* DifferentialBackend - runs two backends and reports divergences
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import codecs
+import errno
+import functools
+import locale
+import os
+import select
+import stat
+import subprocess
+import time
+
+from helper import trace
+from helper.mode import adjust_mode, compile_mode, directory_mode, \
+    get_umask
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+DIRECTORY_PATH_FLAGS = os.O_PATH | os.O_DIRECTORY
+
+
+class SubprocessBackend(object):
+    """
+    Backend that runs mkdir binary in a subprocess
+    """
+    def execute(self, command):
+        call = trace.current()
+        if call is not None:
+            return self.execute_traced(command, call)
+        proc = subprocess.run(command,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE)
+
+        exit_code = proc.returncode
+        try:
+            stdout = proc.stdout.decode()
+            stderr = proc.stderr.decode()
+            return (exit_code, stdout, stderr)
+        except Exception as e:
+            return (1, "", str(e))
+
+    def execute_traced(self, command, call):
+        """
+        The same as execute, phases are recorded to call (trace.CallRecord)
+        drain is not known - pipes are read by communicate() until exit
+        """
+        start_time = time.perf_counter_ns()
+        with subprocess.Popen(command, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE) as proc:
+            spawned_time = time.perf_counter_ns()
+            (stdout, stderr) = proc.communicate()
+        exit_time = time.perf_counter_ns()
+        call.spawn_ns = spawned_time - start_time
+        call.run_ns = exit_time - spawned_time
+        try:
+            return (proc.returncode, stdout.decode(), stderr.decode())
+        except Exception as e:
+            return (1, "", str(e))
+        finally:
+            call.decode_ns = time.perf_counter_ns() - exit_time
+
+
+class ResourceUsage(object):
+    """
+    Resources used by one mkdir process (from wait4)
+
+    user_time, system_time - CPU time in seconds
+    max_rss - maximal resident set size in kB, kernel counts also memory
+              of the process the child was spawned from (before exec),
+              so it is not lower than RSS of this Python process
+    minor_faults, major_faults - page faults
+    voluntary_switches, involuntary_switches - context switches
+    memory_touched - bytes of pages touched by mkdir (page faults)
+    """
+    def __init__(self, rusage):
+        self.user_time = rusage.ru_utime
+        self.system_time = rusage.ru_stime
+        self.max_rss = rusage.ru_maxrss
+        self.minor_faults = rusage.ru_minflt
+        self.major_faults = rusage.ru_majflt
+        self.voluntary_switches = rusage.ru_nvcsw
+        self.involuntary_switches = rusage.ru_nivcsw
+
+    @property
+    def cpu_time(self):
+        return self.user_time + self.system_time
+
+    @property
+    def memory_touched(self):
+        return (self.minor_faults + self.major_faults) * PAGE_SIZE
+
+    def __repr__(self):
+        return "cpu %.3f ms (user %.3f, sys %.3f), max RSS %d kB, " \
+            "faults %d/%d, switches %d/%d" % (
+                self.cpu_time * 1e3, self.user_time * 1e3,
+                self.system_time * 1e3, self.max_rss, self.minor_faults,
+                self.major_faults, self.voluntary_switches,
+                self.involuntary_switches)
+
+
+class SpawnBackend(object):
+    """
+    Backend that runs mkdir binary by os.posix_spawnp
+
+    Output pipes are drained directly by os.read, there is no Popen object
+    and no communicate() machinery for every call. Child is reaped by
+    os.wait4, so resources used by the child are known exactly.
+    """
+    READ_SIZE = 65536
+
+    def execute(self, command):
+        return self.execute_with_usage(command)[:3]
+
+    def execute_with_usage(self, command):
+        """
+        Execute command and return (exit_code, stdout, stderr, usage),
+        usage is ResourceUsage of mkdir process (None if not started)
+        """
+        if not hasattr(os, "posix_spawnp"):
+            return SubprocessBackend().execute(command) + (None,)
+
+        call = trace.current()
+        if call is not None:
+            start_time = time.perf_counter_ns()
+        try:
+            (pid, stdout_read, stderr_read) = spawn(command)
+        except OSError as e:
+            return (1, "", str(e), None)
+        if call is not None:
+            spawned_time = time.perf_counter_ns()
+
+        output = {stdout_read: [], stderr_read: []}
+        opened = [stdout_read, stderr_read]
+        while opened:
+            (readable, _, _) = select.select(opened, [], [])
+            for fd in readable:
+                data = os.read(fd, self.READ_SIZE)
+                if data:
+                    output[fd].append(data)
+                else:
+                    opened.remove(fd)
+                    os.close(fd)
+        if call is not None:
+            drained_time = time.perf_counter_ns()
+        (_, status, rusage) = os.wait4(pid, 0)
+        if call is not None:
+            exit_time = time.perf_counter_ns()
+            call.spawn_ns = spawned_time - start_time
+            call.drain_ns = drained_time - spawned_time
+            call.run_ns = exit_time - spawned_time
+
+        exit_code = os.waitstatus_to_exitcode(status)
+        usage = ResourceUsage(rusage)
+        try:
+            stdout = b"".join(output[stdout_read]).decode()
+            stderr = b"".join(output[stderr_read]).decode()
+            return (exit_code, stdout, stderr, usage)
+        except Exception as e:
+            return (1, "", str(e), usage)
+        finally:
+            if call is not None:
+                call.decode_ns = time.perf_counter_ns() - exit_time
+
+
+def spawn(command, capture=True):
+    """
+    Start command by os.posix_spawnp
+
+    inputs:
+    command - list of strings
+    capture - when True, stdout and stderr are connected to pipes,
+              otherwise they are redirected to /dev/null
+
+    outputs:
+    pid - process id (to be reaped by os.wait4/os.waitpid)
+    stdout_read, stderr_read - read ends of pipes (None if not captured)
+    """
+    if capture:
+        (stdout_read, stdout_write) = os.pipe()
+        (stderr_read, stderr_write) = os.pipe()
+        file_actions = [(os.POSIX_SPAWN_DUP2, stdout_write, 1),
+                        (os.POSIX_SPAWN_DUP2, stderr_write, 2),
+                        (os.POSIX_SPAWN_CLOSE, stdout_read),
+                        (os.POSIX_SPAWN_CLOSE, stderr_read)]
+    else:
+        stdout_read = stderr_read = None
+        stdout_write = stderr_write = os.open(os.devnull, os.O_WRONLY)
+        file_actions = [(os.POSIX_SPAWN_DUP2, stdout_write, 1),
+                        (os.POSIX_SPAWN_DUP2, stderr_write, 2)]
+    try:
+        pid = os.posix_spawnp(command[0], command, os.environ,
+                              file_actions=file_actions)
+    except OSError:
+        if capture:
+            os.close(stdout_read)
+            os.close(stderr_read)
+        raise
+    finally:
+        os.close(stdout_write)
+        if capture:
+            os.close(stderr_write)
+    return (pid, stdout_read, stderr_read)
+
+
+class ParsedCommand(object):
+    """
+    Result of command line parsing - the same way as getopt_long in mkdir
+    """
+    def __init__(self):
+        self.mode = None
+        self.parents = False
+        self.verbose = False
+        self.context = None
+        self.informational = False
+        self.operands = []
+        self.error = None
+        self.warnings = []
+
+
+class SyscallBackend(object):
+    """
+    Backend that executes mkdir command in this process
+
+    Only --help and --version are passed to the real binary as they
+    do not call any syscall and their text can not be reproduced.
+    """
+    PROGRAM = "mkdir"
+    LONG_OPTIONS = ("mode", "parents", "verbose", "context", "help",
+                    "version")
+    TRY_HELP = "Try 'mkdir --help' for more information.\n"
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback if fallback else SubprocessBackend()
+
+    @classmethod
+    def parse(cls, command):
+        """
+        Parse command to ParsedCommand, options and operands can be mixed
+        (as in GNU getopt)
+        """
+        parsed = ParsedCommand()
+        arguments = command[1:]
+        index = 0
+        while index < len(arguments):
+            argument = arguments[index]
+            index += 1
+            if argument == "--":
+                parsed.operands.extend(arguments[index:])
+                break
+            if argument.startswith("--"):
+                (name, equal, value) = argument[2:].partition("=")
+                matches = [option for option in cls.LONG_OPTIONS
+                           if option.startswith(name)]
+                if name in matches:
+                    matches = [name]
+                if not matches:
+                    parsed.error = "unrecognized option '%s'" % argument
+                    return parsed
+                if len(matches) > 1:
+                    parsed.error = "option '%s' is ambiguous; " \
+                        "possibilities: %s" % (
+                            "--" + name,
+                            " ".join("'--" + m + "'" for m in matches))
+                    return parsed
+                option = matches[0]
+                if option == "mode":
+                    if not equal:
+                        if index >= len(arguments):
+                            parsed.error = "option '--mode' requires an " \
+                                "argument"
+                            return parsed
+                        value = arguments[index]
+                        index += 1
+                    parsed.mode = value
+                elif option == "context":
+                    parsed.context = value if equal else ""
+                    if equal:
+                        parsed.warnings.append(
+                            "warning: ignoring --context; it requires an "
+                            "SELinux/SMACK-enabled kernel")
+                elif equal:
+                    parsed.error = "option '--%s' doesn't allow an " \
+                        "argument" % option
+                    return parsed
+                elif option == "parents":
+                    parsed.parents = True
+                elif option == "verbose":
+                    parsed.verbose = True
+                else:
+                    parsed.informational = True
+                    return parsed
+            elif argument.startswith("-") and argument != "-":
+                position = 1
+                while position < len(argument):
+                    char = argument[position]
+                    position += 1
+                    if char == "m":
+                        value = argument[position:]
+                        if not value:
+                            if index >= len(arguments):
+                                parsed.error = "option requires an " \
+                                    "argument -- 'm'"
+                                return parsed
+                            value = arguments[index]
+                            index += 1
+                        parsed.mode = value
+                        break
+                    elif char == "p":
+                        parsed.parents = True
+                    elif char == "v":
+                        parsed.verbose = True
+                    elif char == "Z":
+                        parsed.context = ""
+                    else:
+                        parsed.error = "invalid option -- '%s'" % char
+                        return parsed
+            else:
+                parsed.operands.append(argument)
+        return parsed
+
+    def execute(self, command):
+        parsed = self.parse(command)
+        if parsed.informational:
+            return self.fallback.execute(command)
+        stdout = []
+        stderr = ["%s: %s\n" % (self.PROGRAM, warning)
+                  for warning in parsed.warnings]
+        if parsed.error:
+            stderr.append("%s: %s\n%s" % (self.PROGRAM, parsed.error,
+                                          self.TRY_HELP))
+            return (1, "", "".join(stderr))
+        if not parsed.operands:
+            stderr.append("%s: missing operand\n%s" % (self.PROGRAM,
+                                                       self.TRY_HELP))
+            return (1, "", "".join(stderr))
+
+        umask = get_umask()
+        mode = None
+        if parsed.mode is not None:
+            changes = compile_mode(parsed.mode)
+            if changes is None:
+                stderr.append("%s: invalid mode %s\n" % (
+                    self.PROGRAM, quote(parsed.mode)))
+                return (1, "", "".join(stderr))
+            (mode, mode_bits) = adjust_mode(stat.S_IRWXU | stat.S_IRWXG |
+                                            stat.S_IRWXO, True, umask,
+                                            changes)
+            mode = directory_mode(mode, mode_bits, umask)
+
+        exit_code = 0
+        for directory in parsed.operands:
+            if not self.make_directory(directory, mode, umask,
+                                       parsed.parents, parsed.verbose,
+                                       stdout, stderr):
+                exit_code = 1
+        return (exit_code, "".join(stdout), "".join(stderr))
+
+    def make_directory(self, directory, mode, umask, parents, verbose,
+                       stdout, stderr):
+        """
+        Create one directory (with parents when required)
+        Messages are appended to stdout/stderr lists
+
+        outputs:
+        True if directory was created (or exists with parents argument)
+        """
+        if not parents:
+            try:
+                os.mkdir(directory, 0o777 if mode is None else mode & 0o777)
+            except OSError as e:
+                stderr.append(self.error_message(directory, e.errno))
+                return False
+            return self.finish_directory(directory, None, None, mode, umask,
+                                         verbose, stdout, stderr)
+
+        # -p walks component by component relative to directory fd (as GNU
+        # mkdir does), so chains longer than PATH_MAX can be created
+        ancestor_mode = 0o777 & ~(umask & ~(stat.S_IWUSR | stat.S_IXUSR))
+        start = 0
+        try:
+            fd = os.open("/" if directory.startswith("/") else ".",
+                         DIRECTORY_PATH_FLAGS)
+        except OSError as e:
+            stderr.append(self.error_message(directory, e.errno))
+            return False
+        try:
+            paths = ancestors(directory)
+            if paths and not directory[len(paths[-1]):].strip("/"):
+                paths.pop()
+            for ancestor in paths:
+                name = ancestor[start:].strip("/")
+                start = len(ancestor)
+                mkdir_error = None
+                try:
+                    os.mkdir(name, 0o777, dir_fd=fd)
+                except FileExistsError:
+                    mkdir_error = errno.EEXIST
+                except OSError as e:
+                    stderr.append(self.error_message(ancestor, e.errno))
+                    return False
+                else:
+                    if ancestor_mode != 0o777 & ~umask:
+                        os.chmod(name, ancestor_mode, dir_fd=fd)
+                    if verbose:
+                        stdout.append(self.verbose_message(ancestor))
+                try:
+                    child_fd = os.open(name, DIRECTORY_PATH_FLAGS, dir_fd=fd)
+                except OSError as e:
+                    # existing non-directory - ENOTDIR, anything else (e.g.
+                    # dangling symlink) - error of mkdir
+                    error = e.errno
+                    if error != errno.ENOTDIR and mkdir_error is not None:
+                        error = mkdir_error
+                    stderr.append(self.error_message(ancestor, error))
+                    return False
+                os.close(fd)
+                fd = child_fd
+
+            name = directory[start:].strip("/") or "."
+            try:
+                os.mkdir(name, 0o777 if mode is None else mode & 0o777,
+                         dir_fd=fd)
+            except OSError as e:
+                if e.errno == errno.EEXIST:
+                    try:
+                        if stat.S_ISDIR(os.stat(name, dir_fd=fd).st_mode):
+                            return True
+                    except OSError:
+                        pass
+                stderr.append(self.error_message(directory, e.errno))
+                return False
+            return self.finish_directory(directory, name, fd, mode, umask,
+                                         verbose, stdout, stderr)
+        finally:
+            os.close(fd)
+
+    def finish_directory(self, directory, name, fd, mode, umask, verbose,
+                         stdout, stderr):
+        """
+        Set special bits of mode (not applied by mkdir syscall) and report
+        created directory (fd None - directory path is used, otherwise name
+        relative to fd)
+
+        outputs:
+        True if mode was set
+        """
+        if mode is not None and mode != mode & 0o777 & ~umask:
+            try:
+                if fd is None:
+                    os.chmod(directory, mode)
+                else:
+                    os.chmod(name, mode, dir_fd=fd)
+            except OSError as e:
+                stderr.append("%s: cannot set permissions of %s: %s\n" % (
+                    self.PROGRAM, quote(directory), os.strerror(e.errno)))
+                return False
+        if verbose:
+            stdout.append(self.verbose_message(directory))
+        return True
+
+    def error_message(self, directory, error):
+        return "%s: cannot create directory %s: %s\n" % (
+            self.PROGRAM, quote(directory), os.strerror(error))
+
+    def verbose_message(self, directory):
+        return "%s: created directory %s\n" % (self.PROGRAM,
+                                               shell_quote(directory))
+
+
+class Divergence(object):
+    """
+    One difference found by DifferentialBackend
+    """
+    def __init__(self, command, field, reference, candidate):
+        self.command = command
+        self.field = field
+        self.reference = reference
+        self.candidate = candidate
+
+    def __repr__(self):
+        return "%s: %s differs - reference: %r, candidate: %r" % (
+            " ".join(self.command), self.field, self.reference,
+            self.candidate)
+
+
+class DifferentialBackend(object):
+    """
+    Backend that runs the same command by candidate and by reference backend
+
+    Candidate runs first, its result (exit code, stdout, stderr and state of
+    all touched directories) is recorded and directories created by it are
+    removed again. Then reference runs and its result is returned.
+    Differences are stored in divergences list, so the backend is STATEFUL
+    (it can not run in pool of workers - see MkDir.pool).
+    """
+    STATEFUL = True
+
+    def __init__(self, reference=None, candidate=None):
+        self.reference = reference if reference else SubprocessBackend()
+        self.candidate = candidate if candidate else SyscallBackend(
+            self.reference)
+        self.divergences = []
+
+    def execute(self, command):
+        paths = []
+        for operand in SyscallBackend.parse(command).operands:
+            paths.extend(ancestors(operand))
+            paths.append(operand)
+        before = snapshot(paths)
+
+        candidate_result = self.candidate.execute(command)
+        candidate_state = snapshot(paths)
+        rollback(paths, before)
+
+        reference_result = self.reference.execute(command)
+        reference_state = snapshot(paths)
+
+        for (field, reference, candidate) in (
+                ("exit code", reference_result[0], candidate_result[0]),
+                ("stdout", reference_result[1], candidate_result[1]),
+                ("stderr", reference_result[2], candidate_result[2]),
+                ("directories", reference_state, candidate_state)):
+            if reference != candidate:
+                self.divergences.append(
+                    Divergence(command, field, reference, candidate))
+        return reference_result
+
+
+def ancestors(directory):
+    """
+    Helper function - list of ancestor paths as written in directory
+    e.g. "a/b/c" -> ["a", "a/b"]
+    """
+    result = []
+    for index in range(1, len(directory)):
+        if directory[index] == "/" and directory[index - 1] != "/":
+            result.append(directory[:index])
+    return result
+
+
+def snapshot(paths):
+    """
+    Helper function - mode of every path (None if path is not a directory)
+    """
+    state = {}
+    for path in paths:
+        try:
+            st_mode = os.lstat(path).st_mode
+        except (OSError, ValueError):
+            st_mode = None
+        state[path] = oct(st_mode) if st_mode and stat.S_ISDIR(st_mode) \
+            else None
+    return state
+
+
+def rollback(paths, before):
+    """
+    Helper function - remove directories that did not exist before
+    """
+    for path in sorted(paths, key=len, reverse=True):
+        if before[path] is not None:
+            continue
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+@functools.lru_cache(maxsize=None)
+def _is_utf8_locale():
+    try:
+        return codecs.lookup(locale.getpreferredencoding(False)).name == \
+            "utf-8"
+    except LookupError:
+        return False
+
+
+def _is_printable(char):
+    if ord(char) < 128 or _is_utf8_locale():
+        return char.isprintable() and not 0xDC80 <= ord(char) <= 0xDCFF
+    return False
+
+
+def _escape(char):
+    names = {"\a": "a", "\b": "b", "\f": "f", "\n": "n", "\r": "r",
+             "\t": "t", "\v": "v"}
+    if char in names:
+        return "\\" + names[char]
+    if 0xDC80 <= ord(char) <= 0xDCFF:
+        data = bytes([ord(char) - 0xDC00])
+    else:
+        data = char.encode("utf-8", "surrogateescape")
+    return "".join("\\%03o" % byte for byte in data)
+
+
+def quote(name):
+    """
+    Quote name the way mkdir quotes names in error messages
+    (locale quoting - UTF-8 locale uses typographic quotes)
+    """
+    utf8 = _is_utf8_locale()
+    if name.isascii() and name.isprintable() and "\\" not in name and \
+            "'" not in name:
+        return ("\u2018" + name + "\u2019") if utf8 else ("'" + name + "'")
+    result = []
+    for char in name:
+        if char == "\\" or (char == "'" and not utf8):
+            result.append("\\" + char)
+        elif _is_printable(char):
+            result.append(char)
+        else:
+            result.append(_escape(char))
+    if utf8:
+        return "\u2018" + "".join(result) + "\u2019"
+    return "'" + "".join(result) + "'"
+
+
+def shell_quote(name):
+    """
+    Quote name the way mkdir quotes names in verbose messages
+    (shell escape quoting)
+    """
+    if name.isascii() and name.isprintable() and "'" not in name:
+        return "'" + name + "'"
+    if all(_is_printable(char) for char in name):
+        if "'" not in name:
+            return "'" + name + "'"
+        if not any(char in name for char in "\"$`\\"):
+            return '"' + name + '"'
+        return "'" + name.replace("'", "'\\''") + "'"
+
+    result = []
+    printable = None
+    for char in name:
+        if _is_printable(char):
+            if printable is not True:
+                if printable is False:
+                    result.append("'")
+                result.append("'")
+                printable = True
+            result.append("'\\''" if char == "'" else char)
+        else:
+            if printable is not False:
+                if printable is None:
+                    result.append("''")
+                else:
+                    result.append("'")
+                result.append("$'")
+                printable = False
+            result.append(_escape(char))
+    result.append("'")
+    return "".join(result)
@@ -0,0 +1,262 @@
+"""
+Latency benchmark of mkdir command
+
+Every case runs MkDir.run warm-up times and then N times, every
+invocation is timed by time.perf_counter_ns. Results are summarized
+(min/median/p95/p99/max, confidence intervals) and they can be saved as
+JSON and compared with stored baseline.
+
+Regression is reported only when it is statistically significant
+(one-sided Mann-Whitney U test) and slowdown of median is bigger than
+tolerance, so noise of a loaded host does not fail tests.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import time
+
+from helper.cleanup import remove_tree
+from helper.mkdir import MkDir
+
+Z_95 = 1.959963984540054
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "benchmark_baseline.json")
+
+
+class BenchmarkCase(object):
+    """
+    One benchmark case - directories (relative to sandbox) and arguments
+    """
+    def __init__(self, name, directories, arguments_list=[]):
+        self.name = name
+        self.directories = directories
+        self.arguments_list = arguments_list
+
+
+def default_cases():
+    """
+    Cases measured by default: single dir, multiple dirs, -p deep chain
+    and -m modes
+    """
+    return [
+        BenchmarkCase("single", ["test"]),
+        BenchmarkCase("multiple", ["test_%d" % idx for idx in range(16)]),
+        BenchmarkCase("parents_deep",
+                      [os.path.join(*["d"] * 32)],
+                      [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)]),
+        BenchmarkCase("mode_octal", ["test"],
+                      [MkDir.Arguments(MkDir.ArgumentsName.MODE, '440')]),
+        BenchmarkCase("mode_symbolic", ["test"],
+                      [MkDir.Arguments(MkDir.ArgumentsName.MODE,
+                                       'u+rwx,g-w,o=')]),
+        ]
+
+
+def percentile(ordered, fraction):
+    """
+    Helper function - percentile of sorted samples (linear interpolation)
+    """
+    position = (len(ordered) - 1) * fraction
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * \
+        (position - lower)
+
+
+def summarize(samples):
+    """
+    Summary of samples (in ns)
+
+    outputs:
+    dictionary - count, min, median, p95, p99, max, mean, stdev,
+    95% confidence interval of mean and of median
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+    mean = statistics.mean(ordered)
+    stdev = statistics.stdev(ordered) if count > 1 else 0.0
+    mean_margin = Z_95 * stdev / math.sqrt(count)
+    rank_margin = Z_95 * math.sqrt(count) / 2
+    low_rank = max(0, int(math.floor(count / 2 - rank_margin)))
+    high_rank = min(count - 1, int(math.ceil(count / 2 + rank_margin)))
+    return {
+        "count": count,
+        "min": ordered[0],
+        "median": percentile(ordered, 0.5),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+        "mean": mean,
+        "stdev": stdev,
+        "mean_ci95": [mean - mean_margin, mean + mean_margin],
+        "median_ci95": [ordered[low_rank], ordered[high_rank]],
+        }
+
+
+def mann_whitney_greater(current, baseline):
+    """
+    One-sided Mann-Whitney U test (normal approximation with tie
+    correction)
+
+    outputs:
+    p-value of hypothesis "current samples are greater than baseline"
+    """
+    combined = sorted([(value, 0) for value in current] +
+                      [(value, 1) for value in baseline])
+    ranks = [0.0] * len(combined)
+    ties = 0.0
+    index = 0
+    while index < len(combined):
+        end = index
+        while end + 1 < len(combined) and \
+                combined[end + 1][0] == combined[index][0]:
+            end += 1
+        for position in range(index, end + 1):
+            ranks[position] = (index + end) / 2.0 + 1
+        group = end - index + 1
+        ties += group ** 3 - group
+        index = end + 1
+
+    n1 = len(current)
+    n2 = len(baseline)
+    rank_sum = sum(rank for (rank, (_, origin)) in zip(ranks, combined)
+                   if origin == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    total = n1 + n2
+    variance = n1 * n2 / 12.0 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0 - 0.5) / math.sqrt(variance)
+    return 1.0 - statistics.NormalDist().cdf(z)
+
+
+class Comparison(object):
+    """
+    Comparison of one case with baseline
+    """
+    def __init__(self, name, p_value, ratio, regressed):
+        self.name = name
+        self.p_value = p_value
+        self.ratio = ratio
+        self.regressed = regressed
+
+    def __repr__(self):
+        return "%s: median %.2fx of baseline, p=%.4f%s" % (
+            self.name, self.ratio, self.p_value,
+            " - REGRESSION" if self.regressed else "")
+
+
+def compare(results, baseline, alpha=0.01, tolerance=0.2):
+    """
+    Compare results with baseline (both as returned by run_benchmark)
+
+    inputs:
+    alpha - significance level
+    tolerance - slowdown of median that is still accepted (0.2 = 20%)
+
+    outputs:
+    list of Comparison (cases missing in baseline are skipped)
+    """
+    comparisons = []
+    for (name, result) in sorted(results["cases"].items()):
+        if name not in baseline.get("cases", {}):
+            continue
+        samples = result["samples_ns"]
+        baseline_samples = baseline["cases"][name]["samples_ns"]
+        p_value = mann_whitney_greater(samples, baseline_samples)
+        ratio = statistics.median(samples) / \
+            max(statistics.median(baseline_samples), 1)
+        comparisons.append(Comparison(
+            name, p_value, ratio,
+            p_value < alpha and ratio > 1 + tolerance))
+    return comparisons
+
+
+def over_limit(results, limit_ns):
+    """
+    Check results against absolute limit (used when there is no baseline)
+
+    outputs:
+    list of (case name, median in ns) of cases with median over limit_ns
+    """
+    return [(name, result["median"])
+            for (name, result) in sorted(results["cases"].items())
+            if result["median"] > limit_ns]
+
+
+def run_case(case, root, repetitions=100, warmup=10, backend=None):
+    """
+    Run one case, sandbox root is cleaned after every invocation
+
+    outputs:
+    list of durations of MkDir.run in ns (without warm-up)
+    """
+    directory_list = [os.path.join(root, directory)
+                      for directory in case.directories]
+    created = sorted(set(os.path.join(root, directory.split(os.sep)[0])
+                         for directory in case.directories))
+    samples = []
+    for index in range(warmup + repetitions):
+        start_time = time.perf_counter_ns()
+        (exit_code, _, stderr) = MkDir.run(directory_list,
+                                           case.arguments_list, backend)
+        duration = time.perf_counter_ns() - start_time
+        if exit_code != 0:
+            raise RuntimeError("Benchmark case %s failed: %s" % (
+                case.name, stderr))
+        for directory in created:
+            remove_tree(directory)
+        if index >= warmup:
+            samples.append(duration)
+    return samples
+
+
+def run_benchmark(root, cases=None, repetitions=100, warmup=10,
+                  backend=None):
+    """
+    Run all cases in sandbox root
+
+    outputs:
+    dictionary that can be saved as JSON:
+    {"environment": {...}, "cases": {name: {"samples_ns": [...], summary}}}
+    """
+    if cases is None:
+        cases = default_cases()
+    results = {"environment": environment(), "cases": {}}
+    for case in cases:
+        samples = run_case(case, root, repetitions, warmup, backend)
+        summary = summarize(samples)
+        summary["samples_ns"] = samples
+        results["cases"][case.name] = summary
+    return results
+
+
+def environment():
+    """
+    Description of environment stored together with results
+    """
+    (_, version, _) = MkDir.BACKEND.execute(
+        [MkDir.COMMAND, MkDir.ArgumentsName.VERSION])
+    return {
+        "time": time.time(),
+        "host": platform.node(),
+        "kernel": platform.release(),
+        "python": platform.python_version(),
+        "mkdir": version.splitlines()[0] if version else "",
+        "backend": type(MkDir.BACKEND).__name__,
+        }
+
+
+def save(results, path):
+    with open(path, "w") as output:
+        json.dump(results, output, indent=1)
+
+
+def load(path):
+    with open(path) as source:
+        return json.load(source)
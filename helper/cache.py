@@ -0,0 +1,191 @@
+"""
+Cache of test results
+
+Result of a passed test is stored under key computed from fingerprint of
+everything the test depends on:
+* mkdir binary - path, inode, mtime, size, sha256 and --version output
+* kernel release and filesystem type of the sandbox
+* umask, effective uid and gid (root passes permission checks), backend
+  and storage used by the run
+* locale variables (messages and quoting of mkdir depend on them)
+* source of helper modules and source of the test module
+
+When nothing of it changed since the last green run, the test is reported
+from cache and does not run. Cache is a JSON file with limited number of
+entries, the least recently used entries are evicted.
+
+Example of use:
+    cache = ResultCache(".mkdir_test_cache.json")
+    environment = fingerprint(backend, storage, sandbox)
+    key = cache.key(environment, test)
+    if cache.get(key) is None:
+        ... run test ...
+        cache.put(key, test.id(), "ok", duration)
+    cache.save()
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import collections
+import glob
+import hashlib
+import inspect
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+
+from helper.mkdir import MkDir
+from helper.mode import get_umask
+
+HELPER_PATH = os.path.dirname(os.path.abspath(__file__))
+BASE_TEST_PATH = os.path.join(os.path.dirname(HELPER_PATH), "test_cases",
+                              "base_test.py")
+READ_SIZE = 1024 * 1024
+LOCALE_VARIABLES = ("LANGUAGE", "LC_ALL", "LC_MESSAGES", "LC_CTYPE", "LANG")
+
+
+def file_hash(path):
+    """
+    Helper function - sha256 of file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def filesystem_type(path):
+    """
+    Helper function - type of filesystem where path is (the longest mount
+    point of /proc/self/mountinfo that contains the path)
+    """
+    path = os.path.realpath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    best = ("", "")
+    try:
+        with open("/proc/self/mountinfo") as mountinfo:
+            for line in mountinfo:
+                fields = line.split()
+                mount_point = fields[4].replace("\\040", " ")
+                fs_type = fields[fields.index("-") + 1]
+                if (path == mount_point or path.startswith(
+                        mount_point.rstrip("/") + "/")) and \
+                        len(mount_point) >= len(best[0]):
+                    best = (mount_point, fs_type)
+    except OSError:
+        return ""
+    return best[1]
+
+
+def fingerprint(backend, storage, sandbox):
+    """
+    Fingerprint of environment shared by all tests of one run
+
+    inputs:
+    backend, storage - names of backend and storage of the run
+    sandbox - sandbox folder (its filesystem type is used)
+
+    outputs:
+    dictionary (JSON serializable)
+    """
+    binary = shutil.which(MkDir.COMMAND) or MkDir.COMMAND
+    environment = {
+        "binary": binary,
+        "kernel": platform.release(),
+        "filesystem": filesystem_type(os.path.dirname(sandbox)),
+        "umask": get_umask(),
+        "euid": os.geteuid(),
+        "egid": os.getegid(),
+        "backend": backend,
+        "storage": storage,
+        "python": platform.python_version(),
+        "locale": dict((name, os.environ.get(name, ""))
+                       for name in LOCALE_VARIABLES),
+        }
+    try:
+        st = os.stat(binary)
+        environment.update({"inode": st.st_ino, "mtime": st.st_mtime_ns,
+                            "size": st.st_size, "sha256": file_hash(binary)})
+    except OSError:
+        pass
+    try:
+        version = subprocess.run([binary, MkDir.ArgumentsName.VERSION],
+                                 capture_output=True,
+                                 universal_newlines=True).stdout
+        environment["version"] = version.splitlines()[0] if version else ""
+    except OSError:
+        environment["version"] = ""
+    sources = sorted(glob.glob(os.path.join(HELPER_PATH, "*.py")))
+    sources.append(BASE_TEST_PATH)
+    environment["helpers"] = hashlib.sha256("".join(
+        file_hash(source) for source in sources
+        if os.path.exists(source)).encode()).hexdigest()
+    return environment
+
+
+class ResultCache(object):
+    """
+    Results of passed tests stored in JSON file, LRU eviction
+    """
+    MAX_ENTRIES = 4096
+
+    def __init__(self, path, max_entries=None):
+        self.path = path
+        self.max_entries = max_entries if max_entries else self.MAX_ENTRIES
+        self.entries = collections.OrderedDict()
+        self.module_hashes = {}
+        self.changed = False
+        try:
+            with open(path) as source:
+                stored = json.load(source)
+        except (OSError, ValueError):
+            stored = []
+        for (key, entry) in stored:
+            self.entries[key] = entry
+
+    def key(self, environment, test):
+        """
+        Key of one test - environment, test id and source of test module
+        """
+        source = inspect.getsourcefile(type(test))
+        if source not in self.module_hashes:
+            self.module_hashes[source] = file_hash(source)
+        data = json.dumps([environment, test.id(),
+                           self.module_hashes[source]], sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Cached entry (dictionary with test, status, duration) or None
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            entry["used"] = time.time()
+            self.changed = True
+        return entry
+
+    def put(self, key, test_id, status, duration):
+        self.entries[key] = {"test": test_id, "status": status,
+                             "duration": duration, "used": time.time()}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.changed = True
+
+    def save(self):
+        """
+        Store cache (atomically - temporary file is renamed)
+        """
+        if not self.changed:
+            return
+        temporary = "%s.%d" % (self.path, os.getpid())
+        with open(temporary, "w") as output:
+            json.dump(list(self.entries.items()), output)
+        os.replace(temporary, self.path)
+        self.changed = False
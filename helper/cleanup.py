@@ -0,0 +1,148 @@
+"""
+Helper function for removing of directory trees
+
+Tree is removed in this process (no rm -rf), every syscall is relative
+to a directory file descriptor (unlinkat/rmdir with dir_fd), so full paths
+are never built. Only one directory descriptor is open at once - the walk
+goes back to parent over "..", so depth of tree is not limited by number
+of open files or by recursion limit.
+
+Directories without permissions (e.g. created with -m 440 or after
+chmod ugo-rwx) are made accessible before they are entered.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+import stat
+import time
+
+DIRECTORY_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+
+
+class CleanupReport(object):
+    """
+    Report of remove_tree - how many entries and bytes were removed,
+    how many entries could not be removed and how long it took
+    """
+    def __init__(self):
+        self.entries = 0
+        self.bytes = 0
+        self.errors = 0
+        self.duration_ns = 0
+
+    def __repr__(self):
+        return "removed %d entries (%d bytes) in %.3f ms, %d errors" % (
+            self.entries, self.bytes, self.duration_ns / 1e6, self.errors)
+
+
+def remove_tree(path):
+    """
+    Remove path (directory tree or file), it is not an error when path
+    does not exist
+
+    inputs:
+    path - path to be removed
+
+    outputs:
+    CleanupReport
+    """
+    report = CleanupReport()
+    start_time = time.perf_counter_ns()
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return report
+
+    if not stat.S_ISDIR(st.st_mode):
+        os.unlink(path)
+        report.entries += 1
+        report.bytes += st.st_size
+    else:
+        if not _is_accessible(st.st_mode):
+            os.chmod(path, _accessible_mode(st.st_mode))
+        fd = os.open(path, DIRECTORY_FLAGS)
+        try:
+            fd = _remove_content(fd, report)
+        finally:
+            os.close(fd)
+        try:
+            os.rmdir(path)
+            report.entries += 1
+        except OSError:
+            report.errors += 1
+
+    report.duration_ns = time.perf_counter_ns() - start_time
+    return report
+
+
+def _is_accessible(mode):
+    return mode & stat.S_IRWXU == stat.S_IRWXU
+
+
+def _accessible_mode(mode):
+    return (mode & 0o7777) | stat.S_IRWXU
+
+
+def _remove_content(fd, report):
+    """
+    Remove content of directory fd
+
+    Stack holds (name, subdirectories to be removed) for every level,
+    fd is always descriptor of the directory on top of the stack.
+
+    outputs:
+    fd - descriptor of the same directory (it may be reopened)
+    """
+    stack = [(None, _scan(fd, report))]
+    while True:
+        (name, pending) = stack[-1]
+        if pending:
+            child_name = pending.pop()
+            try:
+                child = os.open(child_name, DIRECTORY_FLAGS, dir_fd=fd)
+            except OSError:
+                report.errors += 1
+                continue
+            os.close(fd)
+            fd = child
+            stack.append((child_name, _scan(fd, report)))
+            continue
+
+        stack.pop()
+        if not stack:
+            return fd
+        parent = os.open("..", DIRECTORY_FLAGS, dir_fd=fd)
+        os.close(fd)
+        fd = parent
+        try:
+            os.rmdir(name, dir_fd=fd)
+            report.entries += 1
+        except OSError:
+            report.errors += 1
+
+
+def _scan(fd, report):
+    """
+    Remove all non-directory entries in directory fd
+
+    outputs:
+    list of names of subdirectories (made accessible)
+    """
+    subdirectories = []
+    with os.scandir(fd) as entries:
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+                if stat.S_ISDIR(st.st_mode):
+                    if not _is_accessible(st.st_mode):
+                        os.chmod(entry.name, _accessible_mode(st.st_mode),
+                                 dir_fd=fd)
+                    subdirectories.append(entry.name)
+                else:
+                    os.unlink(entry.name, dir_fd=fd)
+                    report.entries += 1
+                    report.bytes += st.st_size
+            except OSError:
+                report.errors += 1
+    return subdirectories
@@ -0,0 +1,252 @@
+"""
+Combinatorial testing of mkdir options
+
+Every option of MkDir.ArgumentsName (short and long forms, mode values,
+invalid arguments) and shape of target directory is a factor with several
+levels. Instead of full cartesian product, covering array of strength t is
+generated - every combination of levels of any t factors is in at least
+one case (all-pairs for t = 2), so interactions are covered by much less
+mkdir invocations.
+
+Example of use:
+    for case in generate_cases(strength=2):
+        (directory_list, arguments_list) = case.prepare(root)
+        result = MkDir.run(directory_list, arguments_list)
+        problems = case.check(result, directory_list[0])
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import itertools
+import os
+import random
+import stat
+
+from helper.mkdir import MkDir
+from helper.mode_matrix import expected_mode
+from helper.mode import get_umask
+
+NAME = MkDir.ArgumentsName
+
+FACTORS = {
+    "mode": (None, (NAME.MODE, "755"), (NAME.MODE_LONG, "700"),
+             (NAME.MODE_LONG, "u+rwx,g-w,o="), (NAME.MODE_LONG, "a+t"),
+             (NAME.MODE_LONG, "r")),
+    "parents": (None, (NAME.PARENTS, ""), (NAME.PARENTS_LONG, "")),
+    "verbose": (None, (NAME.VERBOSE, ""), (NAME.VERBOSE_LONG, "")),
+    "context": (None, (NAME.SEC_CONTEXT, ""),
+                (NAME.CONTEXT, "system_u:object_r:tmp_t:s0")),
+    "extra": (None, (NAME.INVALID_ARG, ""), (NAME.HELP, "")),
+    "shape": ("new", "existing", "missing_parent", "unwritable",
+              "long_name", "too_long"),
+}
+
+ARGUMENT_FACTORS = ("mode", "parents", "verbose", "context", "extra")
+
+
+def covering_array(factors, strength=2, candidates=20, seed=0):
+    """
+    Generate covering array - greedy construction (AETG): every new row
+    starts from a not yet covered t-tuple, other factors get level that
+    covers most new t-tuples, the best of several candidate rows is taken
+
+    inputs:
+    factors - list of numbers of levels of every factor
+    strength - t (2 for all-pairs)
+    candidates - number of candidate rows generated for every row
+    seed - seed of random generator (array is deterministic)
+
+    outputs:
+    list of rows - tuples of level indexes
+    """
+    count = len(factors)
+    if strength >= count:
+        return list(itertools.product(*[range(levels) for levels in factors]))
+
+    combinations = list(itertools.combinations(range(count), strength))
+    by_factor = [[c for c in combinations if factor in c]
+                 for factor in range(count)]
+    uncovered = set()
+    for combination in combinations:
+        for values in itertools.product(*[range(factors[f])
+                                          for f in combination]):
+            uncovered.add((combination, values))
+
+    generator = random.Random(seed)
+    rows = []
+    while uncovered:
+        (start_combination, start_values) = generator.choice(
+            sorted(uncovered))
+        best_row = None
+        best_covered = None
+        for _ in range(candidates):
+            row = [None] * count
+            for (factor, value) in zip(start_combination, start_values):
+                row[factor] = value
+            order = [f for f in range(count) if row[f] is None]
+            generator.shuffle(order)
+            for factor in order:
+                best_level = 0
+                best_gain = -1
+                for level in range(factors[factor]):
+                    row[factor] = level
+                    gain = sum(
+                        1 for c in by_factor[factor]
+                        if all(row[f] is not None for f in c) and
+                        (c, tuple(row[f] for f in c)) in uncovered)
+                    if gain > best_gain:
+                        (best_level, best_gain) = (level, gain)
+                row[factor] = best_level
+            covered = set((c, tuple(row[f] for f in c))
+                          for c in combinations) & uncovered
+            if best_covered is None or len(covered) > len(best_covered):
+                (best_row, best_covered) = (tuple(row), covered)
+        rows.append(best_row)
+        uncovered -= best_covered
+    return rows
+
+
+class Case(object):
+    """
+    One generated combination - dictionary factor -> level
+    """
+    def __init__(self, levels):
+        self.levels = levels
+
+    def __repr__(self):
+        parts = []
+        for factor in ARGUMENT_FACTORS:
+            level = self.levels[factor]
+            if level is not None:
+                parts.append("".join(level))
+        parts.append(self.levels["shape"])
+        return " ".join(parts)
+
+    def mode_string(self):
+        """
+        Mode string as mkdir gets it ("-m=755" gives "=755")
+        """
+        level = self.levels["mode"]
+        if level is None:
+            return None
+        argument = "".join(level)
+        if argument.startswith("--mode="):
+            return argument[len("--mode="):]
+        return argument[len("-m"):]
+
+    def prepare(self, root):
+        """
+        Create directory shape in (existing, empty) root
+
+        outputs:
+        (directory_list, arguments_list) for MkDir.run
+        """
+        shape = self.levels["shape"]
+        name_max = os.pathconf(root, "PC_NAME_MAX")
+        if shape == "existing":
+            directory = os.path.join(root, "existing")
+            os.mkdir(directory)
+        elif shape == "missing_parent":
+            directory = os.path.join(root, "missing", "child")
+        elif shape == "unwritable":
+            os.mkdir(os.path.join(root, "unwritable"), 0o500)
+            directory = os.path.join(root, "unwritable", "child")
+        elif shape == "long_name":
+            directory = os.path.join(root, "l" * name_max)
+        elif shape == "too_long":
+            directory = os.path.join(root, "l" * (name_max + 1))
+        else:
+            directory = os.path.join(root, "new")
+        arguments_list = [MkDir.Arguments(*self.levels[factor])
+                          for factor in ARGUMENT_FACTORS
+                          if self.levels[factor] is not None]
+        return ([directory], arguments_list)
+
+    def expected(self):
+        """
+        Expected result of the case
+
+        outputs:
+        (exit_code, created, mode) - mode of created directory is None
+        when it is not checked
+        """
+        if self.levels["extra"] == (NAME.INVALID_ARG, ""):
+            return (1, False, None)
+        if self.levels["extra"] == (NAME.HELP, ""):
+            return (0, False, None)
+        mode_string = self.mode_string()
+        mode = None
+        if mode_string is not None:
+            mode = expected_mode(mode_string, get_umask())
+            if mode is None:
+                return (1, False, None)
+
+        shape = self.levels["shape"]
+        parents = self.levels["parents"] is not None
+        if shape == "too_long":
+            return (1, False, None)
+        if shape == "existing":
+            return (0 if parents else 1, False, None)
+        if shape == "missing_parent" and not parents:
+            return (1, False, None)
+        if shape == "unwritable" and os.geteuid() != 0:
+            return (1, False, None)
+        return (0, True, mode)
+
+    def check(self, result, directory):
+        """
+        Check result of MkDir.run against expectation
+
+        outputs:
+        list of problems (empty list if result is as expected)
+        """
+        (exit_code, stdout, stderr) = result
+        (expected_exit_code, created, mode) = self.expected()
+        problems = []
+        if exit_code != expected_exit_code:
+            problems.append("exit code %s, expected %d: %s" % (
+                exit_code, expected_exit_code, stderr))
+        if self.levels["extra"] == (NAME.HELP, "") and \
+                not stdout.startswith("Usage:"):
+            problems.append("help is not printed")
+        if self.levels["shape"] == "existing":
+            return problems
+
+        try:
+            st_mode = os.lstat(directory).st_mode
+        except OSError:
+            st_mode = None
+        if created and (st_mode is None or not stat.S_ISDIR(st_mode)):
+            problems.append("directory is not created")
+        if not created and st_mode is not None:
+            problems.append("directory is created")
+        if created and st_mode is not None and mode is not None and \
+                stat.S_IMODE(st_mode) != mode:
+            problems.append("mode %04o, expected %04o" % (
+                stat.S_IMODE(st_mode), mode))
+        verbose = self.levels["verbose"] is not None
+        if created and verbose != ("created directory" in stdout):
+            problems.append("verbose output %r" % stdout)
+        return problems
+
+
+def generate_cases(strength=2, factors=FACTORS, seed=0):
+    """
+    Cases of covering array of given strength
+    """
+    names = list(factors)
+    rows = covering_array([len(factors[name]) for name in names], strength,
+                          seed=seed)
+    return [Case(dict((name, factors[name][level])
+                      for (name, level) in zip(names, row)))
+            for row in rows]
+
+
+def product_size(factors=FACTORS):
+    """
+    Number of cases of full cartesian product
+    """
+    size = 1
+    for levels in factors.values():
+        size *= len(levels)
+    return size
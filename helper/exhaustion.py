@@ -0,0 +1,147 @@
+"""
+Exhaustion of filesystem resources
+
+Small filesystem (tmpfs with size/nr_inodes or filesystem image over loop
+device - see helper.storage) is filled to exact number of free inodes
+and/or blocks, so behaviour of mkdir can be measured at 0, 1 and N free
+inodes/blocks. Filler (empty files for inodes, one data file for blocks)
+is in FILLER folder and it is not reported as created by mkdir.
+
+Example of use:
+    storage = TmpfsStorage(size="1m", nr_inodes=64)
+    storage.setup("/tmp/bounded")
+    fill("/tmp/bounded", inodes=1)
+    report = run_exhausted("/tmp/bounded", ["/tmp/bounded/a/b"],
+                           [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)])
+    print(report.created)
+    storage.cleanup("/tmp/bounded")
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+import time
+
+from helper.mkdir import MkDir
+
+FILLER = ".filler"
+SLACK_BLOCKS = 64
+
+
+def free_space(path):
+    """
+    Free inodes and blocks available for files (f_favail, f_bavail)
+
+    outputs:
+    (inodes, blocks)
+    """
+    st = os.statvfs(path)
+    return (st.f_favail, st.f_bavail)
+
+
+def fill(path, inodes=None, blocks=None):
+    """
+    Fill filesystem of path to exact number of free inodes and blocks
+
+    Inodes are filled first by empty files (entries make filler folder
+    grow, so blocks are filled at the end), blocks are filled by data file
+    - bulk write and then block by block till the threshold.
+
+    inputs:
+    path - root of the filesystem
+    inodes - number of free inodes left (not filled if None)
+    blocks - number of free blocks left (not filled if None)
+
+    outputs:
+    (inodes, blocks) - free inodes and blocks after fill
+    """
+    filler = os.path.join(path, FILLER)
+    if not os.path.isdir(filler):
+        os.mkdir(filler)
+    fd = os.open(os.path.join(filler, "data"),
+                 os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    try:
+        if inodes is not None:
+            index = 0
+            while free_space(path)[0] > inodes:
+                os.close(os.open(os.path.join(filler, "%d" % index),
+                                 os.O_WRONLY | os.O_CREAT, 0o600))
+                index += 1
+        if blocks is not None:
+            block_size = os.statvfs(path).f_bsize
+            bulk = free_space(path)[1] - blocks - SLACK_BLOCKS
+            if bulk > 0:
+                _write(fd, block_size * bulk)
+            while free_space(path)[1] > blocks:
+                _write(fd, block_size)
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    (free_inodes, free_blocks) = free_space(path)
+    if (inodes is not None and free_inodes != inodes) or \
+            (blocks is not None and free_blocks != blocks):
+        raise ValueError("Filesystem %s can not be filled to %s inodes, %s "
+                         "blocks (%d, %d free)" % (path, inodes, blocks,
+                                                   free_inodes, free_blocks))
+    return (free_inodes, free_blocks)
+
+
+def _write(fd, size):
+    """
+    Helper function - append size bytes of zeros
+    """
+    chunk = bytes(min(size, 1 << 20))
+    while size > 0:
+        size -= os.write(fd, chunk[:size])
+
+
+def created_directories(path):
+    """
+    Directories under path (relative paths, sorted), filler is skipped
+    """
+    created = []
+    for (folder, directories, _) in os.walk(path):
+        if folder == path and FILLER in directories:
+            directories.remove(FILLER)
+        relative = os.path.relpath(folder, path)
+        created.extend(os.path.normpath(os.path.join(relative, directory))
+                       for directory in directories)
+    return sorted(created)
+
+
+class ExhaustionReport(object):
+    """
+    Result of mkdir on exhausted filesystem
+
+    free - (inodes, blocks) free before mkdir
+    exit_code, stdout, stderr - output of mkdir
+    duration_ns - duration of MkDir.run
+    created - directories that exist after mkdir (relative to root,
+              sorted, including directories created before)
+    """
+    def __init__(self, free, result, duration_ns, created):
+        self.free = free
+        (self.exit_code, self.stdout, self.stderr) = result
+        self.duration_ns = duration_ns
+        self.created = created
+
+    def __repr__(self):
+        return "free inodes %d, blocks %d: exit code %s, %.3f ms, " \
+            "created %s" % (self.free[0], self.free[1], self.exit_code,
+                            self.duration_ns / 1e6, self.created)
+
+
+def run_exhausted(root, directory_list, arguments_list=[], backend=None):
+    """
+    Run mkdir on (filled) filesystem and report which directories got
+    created
+
+    outputs:
+    ExhaustionReport
+    """
+    free = free_space(root)
+    start_time = time.perf_counter_ns()
+    result = MkDir.run(directory_list, arguments_list, backend)
+    duration_ns = time.perf_counter_ns() - start_time
+    return ExhaustionReport(free, result, duration_ns,
+                            created_directories(root))
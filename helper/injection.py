@@ -0,0 +1,320 @@
+"""
+Fault injection for mkdir command
+
+Faults are applied to the mkdir process only (between fork and exec), no
+LD_PRELOAD and no change of this process:
+* ErrnoFault - seccomp filter returns errno (ENOSPC, EDQUOT, EMLINK, EIO,
+  EINTR, ...) for every mkdir(2)/mkdirat(2) call of the process
+* RlimitFault - resource limit (RLIMIT_NOFILE, RLIMIT_AS, ...)
+* CpuThrottleFault - process runs in a cgroup with CPU quota (cgroup v1
+  cpu controller or cgroup v2 cpu.max)
+* KillFault - SIGKILL after random delay (seeded, so it is repeatable)
+
+InjectionBackend runs mkdir with a fault and records outcome and latency
+of every call, so it can be used by MkDir.run as any other backend.
+
+Example of use:
+    with InjectionBackend(ErrnoFault(errno.ENOSPC)) as backend:
+        (exit_code, _, stderr) = MkDir.run(["directory"], backend=backend)
+    print(backend.outcomes[-1])
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import ctypes
+import os
+import platform
+import random
+import resource
+import signal
+import subprocess
+import time
+
+PR_SET_NO_NEW_PRIVS = 38
+PR_SET_SECCOMP = 22
+SECCOMP_MODE_FILTER = 2
+SECCOMP_RET_ALLOW = 0x7fff0000
+SECCOMP_RET_ERRNO = 0x00050000
+BPF_LD_W_ABS = 0x20
+BPF_JEQ_K = 0x15
+BPF_RET_K = 0x06
+
+# machine -> (AUDIT_ARCH, syscall numbers of mkdir and mkdirat)
+SECCOMP_ARCHITECTURES = {
+    "x86_64": (0xC000003E, (83, 258)),
+    "aarch64": (0xC00000B7, (34,)),
+}
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+class SockFilter(ctypes.Structure):
+    _fields_ = [("code", ctypes.c_ushort), ("jt", ctypes.c_ubyte),
+                ("jf", ctypes.c_ubyte), ("k", ctypes.c_uint32)]
+
+
+class SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort),
+                ("filter", ctypes.POINTER(SockFilter))]
+
+
+class Fault(object):
+    """
+    Base of faults - every method is optional
+
+    setup - called once before the first command (in this process)
+    prepare_child - called in child process before exec
+    started - called with Popen object after start, returns True when the
+              process was killed by the fault
+    teardown - called once when backend is closed
+    """
+    name = "none"
+
+    def available(self):
+        """
+        Reason why fault can not be injected here, None when it can
+        """
+        return None
+
+    def setup(self):
+        pass
+
+    def prepare_child(self):
+        pass
+
+    def started(self, proc):
+        return False
+
+    def teardown(self):
+        pass
+
+
+class ErrnoFault(Fault):
+    """
+    mkdir(2) and mkdirat(2) fail with errno (seccomp SECCOMP_RET_ERRNO)
+    """
+    def __init__(self, error):
+        self.error = error
+        self.name = "errno %s" % os.strerror(error)
+        self.filters = None
+        self.program = None
+        self.libc = None
+
+    def available(self):
+        if platform.machine() not in SECCOMP_ARCHITECTURES:
+            return "seccomp filter is not defined for %s" % \
+                platform.machine()
+        with open("/proc/self/status") as status:
+            if "Seccomp:" not in status.read():
+                return "kernel without seccomp"
+        return None
+
+    def setup(self):
+        """
+        Build BPF program (in this process, child only installs it):
+        arch != AUDIT_ARCH -> allow, nr in syscalls -> errno, else allow
+        """
+        (arch, syscalls) = SECCOMP_ARCHITECTURES[platform.machine()]
+        count = len(syscalls)
+        instructions = [(BPF_LD_W_ABS, 0, 0, 4),
+                        (BPF_JEQ_K, 0, count + 1, arch),
+                        (BPF_LD_W_ABS, 0, 0, 0)]
+        for (index, number) in enumerate(syscalls):
+            instructions.append((BPF_JEQ_K, count - index, 0, number))
+        instructions.append((BPF_RET_K, 0, 0, SECCOMP_RET_ALLOW))
+        instructions.append((BPF_RET_K, 0, 0,
+                             SECCOMP_RET_ERRNO | (self.error & 0xffff)))
+        self.filters = (SockFilter * len(instructions))(
+            *[SockFilter(*instruction) for instruction in instructions])
+        self.program = SockFprog(len(instructions), self.filters)
+        self.libc = ctypes.CDLL(None, use_errno=True)
+
+    def prepare_child(self):
+        if self.libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0 or \
+                self.libc.prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER,
+                                ctypes.byref(self.program), 0, 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+
+class RlimitFault(Fault):
+    """
+    Resource limit of mkdir process (soft and hard)
+    """
+    NAMES = dict((getattr(resource, name), name)
+                 for name in sorted(dir(resource), reverse=True)
+                 if name.startswith("RLIMIT_"))
+
+    def __init__(self, limit, value):
+        self.limit = limit
+        self.value = value
+        self.name = "%s=%d" % (self.NAMES.get(limit, limit), value)
+
+    def prepare_child(self):
+        resource.setrlimit(self.limit, (self.value, self.value))
+
+
+class CpuThrottleFault(Fault):
+    """
+    mkdir process runs in cgroup with CPU quota (fraction of one CPU)
+    """
+    PERIOD_US = 100000
+
+    def __init__(self, quota=0.01):
+        self.quota = quota
+        self.name = "cpu quota %g" % quota
+        self.path = None
+
+    def _controller(self):
+        """
+        Helper function - (version, folder where the cgroup is created)
+        """
+        if os.path.exists(os.path.join(CGROUP_ROOT, "cpu",
+                                       "cpu.cfs_quota_us")):
+            return (1, os.path.join(CGROUP_ROOT, "cpu"))
+        try:
+            with open(os.path.join(CGROUP_ROOT,
+                                   "cgroup.subtree_control")) as control:
+                if "cpu" in control.read().split():
+                    return (2, CGROUP_ROOT)
+        except OSError:
+            pass
+        return (None, None)
+
+    def available(self):
+        (version, folder) = self._controller()
+        if version is None:
+            return "cgroup cpu controller is not available"
+        if not os.access(folder, os.W_OK):
+            return "cgroup %s is not writable" % folder
+        return None
+
+    def setup(self):
+        (version, folder) = self._controller()
+        self.path = os.path.join(folder, "mkdir_test_%d" % os.getpid())
+        if not os.path.isdir(self.path):
+            os.mkdir(self.path)
+        quota_us = max(int(self.PERIOD_US * self.quota), 1000)
+        if version == 1:
+            self._write("cpu.cfs_period_us", self.PERIOD_US)
+            self._write("cpu.cfs_quota_us", quota_us)
+        else:
+            self._write("cpu.max", "%d %d" % (quota_us, self.PERIOD_US))
+
+    def _write(self, name, value):
+        with open(os.path.join(self.path, name), "w") as control:
+            control.write("%s\n" % value)
+
+    def prepare_child(self):
+        self._write("cgroup.procs", os.getpid())
+
+    def teardown(self):
+        if self.path is not None:
+            try:
+                os.rmdir(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+class KillFault(Fault):
+    """
+    SIGKILL after random delay from [0, max_delay) seconds
+    """
+    def __init__(self, max_delay=0.005, seed=0):
+        self.max_delay = max_delay
+        self.generator = random.Random(seed)
+        self.name = "SIGKILL < %g s" % max_delay
+
+    def started(self, proc):
+        time.sleep(self.generator.uniform(0, self.max_delay))
+        if proc.poll() is not None:
+            return False
+        proc.send_signal(signal.SIGKILL)
+        return True
+
+
+class Outcome(object):
+    """
+    Result of one command run with fault
+
+    exit_code - exit code (negative number of signal if killed, None
+                if mkdir was not started)
+    killed - True when the process was killed by the fault
+    error - error of start of the process (e.g. exec failed by RLIMIT_AS)
+    created - number of directories of command that exist after the run
+    """
+    __slots__ = ("fault", "command", "exit_code", "killed", "error",
+                 "duration_ns", "created", "stderr")
+
+    def __init__(self, fault, command):
+        self.fault = fault
+        self.command = command
+        self.exit_code = None
+        self.killed = False
+        self.error = None
+        self.duration_ns = 0
+        self.created = 0
+        self.stderr = ""
+
+    def __repr__(self):
+        if self.error is not None:
+            result = "not started: %s" % self.error
+        elif self.killed:
+            result = "killed"
+        else:
+            result = "exit code %d" % self.exit_code
+        return "%s: %s, %d created, %.3f ms" % (
+            self.fault, result, self.created, self.duration_ns / 1e6)
+
+
+class InjectionBackend(object):
+    """
+    Backend that runs mkdir binary with injected fault
+
+    outcomes - list of Outcome of every executed command
+    """
+    def __init__(self, fault):
+        self.fault = fault
+        self.outcomes = []
+        self.ready = False
+
+    def execute(self, command):
+        if not self.ready:
+            self.fault.setup()
+            self.ready = True
+        outcome = Outcome(self.fault.name, command)
+        self.outcomes.append(outcome)
+        start_time = time.perf_counter_ns()
+        try:
+            proc = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE,
+                                    preexec_fn=self.fault.prepare_child)
+        except (OSError, subprocess.SubprocessError) as e:
+            outcome.duration_ns = time.perf_counter_ns() - start_time
+            outcome.error = str(e)
+            return (1, "", str(e))
+        with proc:
+            outcome.killed = self.fault.started(proc)
+            (stdout, stderr) = proc.communicate()
+        outcome.duration_ns = time.perf_counter_ns() - start_time
+        outcome.exit_code = proc.returncode
+        outcome.created = sum(1 for argument in command[1:]
+                              if not argument.startswith("-") and
+                              os.path.isdir(argument))
+        try:
+            outcome.stderr = stderr.decode()
+            return (proc.returncode, stdout.decode(), outcome.stderr)
+        except Exception as e:
+            return (1, "", str(e))
+
+    def close(self):
+        if self.ready:
+            self.fault.teardown()
+            self.ready = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
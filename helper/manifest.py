@@ -0,0 +1,176 @@
+"""
+Manifest of tests
+
+Test modules (test_cases/*.py) are imported only when the manifest is
+built, manifest (module -> class -> test names) is stored in JSON file
+and every module entry is valid while mtime and size of the module file
+are the same. Next runs read the manifest, select tests by module and -k
+patterns and import only modules of the selected tests.
+
+Example of use:
+    manifest = Manifest(".mkdir_test_manifest.json", "test_cases")
+    test_ids = manifest.select(modules=["mode_tests"], patterns=["octal"])
+    manifest.save()
+    suite = unittest.TestLoader().loadTestsFromNames(test_ids)
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import fnmatch
+import importlib
+import json
+import os
+import unittest
+
+
+class Manifest(object):
+    """
+    Cached list of test ids of every test module in a package folder
+    """
+    def __init__(self, path, package_path):
+        self.path = path
+        self.package_path = package_path
+        self.package = os.path.basename(os.path.normpath(package_path))
+        self.hits = 0
+        self.misses = 0
+        self.total = 0
+        self.changed = False
+        try:
+            with open(path) as source:
+                self.modules = json.load(source)
+        except (OSError, ValueError):
+            self.modules = {}
+
+    def module_names(self):
+        """
+        Names of test modules (sorted the same way as unittest discovery)
+        """
+        return module_names(self.package_path)
+
+    def _stamp(self, module):
+        st = os.stat(os.path.join(self.package_path,
+                                  module.split(".")[-1] + ".py"))
+        return [st.st_mtime_ns, st.st_size]
+
+    def _load(self, module):
+        """
+        Import module and list its tests
+
+        outputs:
+        dictionary class name -> list of test names, None if module can
+        not be imported (it is not stored, so it is imported next time)
+        """
+        try:
+            imported = importlib.import_module(module)
+        except Exception:
+            return None
+        loader = unittest.TestLoader()
+        classes = {}
+        for (name, value) in sorted(vars(imported).items()):
+            if isinstance(value, type) and \
+                    issubclass(value, unittest.TestCase) and \
+                    value.__module__ == module:
+                test_names = loader.getTestCaseNames(value)
+                if test_names:
+                    classes[name] = list(test_names)
+        return classes
+
+    def tests(self, module):
+        """
+        Test ids of one module - from manifest when the module file is not
+        changed, otherwise the module is imported
+
+        outputs:
+        list of test ids, None when module can not be imported
+        """
+        stamp = self._stamp(module)
+        entry = self.modules.get(module)
+        if entry is not None and entry["stamp"] == stamp:
+            self.hits += 1
+            classes = entry["classes"]
+        else:
+            self.misses += 1
+            classes = self._load(module)
+            if classes is None:
+                self.modules.pop(module, None)
+                return None
+            self.modules[module] = {"stamp": stamp, "classes": classes}
+            self.changed = True
+        return ["%s.%s.%s" % (module, class_name, test_name)
+                for (class_name, test_names) in sorted(classes.items())
+                for test_name in test_names]
+
+    def select(self, modules=None, patterns=None):
+        """
+        Select test ids
+
+        inputs:
+        modules - names of modules ("mode_tests" or "test_cases.mode_tests"),
+                  all modules if not set
+        patterns - -k patterns, test id shall match at least one of them
+                   (substring or fnmatch pattern with wildcards, the same
+                   as unittest -k)
+
+        outputs:
+        list of test ids (modules that can not be imported are returned
+        as module name, so the loader reports the import error)
+        """
+        selected = []
+        wanted = set(qualified_name(module, self.package_path)
+                     for module in modules or [])
+        for module in self.module_names():
+            if wanted and module not in wanted:
+                continue
+            test_ids = self.tests(module)
+            if test_ids is None:
+                selected.append(module)
+                continue
+            self.total += len(test_ids)
+            for test_id in test_ids:
+                if not patterns or any(_match(pattern, test_id)
+                                       for pattern in patterns):
+                    selected.append(test_id)
+        stale = set(self.modules) - set(self.module_names())
+        for module in stale:
+            del self.modules[module]
+            self.changed = True
+        return selected
+
+    def save(self):
+        if not self.changed:
+            return
+        temporary = "%s.%d" % (self.path, os.getpid())
+        with open(temporary, "w") as output:
+            json.dump(self.modules, output, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+        self.changed = False
+
+
+def module_names(package_path):
+    """
+    Names of test modules in package folder (sorted the same way as
+    unittest discovery), e.g. ["test_cases.mode_tests", ...]
+    """
+    package = os.path.basename(os.path.normpath(package_path))
+    names = []
+    for file_name in sorted(os.listdir(package_path)):
+        (name, extension) = os.path.splitext(file_name)
+        if extension == ".py" and name != "__init__":
+            names.append("%s.%s" % (package, name))
+    return names
+
+
+def qualified_name(module, package_path):
+    """
+    Module name with package ("mode_tests" -> "test_cases.mode_tests")
+    """
+    package = os.path.basename(os.path.normpath(package_path))
+    if not module.startswith(package + "."):
+        module = "%s.%s" % (package, module)
+    return module
+
+
+def _match(pattern, test_id):
+    if "*" not in pattern:
+        pattern = "*%s*" % pattern
+    return fnmatch.fnmatchcase(test_id, pattern)
@@ -8,15 +8,40 @@ class can be changed/extended
 Created on Jun 17, 2021
 @author: Martin Koubek
 """
-import subprocess
+import atexit
+import errno
+import os
+import stat
+import time
+
+from helper.backends import SpawnBackend, SubprocessBackend
+from helper.pool import MkDirPool
+from helper.streaming import StreamingRun
+from helper.tree import TreeCheckpoint, TreeResult, levels_digest, \
+    tree_levels
+from helper import result
+from helper import trace
 
 
 class MkDir(object):
     """
     Command -  mkdir - it can be used also out of wrapper for some 
     special tests
+
+    Command is executed by BACKEND (see helper.backends), by default the
+    real mkdir binary is called in subprocess
+
+    INVOCATIONS counts commands built by build_command (every command is
+    executed once), so reports can show how many mkdir calls a test made
     """
     COMMAND = "mkdir"
+    BACKEND = SubprocessBackend()
+    POOL = None
+    POOL_BACKEND = None
+    INVOCATIONS = 0
+    ARGUMENT_RESERVE = 4096
+    TREE_ROUND = 65536
+    POINTER_SIZE = 8
 
     class ArgumentsName():
         """
@@ -51,18 +76,26 @@ class MkDir(object):
             self.value = argument_value
 
     @staticmethod
-    def run(directory_list, arguments_list=[]):
+    def run(directory_list, arguments_list=[], backend=None, usage=False,
+            structured=False):
         """
         This is a static method that run mkdir command.
         
         inputs:
         directory_list - list of strings is expected
         arguments_list - list of Arguments is expected
+        backend - backend that executes command, MkDir.BACKEND if not set
+        usage - when True, resources used by mkdir process are returned too
+        structured - when True, helper.result.MkDirResult is returned
+                     instead of the tuple (with record of every directory)
         
         outputs:
         exit_code - exit code of mkdir command
         stdout - stdout from mkdir command
         stderr - stderr from mkdir command
+        usage - (only if usage is True) ResourceUsage of mkdir process,
+                backends without execute_with_usage are replaced by
+                SpawnBackend
         
         Example of use:
         MkDir.run(
@@ -74,6 +107,464 @@ class MkDir(object):
             ["directory_path_name_1", "directory_path_name_2"],
             [MkDir.Arguments(MkDir.ArgumentsName.PARENTS]
             )
+
+        MkDir.run(["directory_path_name"], backend=SyscallBackend())
+
+        (exit_code, _, _, usage) = MkDir.run(["directory_path_name"],
+                                             usage=True)
+
+        mkdir_result = MkDir.run(dir_list, structured=True)
+        for directory in mkdir_result.failed():
+            print(directory.path, directory.errno)
+        """
+        call = trace.start_call()
+        command = MkDir.build_command(directory_list, arguments_list)
+        if call is not None:
+            call.build_ns = time.perf_counter_ns() - call.start_ns
+        if isinstance(command, tuple):
+            trace.finish_call(call, command, None)
+            return command + (None,) if usage else command
+
+        if backend is None:
+            backend = MkDir.BACKEND
+        if structured:
+            existed = None
+            if MkDir.has_parents(arguments_list):
+                existed = [os.path.isdir(d) for d in directory_list]
+            (exit_code, stdout, stderr) = backend.execute(command)
+            trace.finish_call(call, command, exit_code)
+            return result.parse(MkDir.COMMAND, directory_list, exit_code,
+                                stdout, stderr, existed)
+        if usage:
+            if not hasattr(backend, "execute_with_usage"):
+                backend = SpawnBackend()
+            command_result = backend.execute_with_usage(command)
+        else:
+            command_result = backend.execute(command)
+        trace.finish_call(call, command, command_result[0])
+        return command_result
+
+    @staticmethod
+    def stream(directory_list, arguments_list=[], discard=False):
+        """
+        This is a static method that start mkdir command with streaming
+        output (see helper.streaming)
+
+        inputs:
+        directory_list - list of strings is expected
+        arguments_list - list of Arguments is expected
+        discard - when True, output is thrown away (only exit code matters)
+
+        outputs:
+        StreamingRun - iteration gives ("stdout"/"stderr", line) tuples
+        as they arrive, exit_code is set at the end
+
+        Example of use:
+        mkdir_run = MkDir.stream(["a/b/c"], [
+            MkDir.Arguments(MkDir.ArgumentsName.PARENTS),
+            MkDir.Arguments(MkDir.ArgumentsName.VERBOSE)])
+        for (stream, line) in mkdir_run:
+            print(stream, line)
+        print(mkdir_run.exit_code)
+        """
+        command = MkDir.build_command(directory_list, arguments_list)
+        if isinstance(command, tuple):
+            return command
+        return StreamingRun(command, discard)
+
+    @staticmethod
+    def run_streaming(directory_list, arguments_list=[], callback=None,
+                      discard=False):
+        """
+        This is a static method that run mkdir command and call
+        callback(stream, line) for every line of output as it arrives
+
+        outputs:
+        exit_code - exit code of mkdir command
+        """
+        mkdir_run = MkDir.stream(directory_list, arguments_list,
+                                 discard or callback is None)
+        if isinstance(mkdir_run, tuple):
+            return mkdir_run
+        for (stream, line) in mkdir_run:
+            callback(stream, line)
+        return mkdir_run.exit_code
+
+    @staticmethod
+    def run_many(invocations, backend=None):
+        """
+        This is a static method that run many mkdir commands in pool of
+        persistent worker processes (MkDir.POOL, see MkDir.pool)
+
+        inputs:
+        invocations - list of (directory_list, arguments_list) tuples
+        backend - backend that executes commands in workers, MkDir.BACKEND
+                  if not set (ValueError for stateful backend)
+
+        outputs:
+        list of (exit_code, stdout, stderr) - in the same order as
+        invocations
+
+        Example of use:
+        MkDir.run_many([
+            (["directory_path_name_1"], []),
+            (["directory_path_name_2"],
+             [MkDir.Arguments(MkDir.ArgumentsName.MODE, '440')])
+            ])
+        """
+        results = [None] * len(invocations)
+        commands = []
+        indexes = []
+        for (index, (directory_list, arguments_list)) in \
+                enumerate(invocations):
+            command = MkDir.build_command(directory_list, arguments_list)
+            if isinstance(command, tuple):
+                results[index] = command
+            else:
+                commands.append(command)
+                indexes.append(index)
+
+        if not commands:
+            return results
+        command_results = MkDir.pool(backend).execute_many(commands)
+        for (index, command_result) in zip(indexes, command_results):
+            results[index] = command_result
+        return results
+
+    @staticmethod
+    def pool(backend=None):
+        """
+        This is a static method that returns pool of workers (MkDir.POOL)
+        executing commands by backend. Pool is created again when backend
+        changes and in forked process (pool of parent process is not used).
+        SubprocessBackend runs in workers as SpawnBackend (the same binary,
+        less overhead).
+
+        inputs:
+        backend - backend of workers, MkDir.BACKEND if not set, backend
+                  with STATEFUL attribute (e.g. DifferentialBackend) is
+                  rejected as its state in workers is lost
+
+        outputs:
+        helper.pool.MkDirPool
+        """
+        if backend is None:
+            backend = MkDir.BACKEND
+        if getattr(backend, "STATEFUL", False):
+            raise ValueError("%s keeps state, it can not run in pool of "
+                             "workers" % type(backend).__name__)
+        if MkDir.POOL is not None and MkDir.POOL.pid == os.getpid() and \
+                MkDir.POOL_BACKEND is backend:
+            return MkDir.POOL
+        if MkDir.POOL is not None:
+            MkDir.POOL.close()
+        MkDir.POOL = MkDirPool(backend=SpawnBackend() if type(backend) is
+                               SubprocessBackend else backend)
+        MkDir.POOL_BACKEND = backend
+        atexit.register(MkDir.POOL.close)
+        return MkDir.POOL
+
+    @staticmethod
+    def run_bulk(directory_list, arguments_list=[], backend=None,
+                 concurrent=False):
+        """
+        This is a static method that run mkdir command for huge directory
+        list. The list is split to the largest batches that fit to ARG_MAX
+        (minus environment), so E2BIG is never raised.
+
+        inputs:
+        directory_list - list of strings is expected
+        arguments_list - list of Arguments is expected
+        backend - backend that executes command, MkDir.BACKEND if not set
+        concurrent - when True, batches run in pool of workers by backend
+                     (run_many)
+
+        outputs:
+        exit_code - the highest exit code of all batches
+        stdout - stdout of all batches
+        stderr - stderr of all batches
+        statuses - list of booleans, True if directory was created
+                   (or exists with parents argument), in the same order
+                   as directory_list
+
+        Example of use:
+        (exit_code, _, stderr, statuses) = MkDir.run_bulk(
+            ["directory_%d" % idx for idx in range(1000000)],
+            [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)],
+            concurrent=True)
+        """
+        if not isinstance(directory_list, list):
+            return ("Directories list is not a list", None, None, None)
+
+        batches = list(MkDir.split_directory_list(directory_list,
+                                                  arguments_list))
+        if concurrent:
+            results = MkDir.run_many(
+                [(batch, arguments_list) for batch in batches], backend)
+        else:
+            results = [MkDir.run(batch, arguments_list, backend)
+                       for batch in batches]
+
+        exit_code = 0
+        stdout = []
+        stderr = []
+        statuses = []
+        for (batch, (batch_exit_code, batch_stdout, batch_stderr)) in \
+                zip(batches, results):
+            if not isinstance(batch_exit_code, int):
+                return (batch_exit_code, None, None, None)
+            exit_code = max(exit_code, batch_exit_code)
+            stdout.append(batch_stdout)
+            stderr.append(batch_stderr)
+            parsed = result.parse(MkDir.COMMAND, batch, batch_exit_code,
+                                  batch_stdout, batch_stderr, stat_mode=False)
+            statuses.extend(d.state != result.FAILED
+                            for d in parsed.directories)
+        return (exit_code, "".join(stdout), "".join(stderr), statuses)
+
+    @staticmethod
+    def create_tree(spec, root=".", arguments_list=[], backend=None,
+                    concurrent=False, checkpoint=None, progress=None):
+        """
+        This is a static method that create large directory tree (see
+        helper.tree). Directories are deduplicated and created level by
+        level (breadth-first), every directory once and after its parent,
+        so -p is not needed. Directories that already exist are counted
+        as existed (non-directory in the way fails with ENOTDIR), subtrees
+        of failed directories are skipped.
+
+        inputs:
+        spec - nested dictionary (name -> children or None), string with
+               one relative path per line or iterable of lines (open file)
+        root - existing folder where the tree is created
+        arguments_list - list of Arguments used for every directory
+                         (e.g. mode)
+        backend - backend that executes command, MkDir.BACKEND if not set
+        concurrent - when True, every round is split between workers of
+                     pool executing backend (run_many, ValueError for
+                     stateful backend)
+        checkpoint - path of checkpoint file, progress is stored after
+                     every round of TREE_ROUND directories and the next
+                     run with the same tree continues where it stopped
+        progress - callback(tree_result) called after every round
+
+        outputs:
+        helper.tree.TreeResult - counts, failed directories, dirs/sec
+
+        Example of use:
+        tree_result = MkDir.create_tree(
+            {"tenant": {"project_1": None, "project_2": {"src": None}}},
+            "/tmp/trees",
+            [MkDir.Arguments(MkDir.ArgumentsName.MODE, '750')],
+            concurrent=True, checkpoint="/tmp/trees.checkpoint")
+        """
+        levels = tree_levels(spec)
+        state = TreeCheckpoint(checkpoint, levels_digest(
+            root, levels, [a.name + a.value for a in arguments_list]))
+        tree_result = TreeResult(sum(len(level) for level in levels))
+        tree_result.failed = list(state.failed)
+        tree_result.skipped = len(state.skipped)
+        tree_result.resumed = sum(len(level)
+                                  for level in levels[:state.depth])
+        tree_result.resumed += state.done - len(state.failed) - \
+            len(state.skipped)
+        failed = set(path for (path, _) in state.failed)
+        failed.update(state.skipped)
+        skipped = list(state.skipped)
+        workers = MkDir.pool(backend).workers if concurrent else 1
+
+        for depth in range(state.depth, len(levels)):
+            level = levels[depth]
+            start = state.done if depth == state.depth else 0
+            for offset in range(start, len(level), MkDir.TREE_ROUND):
+                round_list = []
+                for path in level[offset:offset + MkDir.TREE_ROUND]:
+                    if failed and os.path.dirname(path) in failed:
+                        failed.add(path)
+                        skipped.append(path)
+                        tree_result.skipped += 1
+                    else:
+                        round_list.append(path)
+                for (path, error) in MkDir._create_level(
+                        root, round_list, arguments_list, backend, workers,
+                        tree_result):
+                    failed.add(path)
+                    tree_result.failed.append((path, error))
+
+                state.depth = depth
+                state.done = min(offset + MkDir.TREE_ROUND, len(level))
+                if state.done == len(level):
+                    (state.depth, state.done) = (depth + 1, 0)
+                state.failed = sorted(tree_result.failed)
+                state.skipped = sorted(skipped)
+                state.save()
+                tree_result.update_time()
+                if progress is not None:
+                    progress(tree_result)
+        tree_result.update_time()
+        return tree_result
+
+    @staticmethod
+    def _create_level(root, paths, arguments_list, backend, workers,
+                      tree_result):
+        """
+        Helper function - create directories of one round (their parents
+        exist), created and existed directories are counted to tree_result
+        (EEXIST of non-directory is failure with ENOTDIR)
+
+        outputs:
+        generator of (relative path, errno) of failed directories
+        """
+        per_worker = -(-len(paths) // workers) if paths else 0
+        batches = []
+        for index in range(0, len(paths), max(per_worker, 1)):
+            batches.extend(MkDir.split_directory_list(
+                [os.path.join(root, path)
+                 for path in paths[index:index + per_worker]],
+                arguments_list))
+        if workers > 1:
+            results = MkDir.run_many(
+                [(batch, arguments_list) for batch in batches], backend)
+        else:
+            results = [MkDir.run(batch, arguments_list, backend)
+                       for batch in batches]
+        tree_result.invocations += len(batches)
+
+        skip = len(os.path.join(root, ""))
+        for (batch, (exit_code, stdout, stderr)) in zip(batches, results):
+            if not isinstance(exit_code, int):
+                raise ValueError(exit_code)
+            parsed = result.parse(MkDir.COMMAND, batch, exit_code, stdout,
+                                  stderr, stat_mode=False)
+            for directory in parsed.directories:
+                if directory.state != result.FAILED:
+                    tree_result.created += 1
+                elif directory.errno != errno.EEXIST:
+                    yield (directory.path[skip:], directory.errno)
+                else:
+                    try:
+                        is_directory = stat.S_ISDIR(
+                            os.lstat(directory.path).st_mode)
+                    except OSError:
+                        is_directory = False
+                    if is_directory:
+                        tree_result.existed += 1
+                    else:
+                        yield (directory.path[skip:], errno.ENOTDIR)
+
+    @staticmethod
+    def has_parents(arguments_list):
+        """
+        Check if parents argument (short or long) is in arguments list
+        """
+        return any(arguments.name in (MkDir.ArgumentsName.PARENTS,
+                                      MkDir.ArgumentsName.PARENTS_LONG)
+                   for arguments in arguments_list)
+
+    @staticmethod
+    def split_directory_list(directory_list, arguments_list=[]):
+        """
+        Split directory list to the largest batches that fit to argument
+        limit (see argument_limit)
+
+        outputs:
+        generator of lists of directories
+        """
+        limit = MkDir.argument_limit(arguments_list)
+        batch = []
+        size = 0
+        for directory in directory_list:
+            item_size = len(os.fsencode(directory)) + 1 + MkDir.POINTER_SIZE
+            if batch and size + item_size > limit:
+                yield batch
+                batch = []
+                size = 0
+            batch.append(directory)
+            size += item_size
+        if batch:
+            yield batch
+
+    @staticmethod
+    def argument_limit(arguments_list=[]):
+        """
+        Bytes available for directories in argv: ARG_MAX minus environment,
+        command, arguments and a reserve (every string takes its bytes,
+        terminating zero and a pointer)
+        """
+        used = sum(len(os.fsencode(key)) + len(os.fsencode(value)) + 2 +
+                   MkDir.POINTER_SIZE
+                   for (key, value) in os.environ.items())
+        used += len(MkDir.COMMAND) + 1 + MkDir.POINTER_SIZE
+        for arguments in arguments_list:
+            used += len(os.fsencode(arguments.name + arguments.value)) + 1 + \
+                MkDir.POINTER_SIZE
+        return os.sysconf("SC_ARG_MAX") - used - MkDir.ARGUMENT_RESERVE
+
+    @staticmethod
+    async def arun(directory_list, arguments_list=[]):
+        """
+        This is a static coroutine that run mkdir command by asyncio
+        subprocess, so many commands can wait for mkdir at once
+
+        inputs and outputs are the same as in run
+
+        Example of use:
+        (exit_code, stdout, stderr) = await MkDir.arun(["directory"])
+        """
+        # asyncio is imported here, it is slow to import for every run
+        import asyncio
+        command = MkDir.build_command(directory_list, arguments_list)
+        if isinstance(command, tuple):
+            return command
+
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+        (stdout, stderr) = await proc.communicate()
+
+        exit_code = proc.returncode
+        try:
+            return (exit_code, stdout.decode(), stderr.decode())
+        except Exception as e:
+            return (1, "", str(e))
+
+    @staticmethod
+    async def agather(invocations, limit=64):
+        """
+        This is a static coroutine that run many mkdir commands by arun,
+        at most limit commands are running at once
+
+        inputs:
+        invocations - list of (directory_list, arguments_list) tuples
+        limit - maximal number of running mkdir processes
+
+        outputs:
+        list of (exit_code, stdout, stderr) - in the same order as
+        invocations
+
+        Example of use:
+        results = asyncio.run(MkDir.agather(invocations, limit=256))
+        """
+        import asyncio
+        semaphore = asyncio.Semaphore(limit)
+
+        async def run_limited(directory_list, arguments_list):
+            async with semaphore:
+                return await MkDir.arun(directory_list, arguments_list)
+
+        return await asyncio.gather(
+            *[run_limited(directory_list, arguments_list)
+              for (directory_list, arguments_list) in invocations])
+
+    @staticmethod
+    def build_command(directory_list, arguments_list):
+        """
+        Build final command for mkdir
+
+        outputs:
+        list of strings - command
+        or tuple with error description (the same as returned by run)
         """
         if not isinstance(directory_list, list):
             return ("Directories list is not a list", None, None)
@@ -88,16 +579,5 @@ class MkDir(object):
                 return ("Arguments are not valid type", None, None)
 
             command.append(arguments.name + arguments.value)
-
-        proc = subprocess.run(command,
-                              stdout=subprocess.PIPE,
-                              stderr=subprocess.PIPE)
-
-        exit_code = proc.returncode
-        try:
-            stdout = proc.stdout.decode()
-            stderr = proc.stderr.decode()
-            return (exit_code, stdout, stderr)
-        except Exception as e:
-            return (1, "", str(e))
-        
+        MkDir.INVOCATIONS += 1
+        return command
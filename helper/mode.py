@@ -0,0 +1,223 @@
+"""
+Helper functions for file mode (as in chmod)
+
+It follows the way how GNU mkdir computes mode of a new directory from
+-m/--mode argument: mode string is compiled to list of changes and changes
+are applied to a=rwx.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+import stat
+
+CHMOD_MODE_BITS = 0o7777
+ALL_RWX = 0o777
+
+
+class ModeChange(object):
+    """
+    One change of mode - e.g. "u+rw" or "=440"
+    """
+    ORDINARY = "ordinary"
+    COPY_EXISTING = "copy"
+    X_IF_ANY_X = "X"
+
+    def __init__(self, operation, flag, affected, value, mentioned):
+        self.operation = operation
+        self.flag = flag
+        self.affected = affected
+        self.value = value
+        self.mentioned = mentioned
+
+
+def compile_mode(mode_string):
+    """
+    Compile mode string to list of ModeChange
+
+    inputs:
+    mode_string - octal ("440") or symbolic ("u+rwx,g-w,o=") mode
+
+    outputs:
+    list of ModeChange or None if mode is not valid
+    """
+    if mode_string[:1] in "01234567" and mode_string:
+        if any(c not in "01234567" for c in mode_string):
+            return None
+        octal_mode = int(mode_string, 8)
+        if octal_mode > CHMOD_MODE_BITS:
+            return None
+        if len(mode_string) < 5:
+            mentioned = (octal_mode & (stat.S_ISUID | stat.S_ISGID)) | \
+                stat.S_ISVTX | ALL_RWX
+        else:
+            mentioned = CHMOD_MODE_BITS
+        return [ModeChange("=", ModeChange.ORDINARY, CHMOD_MODE_BITS,
+                           octal_mode, mentioned)]
+
+    changes = []
+    position = 0
+    length = len(mode_string)
+    while True:
+        affected = 0
+        while position < length and mode_string[position] in "ugoa":
+            affected |= {"u": stat.S_ISUID | stat.S_IRWXU,
+                         "g": stat.S_ISGID | stat.S_IRWXG,
+                         "o": stat.S_ISVTX | stat.S_IRWXO,
+                         "a": CHMOD_MODE_BITS}[mode_string[position]]
+            position += 1
+        if position >= length or mode_string[position] not in "=+-":
+            return None
+
+        while position < length and mode_string[position] in "=+-":
+            operation = mode_string[position]
+            position += 1
+            change_affected = affected
+            mentioned = 0
+            flag = ModeChange.COPY_EXISTING
+            char = mode_string[position:position + 1]
+            if char and char in "01234567":
+                start = position
+                while position < length and \
+                        mode_string[position] in "01234567":
+                    position += 1
+                value = int(mode_string[start:position], 8)
+                if value > CHMOD_MODE_BITS or affected or \
+                        mode_string[position:position + 1] not in ("", ","):
+                    return None
+                change_affected = mentioned = CHMOD_MODE_BITS
+                flag = ModeChange.ORDINARY
+            elif char and char in "ugo":
+                value = {"u": stat.S_IRWXU,
+                         "g": stat.S_IRWXG,
+                         "o": stat.S_IRWXO}[char]
+                position += 1
+            else:
+                value = 0
+                flag = ModeChange.ORDINARY
+                while position < length and \
+                        mode_string[position] in "rwxXst":
+                    char = mode_string[position]
+                    if char == "r":
+                        value |= stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+                    elif char == "w":
+                        value |= stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+                    elif char == "x":
+                        value |= stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+                    elif char == "X":
+                        flag = ModeChange.X_IF_ANY_X
+                    elif char == "s":
+                        value |= stat.S_ISUID | stat.S_ISGID
+                    else:
+                        value |= stat.S_ISVTX
+                    position += 1
+            if not mentioned:
+                mentioned = change_affected & value if change_affected \
+                    else value
+            changes.append(ModeChange(operation, flag, change_affected,
+                                      value, mentioned))
+
+        if position >= length:
+            return changes
+        if mode_string[position] != ",":
+            return None
+        position += 1
+
+
+def adjust_mode(old_mode, is_directory, umask, changes):
+    """
+    Apply list of ModeChange to the old_mode
+
+    inputs:
+    old_mode - mode before change (mkdir uses a=rwx)
+    is_directory - True for directories
+    umask - umask applied to changes without "who" (u, g, o, a)
+    changes - list of ModeChange
+
+    outputs:
+    new_mode - adjusted mode
+    mode_bits - bits that were explicitly mentioned by changes
+    """
+    new_mode = old_mode & CHMOD_MODE_BITS
+    mode_bits = 0
+    all_x = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+    for change in changes:
+        affected = change.affected
+        omit_change = (stat.S_ISUID | stat.S_ISGID if is_directory else 0) \
+            & ~change.mentioned
+        value = change.value
+        if change.flag == ModeChange.COPY_EXISTING:
+            value &= new_mode
+            copied = 0
+            if value & (stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH):
+                copied |= stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+            if value & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH):
+                copied |= stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+            if value & all_x:
+                copied |= all_x
+            value |= copied
+        elif change.flag == ModeChange.X_IF_ANY_X:
+            if (new_mode & all_x) or is_directory:
+                value |= all_x
+
+        value &= (affected if affected else ~umask) & ~omit_change
+
+        if change.operation == "=":
+            preserved = (~affected if affected else 0) | omit_change
+            mode_bits |= CHMOD_MODE_BITS & ~preserved
+            new_mode = (new_mode & preserved) | value
+        elif change.operation == "+":
+            mode_bits |= value
+            new_mode |= value
+        else:
+            mode_bits |= value
+            new_mode &= ~value
+    return (new_mode & CHMOD_MODE_BITS, mode_bits & CHMOD_MODE_BITS)
+
+
+def directory_mode(mode, mode_bits, umask):
+    """
+    Final mode of directory created by mkdir -m
+
+    mkdir creates the directory with umask cleared for bits of mode.
+    When special bits are involved (set-user/group-ID mentioned or sticky
+    bit set), it is created without group/other write permission first and
+    chmod is called only if bits mentioned by mode string differ
+
+    inputs:
+    mode, mode_bits - output of adjust_mode
+    umask - current umask
+
+    outputs:
+    mode of new directory (parent without set-group-ID bit is expected)
+    """
+    keep_special = not ((mode_bits & (stat.S_ISUID | stat.S_ISGID)) or
+                        (mode & stat.S_ISVTX))
+    mkdir_mode = mode if keep_special else \
+        mode & ~(stat.S_IWGRP | stat.S_IWOTH)
+    created = mkdir_mode & ~(umask & ~mode) & (stat.S_ISVTX | ALL_RWX)
+    if keep_special or not (created ^ mode) & mode_bits:
+        return created
+    return mode | (created & ~mode_bits)
+
+
+def get_umask():
+    """
+    Helper function to read current umask (there is no getter in os module)
+
+    Umask is read from /proc/self/status, so it is not changed even for
+    a moment (other threads may create files at the same time). os.umask
+    is used only when the field is not available (kernel older than 4.7)
+    """
+    try:
+        fd = os.open("/proc/self/status", os.O_RDONLY)
+        try:
+            status = os.read(fd, 4096)
+        finally:
+            os.close(fd)
+        start = status.index(b"\nUmask:") + 7
+        return int(status[start:status.index(b"\n", start)], 8)
+    except (OSError, ValueError):
+        umask = os.umask(0)
+        os.umask(umask)
+        return umask
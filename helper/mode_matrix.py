@@ -0,0 +1,172 @@
+"""
+Generated matrix of -m/--mode values
+
+Mode values are generated (whole octal space and combinations of symbolic
+clauses), expected mode of created directory is computed by oracle
+(helper.mode - the same algorithm as GNU mkdir uses, current umask is
+taken into account) and all modes are created in one sandbox by pool of
+workers (helper.pool).
+
+Example of use:
+    outcomes = run_matrix("/tmp/mkdir_test", octal_modes())
+    print(format_table(mismatches(outcomes)))
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import functools
+import itertools
+import os
+import stat
+
+from helper.mkdir import MkDir
+from helper.mode import adjust_mode, compile_mode, directory_mode, \
+    get_umask
+from helper.pool import MkDirPool
+
+WHO = ("", "u", "g", "o", "a", "ug", "go", "uo")
+OPERATIONS = ("+", "-", "=")
+PERMISSIONS = ("", "r", "w", "x", "rw", "rx", "wx", "rwx", "X", "s", "t",
+               "u", "g", "o")
+CLAUSE_PERMISSIONS = ("", "r", "x", "rwx")
+
+
+class ModeOutcome(object):
+    """
+    Result of one mode
+
+    mode_string - value of --mode
+    expected - mode expected by oracle (None if mode is not valid)
+    actual - mode of created directory (None if directory was not created)
+    """
+    __slots__ = ("mode_string", "expected", "actual", "exit_code", "stderr")
+
+    def __init__(self, mode_string, expected, actual, exit_code, stderr):
+        self.mode_string = mode_string
+        self.expected = expected
+        self.actual = actual
+        self.exit_code = exit_code
+        self.stderr = stderr
+
+    def matches(self):
+        if self.expected is None:
+            return self.exit_code != 0 and self.actual is None
+        return self.exit_code == 0 and self.actual == self.expected
+
+
+def octal_modes():
+    """
+    All octal modes - 3 digits (000 - 777) and 4 digits (0000 - 7777)
+    3 digit modes keep set-user/group-ID bits of directory, so both forms
+    are generated
+    """
+    return ["%03o" % mode for mode in range(0o1000)] + \
+        ["%04o" % mode for mode in range(0o10000)]
+
+
+def symbolic_clauses():
+    """
+    Every single symbolic clause (who, operation, permissions) - clauses
+    without "who" depend on umask
+    """
+    return ["%s%s%s" % clause
+            for clause in itertools.product(WHO, OPERATIONS, PERMISSIONS)]
+
+
+def symbolic_combinations():
+    """
+    Combinations "u..,g..,o.." of the common clauses (independent of umask)
+    """
+    clauses = ["%s%s" % clause for clause in
+               itertools.product(OPERATIONS, CLAUSE_PERMISSIONS)]
+    return ["u%s,g%s,o%s" % combination
+            for combination in itertools.product(clauses, repeat=3)]
+
+
+def symbolic_modes():
+    return symbolic_clauses() + symbolic_combinations()
+
+
+@functools.lru_cache(maxsize=None)
+def expected_mode(mode_string, umask):
+    """
+    Oracle - permission bits of directory created by mkdir --mode
+
+    outputs:
+    mode (e.g. 0o755) or None if mode string is not valid
+    """
+    changes = compile_mode(mode_string)
+    if changes is None:
+        return None
+    (mode, mode_bits) = adjust_mode(stat.S_IRWXU | stat.S_IRWXG |
+                                    stat.S_IRWXO, True, umask, changes)
+    return directory_mode(mode, mode_bits, umask)
+
+
+def run_matrix(root, mode_strings, umask=None, workers=None):
+    """
+    Create one directory for every mode in root and compare its mode with
+    the oracle
+
+    inputs:
+    root - existing (empty) directory
+    mode_strings - values of --mode
+    umask - umask of mkdir processes, current umask if not set
+    workers - number of pool workers
+
+    outputs:
+    list of ModeOutcome in the same order as mode_strings
+    """
+    old_umask = None if umask is None else os.umask(umask)
+    try:
+        current_umask = get_umask()
+        invocations = [
+            ([os.path.join(root, "m%d" % index)],
+             [MkDir.Arguments(MkDir.ArgumentsName.MODE_LONG, mode_string)])
+            for (index, mode_string) in enumerate(mode_strings)]
+        commands = [MkDir.build_command(directory_list, arguments_list)
+                    for (directory_list, arguments_list) in invocations]
+        # workers are forked here, so they inherit the umask
+        with MkDirPool(workers) as pool:
+            results = pool.execute_many(commands)
+    finally:
+        if old_umask is not None:
+            os.umask(old_umask)
+
+    modes = {}
+    with os.scandir(root) as entries:
+        for entry in entries:
+            modes[entry.name] = stat.S_IMODE(
+                entry.stat(follow_symlinks=False).st_mode)
+    outcomes = []
+    for (index, (mode_string, (exit_code, _, stderr))) in \
+            enumerate(zip(mode_strings, results)):
+        outcomes.append(ModeOutcome(
+            mode_string, expected_mode(mode_string, current_umask),
+            modes.get("m%d" % index), exit_code, stderr))
+    return outcomes
+
+
+def mismatches(outcomes):
+    return [outcome for outcome in outcomes if not outcome.matches()]
+
+
+def format_table(outcomes):
+    """
+    Compact table of outcomes (mode, expected, actual, exit code, error)
+    """
+    def format_mode(mode):
+        return "invalid" if mode is None else "%04o" % mode
+
+    def format_actual(outcome):
+        return "-" if outcome.actual is None else "%04o" % outcome.actual
+
+    width = max([len("mode")] + [len(o.mode_string) for o in outcomes])
+    lines = ["%-*s %-8s %-8s %4s %s" % (width, "mode", "expected", "actual",
+                                        "exit", "stderr")]
+    for outcome in outcomes:
+        lines.append("%-*s %-8s %-8s %4d %s" % (
+            width, outcome.mode_string, format_mode(outcome.expected),
+            format_actual(outcome), outcome.exit_code,
+            outcome.stderr.strip().split("\n")[0]))
+    return "\n".join(lines)
@@ -0,0 +1,155 @@
+"""
+Persistent pool of mkdir launcher processes
+
+Pool workers are forked once and then they get batches of commands over
+a pipe. Every worker executes its batch by backend of the pool
+(SpawnBackend by default) and sends results back, so cost of starting
+Python worker is paid only once and many mkdir invocations run in
+parallel.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import multiprocessing
+import os
+
+from helper.backends import SpawnBackend
+
+
+def _worker(connection, backend):
+    """
+    Worker loop - execute batches of commands until None is received
+    """
+    if backend is None:
+        backend = SpawnBackend()
+    while True:
+        try:
+            commands = connection.recv()
+        except EOFError:
+            break
+        if commands is None:
+            break
+        results = []
+        for command in commands:
+            try:
+                results.append(backend.execute(command))
+            except Exception as e:
+                results.append((1, "", str(e)))
+        connection.send(results)
+    connection.close()
+
+
+class MkDirPool(object):
+    """
+    Pool of worker processes executing mkdir commands
+
+    Backend is given when workers are forked (it is inherited, never sent
+    to workers), so state of backend in workers is not seen by the caller.
+    Pool belongs to the process that created it - processes forked later
+    shall create their own pool. Batch of a worker that died is reported
+    as failed and the worker is started again.
+
+    Example of use:
+    with MkDirPool(8) as pool:
+        results = pool.execute_many([["mkdir", "a"], ["mkdir", "b"]])
+    """
+    def __init__(self, workers=None, backend=None):
+        self.workers = workers if workers else os.cpu_count() or 1
+        self.backend = backend
+        self.pid = os.getpid()
+        self.context = multiprocessing.get_context("fork")
+        self.processes = [None] * self.workers
+        self.connections = [None] * self.workers
+        for index in range(self.workers):
+            self.__start(index)
+
+    def __start(self, index):
+        (parent_end, child_end) = self.context.Pipe()
+        process = self.context.Process(target=_worker,
+                                       args=(child_end, self.backend),
+                                       daemon=True)
+        process.start()
+        child_end.close()
+        self.processes[index] = process
+        self.connections[index] = parent_end
+
+    def __restart(self, index):
+        """
+        Replace worker that died (or does not respond)
+        """
+        self.connections[index].close()
+        process = self.processes[index]
+        process.join(1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        exit_code = process.exitcode
+        self.__start(index)
+        return exit_code
+
+    def execute_many(self, commands):
+        """
+        Execute list of commands in workers
+
+        inputs:
+        commands - list of commands (lists of strings)
+
+        outputs:
+        list of (exit_code, stdout, stderr) in the same order as commands,
+        commands of a worker that died fail with exit code 1
+        """
+        if self.pid != os.getpid():
+            raise ValueError("Pool belongs to process %d" % self.pid)
+        if not self.connections:
+            raise ValueError("Pool is closed")
+        batch_size = -(-len(commands) // self.workers)
+        used = []
+        for (index, connection) in enumerate(self.connections):
+            batch = commands[index * batch_size:(index + 1) * batch_size]
+            if not batch:
+                continue
+            if not self.processes[index].is_alive():
+                self.__restart(index)
+                connection = self.connections[index]
+            try:
+                connection.send(batch)
+            except OSError:
+                used.append((index, batch, False))
+                continue
+            used.append((index, batch, True))
+
+        results = []
+        for (index, batch, sent) in used:
+            if sent:
+                try:
+                    results.extend(self.connections[index].recv())
+                    continue
+                except (EOFError, OSError):
+                    pass
+            exit_code = self.__restart(index)
+            results.extend((1, "", "mkdir pool worker exited with %s\n" %
+                            exit_code) for _ in batch)
+        return results
+
+    def close(self):
+        """
+        Stop all workers (pool inherited by forked process is only
+        dropped, workers belong to the parent process)
+        """
+        if self.pid == os.getpid():
+            for connection in self.connections:
+                try:
+                    connection.send(None)
+                except (OSError, ValueError):
+                    pass
+                connection.close()
+            for process in self.processes:
+                process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,245 @@
+"""
+Machine readable reports of test run
+
+Every test is reported as soon as it finishes (nothing is buffered till
+the end of the run):
+* JsonLinesReporter - one JSON object per line (id, status, duration,
+  number of mkdir invocations, CPU time of child processes, worker)
+* JUnitReporter - JUnit XML, test cases are written as they finish and
+  counters of the test suite are filled in when the report is closed
+  (output that can not seek, e.g. stdout, gets whole report at close)
+* PassFailReporter - "[PASS] <description>" / "[FAIL] <description,
+  explanation>" lines
+
+Example of use:
+    reporter = JsonLinesReporter(open("results.jsonl", "w"))
+    probe = Probe()
+    ... run test ...
+    reporter.record(TestRecord(test.id(), "ok", *probe.stop()))
+    reporter.close()
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import json
+import os
+import re
+import resource
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+from helper import trace
+from helper.mkdir import MkDir
+
+PASSED = ("ok", "skipped", "expected failure")
+"""
+Characters that are not allowed in XML 1.0 (control characters, lone
+surrogates of undecodable output, U+FFFE and U+FFFF)
+"""
+INVALID_XML = re.compile("[^\t\n\r\u0020-\ud7ff\ue000-\ufffd"
+                         "\U00010000-\U0010ffff]")
+
+
+def xml_text(text):
+    """
+    Helper function - escaped text with invalid XML characters replaced
+    by U+FFFD
+    """
+    return escape(INVALID_XML.sub("\ufffd", text))
+
+
+def xml_attribute(value):
+    """
+    Helper function - quoted attribute value with invalid XML characters
+    replaced by U+FFFD
+    """
+    return quoteattr(INVALID_XML.sub("\ufffd", value))
+
+
+class Probe(object):
+    """
+    Measurement of one test - duration, mkdir invocations and CPU time of
+    child processes (waited children, e.g. mkdir started by backends)
+    When tracing is active (helper.trace), calls are assigned to the test
+    """
+    def __init__(self, test_id=None):
+        self.test_id = test_id
+        self.trace_position = None
+        if trace.TRACER is not None:
+            self.trace_position = trace.TRACER.start_test(test_id)
+        self.invocations = MkDir.INVOCATIONS
+        self.cpu_time = self._children_cpu_time()
+        self.start_time = time.perf_counter_ns()
+
+    @staticmethod
+    def _children_cpu_time():
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    def stop(self):
+        """
+        outputs:
+        (duration_ns, invocations, cpu_time)
+        """
+        measurement = (time.perf_counter_ns() - self.start_time,
+                       MkDir.INVOCATIONS - self.invocations,
+                       self._children_cpu_time() - self.cpu_time)
+        if self.trace_position is not None:
+            trace.TRACER.stop_test(self.test_id, measurement[0])
+        return measurement
+
+    def traced_calls(self):
+        """
+        Calls traced during the test (empty list if tracing is not active)
+        """
+        if self.trace_position is None:
+            return []
+        return trace.TRACER.calls_since(self.trace_position)
+
+
+class TestRecord(object):
+    """
+    Result of one test
+    """
+    __slots__ = ("test_id", "status", "duration_ns", "invocations",
+                 "cpu_time", "details", "description", "cached", "worker")
+
+    def __init__(self, test_id, status, duration_ns=0, invocations=0,
+                 cpu_time=0.0, details="", description=None, cached=False,
+                 worker=None):
+        self.test_id = test_id
+        self.status = status
+        self.duration_ns = duration_ns
+        self.invocations = invocations
+        self.cpu_time = cpu_time
+        self.details = details
+        self.description = description
+        self.cached = cached
+        self.worker = worker if worker else os.getpid()
+
+
+class JsonLinesReporter(object):
+    def __init__(self, output):
+        self.output = output
+
+    def record(self, test_record):
+        self.output.write(json.dumps({
+            "id": test_record.test_id,
+            "status": test_record.status,
+            "duration_ns": test_record.duration_ns,
+            "mkdir_invocations": test_record.invocations,
+            "child_cpu_time": round(test_record.cpu_time, 6),
+            "cached": test_record.cached,
+            "worker": test_record.worker,
+            }) + "\n")
+        self.output.flush()
+
+    def close(self):
+        if self.output.fileno() > 2:
+            self.output.close()
+
+
+class JUnitReporter(object):
+    """
+    JUnit XML written as the tests finish. Counters of testsuite element
+    are not known at the beginning, so space is reserved in the start tag
+    and filled in by close (whitespace between attributes is valid XML).
+    Standard streams and outputs that can not seek (pipe) get whole report
+    at close.
+    """
+    RESERVED = 160
+
+    def __init__(self, output, name="mkdir_test"):
+        self.output = output
+        self.name = name
+        self.counters = {"tests": 0, "failures": 0, "errors": 0,
+                         "skipped": 0}
+        self.start_time = time.time()
+        self.pending = None
+        if self.output.fileno() <= 2 or not self.output.seekable():
+            self.pending = []
+            return
+        self.output.write(self.header())
+        self.output.flush()
+        self.reserved_at = self.output.tell()
+        self.output.write(" " * self.RESERVED + ">\n")
+        self.output.flush()
+
+    def header(self):
+        return '<?xml version="1.0" encoding="UTF-8"?>\n' \
+            '<testsuite name=%s' % xml_attribute(self.name)
+
+    def attributes(self):
+        attributes = "".join(' %s="%d"' % item
+                             for item in self.counters.items())
+        return attributes + ' time="%.3f"' % (time.time() - self.start_time)
+
+    def record(self, test_record):
+        (class_name, _, name) = test_record.test_id.rpartition(".")
+        self.counters["tests"] += 1
+        lines = ['  <testcase classname=%s name=%s time="%.6f">' % (
+            xml_attribute(class_name), xml_attribute(name),
+            test_record.duration_ns / 1e9)]
+        lines.append('    <properties>')
+        for (key, value) in (("mkdir_invocations", test_record.invocations),
+                             ("child_cpu_time",
+                              "%.6f" % test_record.cpu_time),
+                             ("cached", str(test_record.cached).lower())):
+            lines.append('      <property name="%s" value="%s"/>' % (
+                key, value))
+        lines.append('    </properties>')
+        message = test_record.details.strip().split("\n")[-1] \
+            if test_record.details else ""
+        if test_record.status == "FAIL" or \
+                test_record.status == "unexpected success":
+            self.counters["failures"] += 1
+            lines.append('    <failure message=%s>%s</failure>' % (
+                xml_attribute(message), xml_text(test_record.details)))
+        elif test_record.status == "ERROR":
+            self.counters["errors"] += 1
+            lines.append('    <error message=%s>%s</error>' % (
+                xml_attribute(message), xml_text(test_record.details)))
+        elif test_record.status == "skipped":
+            self.counters["skipped"] += 1
+            lines.append('    <skipped message=%s/>' %
+                         xml_attribute(message))
+        lines.append('  </testcase>\n')
+        if self.pending is not None:
+            self.pending.append("\n".join(lines))
+            return
+        self.output.write("\n".join(lines))
+        self.output.flush()
+
+    def close(self):
+        if self.pending is not None:
+            self.output.write(self.header() + self.attributes() + ">\n" +
+                              "".join(self.pending) + "</testsuite>\n")
+            self.output.flush()
+        else:
+            self.output.write("</testsuite>\n")
+            self.output.flush()
+            self.output.seek(self.reserved_at)
+            self.output.write(self.attributes().ljust(self.RESERVED))
+        if self.output.fileno() > 2:
+            self.output.close()
+
+
+class PassFailReporter(object):
+    """
+    [PASS]/[FAIL] lines for every check
+    """
+    def __init__(self, output):
+        self.output = output
+
+    def record(self, test_record):
+        description = test_record.description or test_record.test_id
+        if test_record.status in PASSED:
+            self.output.write("[PASS] %s\n" % description)
+        else:
+            explanation = test_record.details.strip().split("\n")[-1] \
+                if test_record.details else test_record.status
+            self.output.write("[FAIL] %s, %s\n" % (description, explanation))
+        self.output.flush()
+
+    def close(self):
+        pass
@@ -0,0 +1,179 @@
+"""
+Allocation of unique sandbox folders
+
+Every process (main process and every worker) gets its own run folder
+created atomically by tempfile.mkdtemp in base folder, so more runs on
+the same host never share a folder and no lock is needed. Every test gets
+a new folder path inside of the run folder.
+
+Run folder contains lease file (host, pid and start time of the process).
+Run folders of processes that do not run any more (crashed runs) are
+reclaimed - renamed first (only one reclaiming run wins the rename), file
+systems mounted inside are unmounted and the folder is removed.
+
+Example of use:
+    allocator = SandboxAllocator("/var/tmp")
+    path = allocator.test_path()
+    ... storage.setup(path), test, storage.cleanup(path) ...
+    allocator.release()
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import json
+import os
+import socket
+import tempfile
+import time
+from multiprocessing import util
+
+from helper.cleanup import remove_tree
+from helper.storage import umount
+
+PREFIX = "mkdir_test_"
+LEASE = "lease"
+BASE_VARIABLE = "MKDIR_TEST_SANDBOX_BASE"
+GRACE_PERIOD = 60
+
+
+def process_start_time(pid):
+    """
+    Helper function - start time of process (clock ticks since boot),
+    None if process does not exist (pid and start time identify process
+    even when pid is reused)
+    """
+    try:
+        with open("/proc/%d/stat" % pid) as source:
+            fields = source.read().rpartition(")")[2].split()
+    except OSError:
+        return None
+    return int(fields[19])
+
+
+def is_stale(path, now=None):
+    """
+    Check if run folder belongs to process that does not run any more
+    (folder without lease is stale after GRACE_PERIOD seconds - the
+    process crashed between mkdtemp and writing of lease)
+    """
+    try:
+        with open(os.path.join(path, LEASE)) as source:
+            lease = json.load(source)
+    except (OSError, ValueError):
+        try:
+            age = (now or time.time()) - os.lstat(path).st_mtime
+        except OSError:
+            return False
+        return age > GRACE_PERIOD
+    if lease.get("host") != socket.gethostname():
+        return False
+    return process_start_time(lease["pid"]) != lease["start_time"]
+
+
+def mount_points(path):
+    """
+    Helper function - mount points under path, the deepest first
+    """
+    prefix = os.path.realpath(path).rstrip("/") + "/"
+    points = []
+    try:
+        with open("/proc/self/mountinfo") as mountinfo:
+            for line in mountinfo:
+                mount_point = line.split()[4].replace("\\040", " ")
+                if mount_point.startswith(prefix):
+                    points.append(mount_point)
+    except OSError:
+        pass
+    return sorted(points, key=len, reverse=True)
+
+
+class SandboxAllocator(object):
+    """
+    Unique run folder per process and unique folder path per test
+
+    base - folder where run folders are created (MKDIR_TEST_SANDBOX_BASE
+           environment variable or system temporary folder if not set)
+    """
+    def __init__(self, base=None, prefix=PREFIX):
+        self.base = base or os.environ.get(BASE_VARIABLE) or \
+            tempfile.gettempdir()
+        self.prefix = prefix
+        self.root = None
+        self.pid = None
+        self.count = 0
+        self.reclaimed = []
+
+    def run_root(self):
+        """
+        Run folder of this process, it is created (and stale run folders
+        are reclaimed) at the first call in every process
+        """
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.count = 0
+            self.reclaimed = self.reclaim()
+            os.makedirs(self.base, exist_ok=True)
+            self.root = tempfile.mkdtemp(prefix=self.prefix, dir=self.base)
+            self.__write_lease()
+            util.Finalize(self, remove_tree, args=(self.root,),
+                          exitpriority=0)
+        return self.root
+
+    def __write_lease(self):
+        lease = {"host": socket.gethostname(), "pid": self.pid,
+                 "start_time": process_start_time(self.pid),
+                 "created": time.time()}
+        temporary = os.path.join(self.root, LEASE + ".tmp")
+        with open(temporary, "w") as output:
+            json.dump(lease, output)
+        os.replace(temporary, os.path.join(self.root, LEASE))
+
+    def test_path(self, name=None):
+        """
+        New unique folder path for one test (folder is not created, it is
+        prepared by storage)
+        """
+        self.count += 1
+        return os.path.join(self.run_root(), "%s%d" % (
+            "" if name is None else name + "_", self.count))
+
+    def reclaim(self):
+        """
+        Remove run folders of processes that do not run any more
+
+        outputs:
+        list of reclaimed run folders
+        """
+        reclaimed = []
+        try:
+            names = os.listdir(self.base)
+        except OSError:
+            return reclaimed
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.base, name)
+            if not name.startswith(self.prefix) or path == self.root or \
+                    not os.path.isdir(path) or not is_stale(path, now):
+                continue
+            claimed = "%s.reclaim%d" % (path, os.getpid())
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            for mount_point in mount_points(claimed):
+                try:
+                    umount(mount_point)
+                except OSError:
+                    pass
+            remove_tree(claimed)
+            reclaimed.append(path)
+        return reclaimed
+
+    def release(self):
+        """
+        Remove run folder of this process
+        """
+        if self.root is not None and self.pid == os.getpid():
+            remove_tree(self.root)
+            self.root = None
+            self.pid = None
@@ -0,0 +1,223 @@
+"""
+Scaling benchmark of mkdir command
+
+Sweeps:
+* count - number of directories per invocation (1 -> 100k), directory
+  list longer than ARG_MAX is split into more invocations
+* depth - depth of -p chain (1 -> PATH_MAX)
+* name_length - length of directory name (1 -> NAME_MAX + 1)
+* deep - depth of -p chain beyond PATH_MAX (thousands of levels), every
+  point is verified by fd-relative walk (helper.verify.verify_chain)
+
+Every point is measured several times (median is used). Throughput
+(dirs/sec) and latency per directory are computed and super-linear
+behaviour is detected by slope of log(time) / log(size).
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import math
+import os
+import statistics
+import time
+
+from helper.cleanup import remove_tree
+from helper.mkdir import MkDir
+from helper.verify import verify_chain
+
+SUPER_LINEAR_SLOPE = 1.2
+BREAK_FACTOR = 2.0
+
+
+class ScalingPoint(object):
+    """
+    One measured point of a sweep
+    """
+    FIELDS = ("sweep", "size", "directories", "invocations", "median_ns",
+              "min_ns", "per_directory_ns", "throughput", "exit_code",
+              "mismatches")
+
+    def __init__(self, sweep, size, directories, invocations, samples,
+                 exit_code, mismatches=0):
+        self.sweep = sweep
+        self.size = size
+        self.directories = directories
+        self.invocations = invocations
+        self.median_ns = statistics.median(samples)
+        self.min_ns = min(samples)
+        self.per_directory_ns = self.median_ns / max(directories, 1)
+        self.throughput = directories * 1e9 / max(self.median_ns, 1)
+        self.exit_code = exit_code
+        self.mismatches = mismatches
+
+    def as_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+
+def measure(root, directory_list, arguments_list, repetitions, check=None):
+    """
+    Helper function - run mkdir for directory list (MkDir.run_bulk splits
+    it by ARG_MAX)
+
+    inputs:
+    check - function called after the first repetition (before cleanup),
+            it returns list of mismatches of created tree
+
+    outputs:
+    samples - list of durations (ns)
+    invocations - number of mkdir invocations
+    exit_code - highest exit code
+    mismatches - list of mismatches returned by check
+    """
+    top_level = sorted(set(directory[len(root) + 1:].split(os.sep)[0]
+                           for directory in directory_list))
+    invocations = len(list(MkDir.split_directory_list(directory_list,
+                                                      arguments_list)))
+    samples = []
+    exit_code = 0
+    mismatches = []
+    for _ in range(repetitions):
+        start_time = time.perf_counter_ns()
+        (code, _, _, _) = MkDir.run_bulk(directory_list, arguments_list)
+        exit_code = max(exit_code, code)
+        samples.append(time.perf_counter_ns() - start_time)
+        if check is not None and len(samples) == 1:
+            mismatches = check()
+        for name in top_level:
+            if os.path.lexists(os.path.join(root, name)):
+                remove_tree(os.path.join(root, name))
+    return (samples, invocations, exit_code, mismatches)
+
+
+def geometric(start, stop, factor):
+    """
+    Helper function - geometric sequence from start to stop (included)
+    """
+    values = []
+    value = start
+    while value < stop:
+        values.append(value)
+        value = max(value + 1, int(value * factor))
+    values.append(stop)
+    return values
+
+
+def sweep_count(root, maximum=100000, repetitions=3):
+    points = []
+    for count in geometric(1, maximum, 10):
+        directory_list = [os.path.join(root, "d%d" % idx)
+                          for idx in range(count)]
+        (samples, invocations, exit_code, _) = measure(
+            root, directory_list, [], repetitions)
+        points.append(ScalingPoint("count", count, count, invocations,
+                                   samples, exit_code))
+    return points
+
+
+def sweep_depth(root, maximum=None, repetitions=3):
+    """
+    Depth of -p chain "d/d/.../d", maximal depth is given by PATH_MAX
+    """
+    if maximum is None:
+        path_max = os.pathconf(root, "PC_PATH_MAX")
+        maximum = (path_max - len(root) - 1) // 2
+    points = []
+    for depth in geometric(1, maximum, 2):
+        directory = os.path.join(root, *["d"] * depth)
+        (samples, invocations, exit_code, _) = measure(
+            root, [directory],
+            [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)], repetitions)
+        points.append(ScalingPoint("depth", depth, depth, invocations,
+                                   samples, exit_code))
+    return points
+
+
+def sweep_deep(root, depths=None, repetitions=3):
+    """
+    Depth of -p chain "d/d/.../d" beyond PATH_MAX - mkdir -p creates it
+    component by component, so only the argument length (MAX_ARG_STRLEN)
+    limits it. Time per level shall stay the same (slope of log(time) /
+    log(depth) near 1.0, re-walking of the prefix for every level would
+    give 2.0). Repetitions are interleaved (every round measures all
+    depths), so slow periods of busy machine hit all depths alike.
+    Created chain is verified and removed by fd-relative walks.
+    """
+    if depths is None:
+        path_max = os.pathconf(root, "PC_PATH_MAX")
+        depths = geometric(path_max // 8, path_max * 2, 2)
+    measured = dict((depth, (0, [], 0, 0)) for depth in depths)
+    for repetition in range(repetitions):
+        for depth in depths:
+            names = ["d"] * depth
+            check = None
+            if repetition == 0:
+                check = lambda: verify_chain(root, names, exact=True)
+            (samples, invocations, exit_code, mismatches) = measure(
+                root, [os.path.join(root, *names)],
+                [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)], 1, check)
+            (_, all_samples, worst_exit_code, mismatched) = measured[depth]
+            measured[depth] = (invocations, all_samples + samples,
+                               max(worst_exit_code, exit_code),
+                               mismatched + len(mismatches))
+    return [ScalingPoint("deep", depth, depth, *measured[depth])
+            for depth in depths]
+
+
+def sweep_name_length(root, repetitions=3):
+    """
+    Length of directory name, last point (NAME_MAX + 1) is expected to fail
+    """
+    name_max = os.pathconf(root, "PC_NAME_MAX")
+    points = []
+    for length in geometric(1, name_max, 2) + [name_max + 1]:
+        directory = os.path.join(root, "n" * length)
+        (samples, invocations, exit_code, _) = measure(
+            root, [directory], [], repetitions)
+        points.append(ScalingPoint("name_length", length, 1, invocations,
+                                   samples, exit_code))
+    return points
+
+
+def slope(points, field="median_ns"):
+    """
+    Slope of log(median time) against log(size) - 1.0 is linear scaling
+    (min_ns field is less sensitive to noise of busy machine)
+    """
+    data = [(math.log(p.size), math.log(getattr(p, field))) for p in points
+            if p.size > 0 and getattr(p, field) > 0 and p.exit_code == 0]
+    if len(data) < 2:
+        return None
+    mean_x = statistics.mean(x for (x, _) in data)
+    mean_y = statistics.mean(y for (_, y) in data)
+    denominator = sum((x - mean_x) ** 2 for (x, _) in data)
+    if denominator == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for (x, y) in data) / denominator
+
+
+def analyze(points):
+    """
+    Summary of one sweep
+
+    outputs:
+    dictionary - slope, super_linear, first size where latency per
+    directory is BREAK_FACTOR times worse then the best one of smaller
+    sizes and first failing size
+    """
+    successful = [p for p in points
+                  if p.exit_code == 0 and not p.mismatches]
+    summary = {"slope": slope(points), "super_linear": False,
+               "breaks_at": None, "fails_at": None}
+    failing = [p.size for p in points if p.exit_code != 0 or p.mismatches]
+    if failing:
+        summary["fails_at"] = failing[0]
+    if summary["slope"] is not None:
+        summary["super_linear"] = summary["slope"] > SUPER_LINEAR_SLOPE
+    best = None
+    for point in successful:
+        if best is not None and point.per_directory_ns > best * BREAK_FACTOR:
+            summary["breaks_at"] = point.size
+            break
+        if best is None or point.per_directory_ns < best:
+            best = point.per_directory_ns
+    return summary
@@ -0,0 +1,280 @@
+"""
+Storage of test sandbox
+
+Storage prepares empty sandbox folder before every test and removes it
+after the test:
+* DirectoryStorage - plain folder on filesystem of the path (default)
+* TmpfsStorage - private tmpfs mounted to the sandbox folder, reset is just
+  umount + mount (no matter how big the tree is)
+* LoopStorage - small filesystem image (ext4, xfs, btrfs) mounted over loop
+  device, the image is formatted and mounted once per process (worker),
+  every test gets its own folder of that filesystem bind mounted to the
+  sandbox folder and the folder is removed after the test (not shared -
+  fresh copy of pristine image is mounted for every setup)
+
+Mount based storages require root (CAP_SYS_ADMIN).
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import ctypes
+import fcntl
+import os
+import shutil
+import subprocess
+from multiprocessing import util
+
+from helper.cleanup import CleanupReport, remove_tree
+from helper.mode import get_umask
+
+MNT_DETACH = 2
+MS_BIND = 4096
+FICLONE = 0x40049409
+
+# symbols of the process (libc included), find_library would run ldconfig
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def mount(source, target, fs_type, options="", flags=0):
+    """
+    Helper function - mount(2) without calling mount binary
+    """
+    if _libc.mount(os.fsencode(source), os.fsencode(target),
+                   os.fsencode(fs_type), flags, os.fsencode(options)) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), target)
+
+
+def umount(target):
+    """
+    Helper function - umount2(2) without calling umount binary
+    """
+    if _libc.umount2(os.fsencode(target), MNT_DETACH) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), target)
+
+
+def _root_mode():
+    return 0o777 & ~get_umask()
+
+
+class DirectoryStorage(object):
+    """
+    Sandbox is a plain folder
+    """
+    def setup(self, path):
+        """
+        Prepare empty folder path
+
+        outputs:
+        CleanupReport of removing previous content
+        """
+        report = remove_tree(path)
+        os.mkdir(path)
+        return report
+
+    def cleanup(self, path):
+        """
+        Remove folder path
+
+        outputs:
+        CleanupReport
+        """
+        return remove_tree(path)
+
+
+class TmpfsStorage(DirectoryStorage):
+    """
+    Sandbox is a private tmpfs, number of inodes can be limited too
+    """
+    def __init__(self, size="64m", nr_inodes=None):
+        self.size = size
+        self.nr_inodes = nr_inodes
+
+    def setup(self, path):
+        report = self.cleanup(path)
+        os.mkdir(path)
+        options = "size=%s,mode=%o" % (self.size, _root_mode())
+        if self.nr_inodes is not None:
+            options += ",nr_inodes=%d" % self.nr_inodes
+        mount("tmpfs", path, "tmpfs", options)
+        return report
+
+    def cleanup(self, path):
+        if os.path.ismount(path):
+            umount(path)
+        return remove_tree(path)
+
+
+class LoopStorage(DirectoryStorage):
+    """
+    Sandbox is a filesystem image mounted over loop device
+
+    Pristine image is created by mkfs once per process (worker). Shared
+    storage mounts one copy of it per process (next to the first sandbox
+    folder) and every setup bind mounts a new folder of it, so a test does
+    not pay for loop device and filesystem mount. Not shared storage
+    restores working image from the pristine one for every setup (exact
+    free inodes and blocks of empty filesystem).
+    """
+    SIZES = {"ext4": "32M", "xfs": "320M", "btrfs": "128M"}
+
+    def __init__(self, fs_type, size=None, mkfs_options=(), shared=True):
+        self.fs_type = fs_type
+        self.size = size if size else self.SIZES.get(fs_type, "64M")
+        self.mkfs_options = list(mkfs_options)
+        self.shared = shared
+        self.pristine_image = None
+        self.mount_point = None
+        self.pid = None
+        self.finalizer = None
+
+    @staticmethod
+    def is_available(fs_type):
+        """
+        Check if mkfs for fs_type is installed
+        """
+        return shutil.which("mkfs." + fs_type) is not None
+
+    def setup(self, path):
+        report = self.cleanup(path)
+        if self.pristine_image is None:
+            self.__create_pristine_image(path)
+        if not self.shared:
+            image = path + ".img"
+            copy_image(self.pristine_image, image)
+            os.mkdir(path)
+            self.__mount(image, path)
+            return report
+
+        if self.pid != os.getpid():
+            self.__mount_shared(os.path.dirname(path))
+        folder = self.__shared_folder(path)
+        os.mkdir(folder)
+        os.mkdir(path)
+        mount(folder, path, "", flags=MS_BIND)
+        return report
+
+    def cleanup(self, path):
+        if os.path.ismount(path):
+            umount(path)
+        if self.shared:
+            if self.pid != os.getpid():
+                return remove_tree(path)
+            report = remove_tree(self.__shared_folder(path))
+            remove_tree(path)
+            return report
+        remove_tree(path + ".img")
+        return remove_tree(path)
+
+    def __shared_folder(self, path):
+        return os.path.join(self.mount_point, os.path.basename(path))
+
+    def __mount_shared(self, folder):
+        """
+        Mount copy of pristine image to folder/.<fs_type> (unmounted at
+        exit of the process before the folder is removed)
+        """
+        mount_point = os.path.join(folder, "." + self.fs_type)
+        image = mount_point + ".img"
+        copy_image(self.pristine_image, image)
+        os.mkdir(mount_point)
+        self.__mount(image, mount_point)
+        (self.mount_point, self.pid) = (mount_point, os.getpid())
+        self.finalizer = util.Finalize(self, release_shared,
+                                       args=(mount_point,), exitpriority=1)
+
+    def release(self):
+        """
+        Umount shared filesystem of this process (it is done at exit of
+        the process too)
+        """
+        if self.finalizer is not None and self.pid == os.getpid():
+            self.finalizer()
+        (self.mount_point, self.pid, self.finalizer) = (None, None, None)
+
+    def __mount(self, image, path):
+        subprocess.run(["mount", "-t", self.fs_type, "-o", "loop", image,
+                        path],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                       check=True)
+
+    def __create_pristine_image(self, path):
+        """
+        Format pristine image, remove lost+found and set mode of root
+        directory the same way as os.mkdir would set it
+        """
+        image = path + ".pristine.img"
+        subprocess.run(["truncate", "-s", self.size, image], check=True)
+        subprocess.run(["mkfs." + self.fs_type, "-q", "-F"
+                        if self.fs_type == "ext4" else "-f"] +
+                       self.mkfs_options + [image],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                       check=True)
+        remove_tree(path)
+        os.mkdir(path)
+        self.__mount(image, path)
+        try:
+            remove_tree(os.path.join(path, "lost+found"))
+            os.chmod(path, _root_mode())
+        finally:
+            umount(path)
+            os.rmdir(path)
+        self.pristine_image = image
+        util.Finalize(self, remove_images, args=(path,), exitpriority=0)
+
+
+def release_shared(mount_point):
+    """
+    Helper function - umount shared filesystem of LoopStorage and remove
+    its image
+    """
+    if os.path.ismount(mount_point):
+        umount(mount_point)
+    remove_tree(mount_point)
+    remove_tree(mount_point + ".img")
+
+
+def remove_images(path):
+    """
+    Helper function - remove images of LoopStorage for sandbox path
+    """
+    for image in (path + ".img", path + ".pristine.img"):
+        remove_tree(image)
+
+
+def copy_image(source, destination):
+    """
+    Helper function - copy image by reflink if filesystem supports it,
+    otherwise copy only data parts of sparse file
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+        while offset < size:
+            try:
+                offset = os.lseek(src.fileno(), offset, os.SEEK_DATA)
+            except OSError:
+                break
+            end = os.lseek(src.fileno(), offset, os.SEEK_HOLE)
+            while offset < end:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(),
+                                            end - offset, offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+        dst.truncate(size)
+
+
+STORAGES = {
+    "directory": DirectoryStorage,
+    "tmpfs": TmpfsStorage,
+    "ext4": lambda: LoopStorage("ext4"),
+    "xfs": lambda: LoopStorage("xfs"),
+    "btrfs": lambda: LoopStorage("btrfs"),
+    }
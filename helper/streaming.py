@@ -0,0 +1,97 @@
+"""
+Streaming output of mkdir command
+
+Lines of stdout (verbose messages) and stderr (errors) are provided as
+they arrive, output is never held in memory as a whole. Decoding is
+incremental and names that are not valid UTF-8 do not break it (invalid
+bytes are kept as surrogate escapes - os.fsencode gives original bytes).
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import codecs
+import os
+import select
+
+from helper.backends import spawn
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+
+class _LineDecoder(object):
+    """
+    Incremental decoder of one stream - bytes in, complete lines out
+    Line longer then max_line is split, so memory stays bounded
+    """
+    def __init__(self, max_line):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(
+            errors="surrogateescape")
+        self.pending = ""
+        self.max_line = max_line
+
+    def feed(self, data, final=False):
+        text = self.pending + self.decoder.decode(data, final)
+        lines = text.split("\n")
+        self.pending = lines.pop()
+        while len(self.pending) > self.max_line:
+            lines.append(self.pending[:self.max_line])
+            self.pending = self.pending[self.max_line:]
+        if final and self.pending:
+            lines.append(self.pending)
+            self.pending = ""
+        return lines
+
+
+class StreamingRun(object):
+    """
+    Running mkdir command, iteration gives (stream, line) tuples where
+    stream is STDOUT or STDERR, exit_code is set when iteration finishes
+
+    Example of use:
+    run = StreamingRun(["mkdir", "-p", "-v", "a/b/c"])
+    for (stream, line) in run:
+        print(stream, line)
+    print(run.exit_code)
+    """
+    READ_SIZE = 65536
+    MAX_LINE = 1024 * 1024
+
+    def __init__(self, command, discard=False):
+        self.command = command
+        self.discard = discard
+        self.exit_code = None
+
+    def __iter__(self):
+        try:
+            (pid, stdout_read, stderr_read) = spawn(self.command,
+                                                    not self.discard)
+        except OSError as e:
+            self.exit_code = 1
+            yield (STDERR, str(e))
+            return
+
+        if self.discard:
+            (_, status) = os.waitpid(pid, 0)
+            self.exit_code = os.waitstatus_to_exitcode(status)
+            return
+
+        streams = {stdout_read: STDOUT, stderr_read: STDERR}
+        decoders = {stdout_read: _LineDecoder(self.MAX_LINE),
+                    stderr_read: _LineDecoder(self.MAX_LINE)}
+        opened = [stdout_read, stderr_read]
+        try:
+            while opened:
+                (readable, _, _) = select.select(opened, [], [])
+                for fd in readable:
+                    data = os.read(fd, self.READ_SIZE)
+                    if not data:
+                        opened.remove(fd)
+                        os.close(fd)
+                    for line in decoders[fd].feed(data, not data):
+                        yield (streams[fd], line)
+        finally:
+            for fd in opened:
+                os.close(fd)
+            (_, status) = os.waitpid(pid, 0)
+            self.exit_code = os.waitstatus_to_exitcode(status)
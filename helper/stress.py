@@ -0,0 +1,251 @@
+"""
+Concurrency stress of mkdir -p
+
+N workers (threads or forked processes) start at once (barrier) and call
+MkDir.run with -p (and optionally -m) for random leaves of a shared tree,
+so parent chains overlap and mkdir processes race on the same
+directories (EEXIST of parents created by other workers). Workers use
+SubprocessBackend unless other backend is given (DifferentialBackend
+rolls back directories of other workers, so it can not be used for
+racing calls). After the run:
+* every call shall succeed (exit code 0, no stderr)
+* tree shall contain exactly the used chains - parents with default mode
+  of -p parents, leaves with mode of -m (helper.verify)
+Throughput (calls/sec) and latency percentiles are reported, sweep
+shows how they change as number of workers grows.
+
+Example of use:
+    for stress_result in sweep("/tmp/stress", (1, 16, 256), mode="700"):
+        print(stress_result)
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import itertools
+import multiprocessing
+import os
+import random
+import stat
+import threading
+import time
+
+from helper.backends import SubprocessBackend
+from helper.mkdir import MkDir
+from helper.mode import get_umask
+from helper.mode_matrix import expected_mode
+from helper.verify import Expected, verify_tree
+
+WORKER_COUNTS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+BARRIER_TIMEOUT = 120
+
+
+def shared_leaves(fanout=4, depth=4):
+    """
+    Relative paths of leaves of tree where every directory has fanout
+    children, all leaves are in the same depth (so no directory is a leaf
+    in one call and a parent in another one)
+    """
+    return [os.path.join(*["s%d" % index for index in indexes])
+            for indexes in itertools.product(range(fanout), repeat=depth)]
+
+
+class StressResult(object):
+    """
+    Result of one stress run
+
+    workers - number of concurrent workers
+    calls - number of MkDir.run calls
+    failures - list of (directory, exit_code, stderr) of failed calls
+    mismatches - list of helper.verify.Mismatch of final tree
+    elapsed_ns - wall time from start barrier to the last worker
+    latencies - sorted latencies of calls (ns)
+    """
+    FIELDS = ("workers", "calls", "failed", "mismatched", "throughput",
+              "p50_us", "p99_us", "max_us")
+
+    def __init__(self, workers, samples, elapsed_ns, mismatches):
+        self.workers = workers
+        self.calls = len(samples)
+        self.failures = [(directory, exit_code, stderr)
+                         for (directory, _, exit_code, stderr) in samples
+                         if exit_code != 0 or stderr]
+        self.mismatches = mismatches
+        self.elapsed_ns = elapsed_ns
+        self.latencies = sorted(latency for (_, latency, _, _) in samples)
+
+    def throughput(self):
+        return self.calls * 1e9 / max(self.elapsed_ns, 1)
+
+    def percentile(self, percent):
+        """
+        Latency percentile (nearest rank) in ns
+        """
+        if not self.latencies:
+            return 0
+        rank = max(int(-(-percent * len(self.latencies) // 100)), 1)
+        return self.latencies[rank - 1]
+
+    def as_dict(self):
+        return {"workers": self.workers, "calls": self.calls,
+                "failed": len(self.failures),
+                "mismatched": len(self.mismatches),
+                "throughput": self.throughput(),
+                "p50_us": self.percentile(50) / 1e3,
+                "p99_us": self.percentile(99) / 1e3,
+                "max_us": self.percentile(100) / 1e3}
+
+    def __repr__(self):
+        return "%d workers: %d calls, %d failed, %d mismatched, " \
+            "%.0f calls/s, p50 %.1f us, p99 %.1f us, max %.1f us" % (
+                self.workers, self.calls, len(self.failures),
+                len(self.mismatches), self.throughput(),
+                self.percentile(50) / 1e3, self.percentile(99) / 1e3,
+                self.percentile(100) / 1e3)
+
+
+def _calls(root, leaves, calls, seed, mode, barrier, backend):
+    """
+    Helper function - calls of one worker after all workers are ready
+
+    outputs:
+    list of (leaf, latency_ns, exit_code, stderr)
+    """
+    generator = random.Random(seed)
+    arguments_list = [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)]
+    if mode is not None:
+        arguments_list.append(MkDir.Arguments(MkDir.ArgumentsName.MODE_LONG,
+                                              mode))
+    chosen = [generator.choice(leaves) for _ in range(calls)]
+    samples = []
+    barrier.wait()
+    for leaf in chosen:
+        start_time = time.perf_counter_ns()
+        (exit_code, _, stderr) = MkDir.run([os.path.join(root, leaf)],
+                                           arguments_list, backend)
+        samples.append((leaf, time.perf_counter_ns() - start_time,
+                        exit_code, stderr))
+    return samples
+
+
+def _process_worker(connection, *arguments):
+    connection.send(_calls(*arguments))
+    connection.close()
+
+
+def run_stress(root, workers, calls=4, mode=None, fanout=4, depth=4,
+               processes=False, seed=0, backend=None):
+    """
+    Run workers concurrently and verify the tree
+
+    inputs:
+    root - existing empty folder
+    workers - number of concurrent workers
+    calls - number of MkDir.run calls of every worker
+    mode - value of --mode (None - without -m)
+    fanout, depth - shape of shared tree (see shared_leaves)
+    processes - when True, workers are forked processes, otherwise
+                threads (mkdir processes race in both cases)
+    seed - seed of random choice of leaves
+    backend - backend of MkDir.run (SubprocessBackend if not set)
+
+    outputs:
+    StressResult
+    """
+    if backend is None:
+        backend = SubprocessBackend()
+    leaves = shared_leaves(fanout, depth)
+    results = [None] * workers
+    if processes:
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(workers + 1, timeout=BARRIER_TIMEOUT)
+        started = []
+        for index in range(workers):
+            (parent_end, child_end) = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_process_worker,
+                args=(child_end, root, leaves, calls, seed + index, mode,
+                      barrier, backend))
+            process.start()
+            child_end.close()
+            started.append((process, parent_end))
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            for (process, _) in started:
+                process.terminate()
+                process.join()
+            raise RuntimeError("stress workers did not start in %d s" %
+                               BARRIER_TIMEOUT)
+        start_time = time.perf_counter_ns()
+        for (index, (process, connection)) in enumerate(started):
+            try:
+                results[index] = connection.recv()
+            except EOFError:
+                results[index] = []
+            process.join()
+        failed = [index for (index, (process, _)) in enumerate(started)
+                  if process.exitcode != 0]
+        if failed:
+            raise RuntimeError("stress workers %s exited with error" % (
+                failed,))
+    else:
+        barrier = threading.Barrier(workers + 1, timeout=BARRIER_TIMEOUT)
+
+        def thread_worker(index):
+            results[index] = _calls(root, leaves, calls, seed + index, mode,
+                                    barrier, backend)
+
+        threads = [threading.Thread(target=thread_worker, args=(index,))
+                   for index in range(workers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start_time = time.perf_counter_ns()
+        for thread in threads:
+            thread.join()
+    elapsed_ns = time.perf_counter_ns() - start_time
+
+    samples = [sample for worker_samples in results
+               for sample in worker_samples]
+    return StressResult(workers, samples, elapsed_ns, verify_tree(
+        root, expected_tree([leaf for (leaf, _, _, _) in samples], mode),
+        exact=True))
+
+
+def expected_tree(leaves, mode=None, umask=None):
+    """
+    Expected tree after mkdir -p of leaves - parents get (0777 & ~umask)
+    with u+wx, leaves get mode of -m (default mode without it)
+    """
+    if umask is None:
+        umask = get_umask()
+    parent_mode = (0o777 & ~umask) | stat.S_IWUSR | stat.S_IXUSR
+    leaf_mode = 0o777 & ~umask if mode is None else \
+        expected_mode(mode, umask)
+    spec = {}
+    for leaf in leaves:
+        spec[leaf] = Expected(mode=leaf_mode)
+        parent = os.path.dirname(leaf)
+        while parent and parent not in spec:
+            spec[parent] = Expected(mode=parent_mode)
+            parent = os.path.dirname(parent)
+    return spec
+
+
+def sweep(root, worker_counts=WORKER_COUNTS, calls=4, mode=None,
+          processes=False, backend=None):
+    """
+    Stress with growing number of workers, every point in its own
+    subfolder of root (tree is empty at start of every point)
+
+    outputs:
+    list of StressResult
+    """
+    stress_results = []
+    for workers in worker_counts:
+        folder = os.path.join(root, "w%d" % workers)
+        os.mkdir(folder)
+        stress_results.append(run_stress(folder, workers, calls, mode,
+                                         processes=processes,
+                                         backend=backend))
+    return stress_results
@@ -0,0 +1,199 @@
+"""
+Tracing of mkdir calls
+
+When a Tracer is active, every MkDir.run call is recorded to a ring
+buffer (fixed size, the oldest calls are overwritten) with timing of its
+phases:
+* build - building of command (arguments)
+* spawn - start of the process (posix_spawn / Popen)
+* run - from spawn to exit of mkdir (exec, mkdir itself, pipes drain)
+* drain - time spent by reading of output pipes (part of run)
+* decode - decoding of output
+* total - whole MkDir.run call
+Phases that the backend does not have are 0 (e.g. spawn for syscall
+backend). When no tracer is active, MkDir.run only checks one global
+variable. Call in progress is kept per thread (threading.local), so
+concurrent MkDir.run calls (stress, thread pools) record phases to their
+own records.
+
+Example of use:
+    with Tracer() as tracer:
+        MkDir.run(["a"])
+    print(tracer.report())
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+import threading
+import time
+
+TRACER = None
+_LOCAL = threading.local()
+
+PHASES = ("build_ns", "spawn_ns", "run_ns", "drain_ns", "decode_ns",
+          "total_ns")
+
+
+class CallRecord(object):
+    """
+    One traced mkdir call
+    """
+    __slots__ = ("test_id", "argv", "argv_bytes", "exit_code", "start_ns") \
+        + PHASES
+
+    def __init__(self, test_id):
+        self.test_id = test_id
+        self.argv = None
+        self.argv_bytes = 0
+        self.exit_code = None
+        self.build_ns = self.spawn_ns = self.run_ns = 0
+        self.drain_ns = self.decode_ns = self.total_ns = 0
+        self.start_ns = time.perf_counter_ns()
+
+    def summary(self, width=60):
+        argv = " ".join(self.argv or [])
+        if len(argv) > width:
+            argv = argv[:width - 3] + "..."
+        return argv
+
+
+def start_call():
+    """
+    Start record of a call - None when tracing is not active
+    """
+    if TRACER is None:
+        return None
+    _LOCAL.call = CallRecord(TRACER.test_id)
+    return _LOCAL.call
+
+
+def current():
+    """
+    Record of the call in progress in this thread - None when tracing is
+    not active
+    """
+    if TRACER is None:
+        return None
+    return getattr(_LOCAL, "call", None)
+
+
+def finish_call(call, command, exit_code):
+    if call is None:
+        return
+    _LOCAL.call = None
+    if TRACER is None:
+        return
+    call.total_ns = time.perf_counter_ns() - call.start_ns
+    if isinstance(command, list):
+        call.argv = command[:8]
+        call.argv_bytes = sum(len(os.fsencode(argument)) + 1
+                              for argument in command)
+    call.exit_code = exit_code
+    TRACER.add(call)
+
+
+class Tracer(object):
+    """
+    Ring buffer of CallRecord and durations of tests
+    """
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.buffer = [None] * capacity
+        self.position = 0
+        self.test_id = None
+        self.tests = {}
+        self.previous = None
+        self.lock = threading.Lock()
+
+    def add(self, call):
+        with self.lock:
+            self.buffer[self.position % self.capacity] = call
+            self.position += 1
+
+    def extend(self, calls):
+        for call in calls:
+            self.add(call)
+
+    def calls(self):
+        """
+        Recorded calls from the oldest one
+        """
+        if self.position <= self.capacity:
+            return self.buffer[:self.position]
+        start = self.position % self.capacity
+        return self.buffer[start:] + self.buffer[:start]
+
+    def start_test(self, test_id):
+        self.test_id = test_id
+        return self.position
+
+    def stop_test(self, test_id, duration_ns):
+        self.tests[test_id] = duration_ns
+        self.test_id = None
+
+    def calls_since(self, position):
+        """
+        Calls recorded after position (returned by start_test)
+        """
+        count = min(self.position - position, self.capacity)
+        return self.calls()[-count:] if count > 0 else []
+
+    def __enter__(self):
+        global TRACER
+        self.previous = TRACER
+        TRACER = self
+        return self
+
+    def __exit__(self, *args):
+        global TRACER
+        TRACER = self.previous
+
+    def report(self, limit=10):
+        """
+        Text report - phases of all calls, the slowest tests (time in
+        mkdir calls and the rest - setup, checks, cleanup) and the
+        slowest calls
+        """
+        calls = self.calls()
+        lines = ["Traced %d mkdir calls (%d kept)" % (self.position,
+                                                      len(calls))]
+        if calls:
+            lines.append("%-10s %12s %12s" % ("phase", "total[ms]",
+                                              "mean[us]"))
+            for phase in PHASES:
+                total = sum(getattr(call, phase) for call in calls)
+                lines.append("%-10s %12.3f %12.1f" % (
+                    phase[:-3], total / 1e6, total / len(calls) / 1e3))
+
+        in_calls = {}
+        count = {}
+        for call in calls:
+            in_calls[call.test_id] = in_calls.get(call.test_id, 0) + \
+                call.total_ns
+            count[call.test_id] = count.get(call.test_id, 0) + 1
+        if self.tests:
+            lines.append("")
+            lines.append("Slowest tests:")
+            lines.append("%12s %6s %12s %12s  %s" % (
+                "duration[ms]", "calls", "mkdir[ms]", "rest[ms]", "test"))
+            for (test_id, duration) in sorted(
+                    self.tests.items(), key=lambda item: -item[1])[:limit]:
+                mkdir_time = in_calls.get(test_id, 0)
+                lines.append("%12.3f %6d %12.3f %12.3f  %s" % (
+                    duration / 1e6, count.get(test_id, 0), mkdir_time / 1e6,
+                    (duration - mkdir_time) / 1e6, test_id))
+        if calls:
+            lines.append("")
+            lines.append("Slowest calls:")
+            lines.append("%10s %10s %10s %10s %6s %4s  %s" % (
+                "total[us]", "spawn[us]", "run[us]", "decode[us]", "argv",
+                "exit", "command (test)"))
+            for call in sorted(calls, key=lambda c: -c.total_ns)[:limit]:
+                lines.append(
+                    "%10.1f %10.1f %10.1f %10.1f %6d %4s  %s (%s)" % (
+                        call.total_ns / 1e3, call.spawn_ns / 1e3,
+                        call.run_ns / 1e3, call.decode_ns / 1e3,
+                        call.argv_bytes, call.exit_code, call.summary(),
+                        call.test_id))
+        return "\n".join(lines)
@@ -0,0 +1,198 @@
+"""
+Provisioning of large directory trees
+
+Tree is given as nested dictionary or as stream of paths (one path per
+line). All paths are deduplicated to a set of directories (shared
+prefixes are counted only once) and split to levels by depth. Levels are
+created breadth-first (siblings are next to each other, every directory
+is created exactly once and its parent already exists, so no -p and no
+walk of parents per leaf). Progress is stored to a checkpoint after every
+round, so killed job continues where it stopped.
+
+Example of use:
+    spec = {"tenant_1": {"project_1": None, "project_2": None}}
+    tree_result = MkDir.create_tree(spec, "/tmp/trees",
+                                    checkpoint="/tmp/trees.checkpoint")
+    print(tree_result.dirs_per_second(), tree_result.failed)
+
+    with open("paths.txt") as paths:
+        MkDir.create_tree(paths, "/tmp/trees", concurrent=True)
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import hashlib
+import json
+import os
+import time
+
+
+def tree_paths(spec):
+    """
+    Relative paths of tree spec
+
+    inputs:
+    spec - nested dictionary (name -> dictionary of children or None),
+           string with one path per line or iterable of lines (e.g. open
+           file)
+
+    outputs:
+    generator of normalized relative paths
+    """
+    if isinstance(spec, dict):
+        stack = [("", spec)]
+        while stack:
+            (prefix, children) = stack.pop()
+            for (name, grandchildren) in children.items():
+                path = os.path.join(prefix, name)
+                yield _normalize(path)
+                if grandchildren:
+                    stack.append((path, grandchildren))
+        return
+    if isinstance(spec, str):
+        spec = spec.splitlines()
+    for line in spec:
+        line = line.rstrip("\n")
+        if line.strip():
+            yield _normalize(line)
+
+
+def _normalize(path):
+    """
+    Helper function - normalize path, it shall stay inside of tree root
+    """
+    normalized = os.path.normpath(path)
+    if os.path.isabs(normalized) or normalized == "." or \
+            normalized.split(os.sep)[0] == "..":
+        raise ValueError("Path is not inside of tree: %r" % path)
+    return normalized
+
+
+def tree_levels(spec):
+    """
+    Deduplicated directories of tree spec split by depth
+
+    outputs:
+    list of levels - sorted lists of relative paths, level 0 contains
+    top directories
+    """
+    seen = set()
+    levels = []
+    for path in tree_paths(spec):
+        while path and path not in seen:
+            seen.add(path)
+            depth = path.count(os.sep)
+            while len(levels) <= depth:
+                levels.append([])
+            levels[depth].append(path)
+            path = os.path.dirname(path)
+    for level in levels:
+        level.sort()
+    return levels
+
+
+def levels_digest(root, levels, arguments):
+    """
+    Digest of tree - checkpoint is valid only for the same tree
+    """
+    digest = hashlib.sha256()
+    digest.update(os.fsencode(root) + b"\0")
+    digest.update(os.fsencode(" ".join(arguments)) + b"\0")
+    for level in levels:
+        for path in level:
+            digest.update(os.fsencode(path) + b"\0")
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class TreeResult(object):
+    """
+    Result of MkDir.create_tree
+
+    directories - number of directories of the tree
+    created - number of directories created by this run
+    existed - number of directories that existed before (EEXIST)
+    resumed - number of directories done by previous runs (checkpoint)
+    failed - list of (path, errno) of directories that failed
+    skipped - number of directories not tried as their parent failed
+    invocations - number of mkdir invocations
+    elapsed_ns - duration of this run
+    """
+    def __init__(self, directories):
+        self.directories = directories
+        self.created = 0
+        self.existed = 0
+        self.resumed = 0
+        self.failed = []
+        self.skipped = 0
+        self.invocations = 0
+        self.elapsed_ns = 0
+        self.start_time = time.perf_counter_ns()
+
+    def done(self):
+        """
+        Number of directories already processed (including resumed)
+        """
+        return self.resumed + self.created + self.existed + \
+            len(self.failed) + self.skipped
+
+    def dirs_per_second(self):
+        """
+        Throughput of this run - processed directories per second
+        """
+        processed = self.done() - self.resumed
+        return processed * 1e9 / max(self.elapsed_ns, 1)
+
+    def update_time(self):
+        self.elapsed_ns = time.perf_counter_ns() - self.start_time
+
+    def __repr__(self):
+        return "%d/%d directories: %d created, %d existed, %d resumed, " \
+            "%d failed, %d skipped, %d invocations, %.0f dirs/s" % (
+                self.done(), self.directories, self.created, self.existed,
+                self.resumed, len(self.failed), self.skipped,
+                self.invocations, self.dirs_per_second())
+
+
+class TreeCheckpoint(object):
+    """
+    Progress of tree provisioning stored in JSON file
+
+    depth - index of level in progress
+    done - number of directories of that level already processed
+    failed - list of (relative path, errno) of directories that failed
+    skipped - relative paths skipped as their parent failed (subtrees of
+              failed and skipped paths are skipped)
+    """
+    def __init__(self, path, digest):
+        self.path = path
+        self.digest = digest
+        self.depth = 0
+        self.done = 0
+        self.failed = []
+        self.skipped = []
+        if path is None:
+            return
+        try:
+            with open(path) as source:
+                stored = json.load(source)
+        except (OSError, ValueError):
+            return
+        if stored.get("digest") == digest:
+            self.depth = stored["depth"]
+            self.done = stored["done"]
+            self.failed = [tuple(failed) for failed in stored["failed"]]
+            self.skipped = stored["skipped"]
+
+    def save(self):
+        """
+        Store checkpoint (atomically - temporary file is renamed)
+        """
+        if self.path is None:
+            return
+        temporary = "%s.%d" % (self.path, os.getpid())
+        with open(temporary, "w") as output:
+            json.dump({"digest": self.digest, "depth": self.depth,
+                       "done": self.done, "failed": self.failed,
+                       "skipped": self.skipped}, output)
+        os.replace(temporary, self.path)
@@ -0,0 +1,303 @@
+"""
+Verification of directory tree
+
+Expected tree (relative paths with type and mode) is checked against
+filesystem. Every directory of the tree is listed only once by os.scandir
+of directory file descriptor (dir_fd), type of entry is taken from the
+listing and entries are stat-ed (relative to dir_fd) only when mode is
+checked. There is no path walk for every check and paths longer then
+PATH_MAX can be verified too.
+
+Deep chains (thousands of levels, beyond PATH_MAX) are verified by
+verify_chain - it walks by openat of one component at a time and keeps
+only two descriptors open.
+
+Example of use:
+    spec = {"test": Expected(mode=0o440), "a/b": Expected()}
+    mismatches = verify_tree("/tmp/mkdir_test", spec)
+    mismatches = verify_chain("/tmp/mkdir_test", ["d"] * 5000)
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import errno
+import os
+import stat
+
+DIRECTORY = "directory"
+FILE = "file"
+SYMLINK = "symlink"
+ABSENT = "absent"
+
+DIRECTORY_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+
+
+class Expected(object):
+    """
+    Expectation of one entry
+
+    file_type - DIRECTORY, FILE, SYMLINK or ABSENT
+    mode - permission bits (e.g. 0o440) or whole st_mode (e.g. 0o40440),
+           None if mode is not checked
+    """
+    __slots__ = ("file_type", "mode")
+
+    def __init__(self, file_type=DIRECTORY, mode=None):
+        self.file_type = file_type
+        self.mode = mode
+
+
+class Mismatch(object):
+    """
+    One difference between expected tree and filesystem
+
+    kind - "missing", "unexpected", "type", "mode" or "error"
+    """
+    __slots__ = ("path", "kind", "expected", "actual")
+
+    def __init__(self, path, kind, expected=None, actual=None):
+        self.path = path
+        self.kind = kind
+        self.expected = expected
+        self.actual = actual
+
+    def __repr__(self):
+        return "%s: %s (expected %s, actual %s)" % (
+            self.path, self.kind, self.expected, self.actual)
+
+
+class _Node(object):
+    __slots__ = ("expected", "children")
+
+    def __init__(self):
+        self.expected = None
+        self.children = {}
+
+
+def expect_all(paths, file_type=DIRECTORY, mode=None):
+    """
+    Helper function - spec with the same expectation for all paths
+    """
+    expected = Expected(file_type, mode)
+    return dict((path, expected) for path in paths)
+
+
+def _build_tree(spec):
+    root = _Node()
+    for (path, expected) in spec.items():
+        node = root
+        for name in path.split("/"):
+            if name in ("", "."):
+                continue
+            node = node.children.setdefault(name, _Node())
+        node.expected = expected
+    return root
+
+
+def _expects_entries(node):
+    """
+    Helper function - True if some descendant of node is expected to exist
+    """
+    stack = list(node.children.values())
+    while stack:
+        child = stack.pop()
+        if child.expected is not None and child.expected.file_type != ABSENT:
+            return True
+        stack.extend(child.children.values())
+    return False
+
+
+def _file_type(entry):
+    if entry.is_symlink():
+        return SYMLINK
+    if entry.is_dir(follow_symlinks=False):
+        return DIRECTORY
+    return FILE
+
+
+def _join(path, name):
+    return path + "/" + name if path else name
+
+
+def _check(path, entry, expected, mismatches):
+    """
+    Check one entry, type is known from scandir (d_type), so stat is
+    called only when mode has to be checked
+    """
+    actual_type = _file_type(entry)
+    if expected.file_type == ABSENT:
+        mismatches.append(Mismatch(_join(path, entry.name), "unexpected",
+                                   ABSENT, actual_type))
+        return
+    if expected.file_type != actual_type:
+        mismatches.append(Mismatch(_join(path, entry.name), "type",
+                                   expected.file_type, actual_type))
+        return
+    if expected.mode is None:
+        return
+    try:
+        st_mode = entry.stat(follow_symlinks=False).st_mode
+    except OSError as e:
+        mismatches.append(Mismatch(_join(path, entry.name), "error", None,
+                                   os.strerror(e.errno)))
+        return
+    if expected.mode > 0o7777:
+        actual_mode = st_mode
+    else:
+        actual_mode = stat.S_IMODE(st_mode)
+    if actual_mode != expected.mode:
+        mismatches.append(Mismatch(_join(path, entry.name), "mode",
+                                   oct(expected.mode), oct(actual_mode)))
+
+
+def verify_tree(root, spec, exact=False):
+    """
+    Verify tree under root
+
+    inputs:
+    root - path of root directory
+    spec - dictionary: relative path -> Expected
+    exact - when True, entries that are not in spec are reported in every
+            directory that spec describes
+
+    outputs:
+    list of Mismatch (empty list if tree is as expected)
+    """
+    mismatches = []
+    tree = _build_tree(spec)
+    try:
+        fd = os.open(root, DIRECTORY_FLAGS)
+    except OSError as e:
+        return [Mismatch(root, "error", None, os.strerror(e.errno))]
+
+    # stack of (relative path, node, fd, names of subdirectories to visit)
+    stack = [("", tree, fd, None)]
+    while stack:
+        (path, node, fd, pending) = stack.pop()
+        if pending is None:
+            pending = _verify_directory(path, node, fd, exact, mismatches)
+        if not pending:
+            os.close(fd)
+            continue
+
+        name = pending.pop()
+        child_path = _join(path, name)
+        try:
+            child_fd = os.open(name, DIRECTORY_FLAGS, dir_fd=fd)
+        except OSError as e:
+            mismatches.append(Mismatch(child_path, "error", None,
+                                       os.strerror(e.errno)))
+            child_fd = None
+        if pending:
+            stack.append((path, node, fd, pending))
+        else:
+            os.close(fd)
+        if child_fd is not None:
+            stack.append((child_path, node.children[name], child_fd, None))
+    return mismatches
+
+
+def _verify_directory(path, node, fd, exact, mismatches):
+    """
+    Check entries of one directory by one scandir pass
+
+    outputs:
+    list of names of subdirectories that have to be visited
+    """
+    found = set()
+    pending = []
+    try:
+        entries = os.scandir(fd)
+    except OSError as e:
+        mismatches.append(Mismatch(path or ".", "error", None,
+                                   os.strerror(e.errno)))
+        return pending
+    with entries:
+        for entry in entries:
+            child = node.children.get(entry.name)
+            if child is None:
+                if exact:
+                    mismatches.append(Mismatch(_join(path, entry.name),
+                                               "unexpected"))
+                continue
+            found.add(entry.name)
+            if child.expected is not None:
+                _check(path, entry, child.expected, mismatches)
+            if not child.children:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.name)
+            elif child.expected is None and _expects_entries(child):
+                # descendants can not exist under non-directory (type
+                # mismatch of expected directory is reported by _check)
+                mismatches.append(Mismatch(_join(path, entry.name), "type",
+                                           DIRECTORY, _file_type(entry)))
+
+    if len(found) == len(node.children):
+        return pending
+    for (name, child) in node.children.items():
+        if name in found:
+            continue
+        if child.expected is None or child.expected.file_type != ABSENT:
+            mismatches.append(Mismatch(_join(path, name), "missing"))
+    return pending
+
+
+def verify_chain(root, names, mode=None, exact=False):
+    """
+    Verify chain of directories root/names[0]/names[1]/... (path of the
+    chain may be longer than PATH_MAX, full path is never built)
+
+    inputs:
+    root - path of root directory
+    names - names of directories of the chain
+    mode - mode of every directory of the chain, None if not checked
+    exact - when True, every directory of the chain shall contain only
+            the next one and the last one shall be empty
+
+    outputs:
+    list of Mismatch (empty list if chain is as expected), path of
+    mismatch is "<depth>:<name>" (depth 1 is names[0])
+    """
+    mismatches = []
+    try:
+        fd = os.open(root, DIRECTORY_FLAGS)
+    except OSError as e:
+        return [Mismatch(root, "error", None, os.strerror(e.errno))]
+    try:
+        for (depth, name) in enumerate(names, 1):
+            path = "%d:%s" % (depth, name)
+            if exact:
+                with os.scandir(fd) as entries:
+                    for entry in entries:
+                        if entry.name != name:
+                            mismatches.append(Mismatch(
+                                "%d:%s" % (depth, entry.name), "unexpected"))
+            try:
+                st = os.stat(name, dir_fd=fd, follow_symlinks=False)
+            except OSError as e:
+                mismatches.append(Mismatch(path, "missing" if e.errno ==
+                                           errno.ENOENT else "error", None,
+                                           os.strerror(e.errno)))
+                break
+            if not stat.S_ISDIR(st.st_mode):
+                mismatches.append(Mismatch(path, "type", DIRECTORY,
+                                           FILE if stat.S_ISREG(st.st_mode)
+                                           else SYMLINK))
+                break
+            if mode is not None and stat.S_IMODE(st.st_mode) != mode:
+                mismatches.append(Mismatch(path, "mode", oct(mode),
+                                           oct(stat.S_IMODE(st.st_mode))))
+            child_fd = os.open(name, DIRECTORY_FLAGS, dir_fd=fd)
+            os.close(fd)
+            fd = child_fd
+        else:
+            if exact:
+                with os.scandir(fd) as entries:
+                    for entry in entries:
+                        mismatches.append(Mismatch(
+                            "%d:%s" % (len(names) + 1, entry.name),
+                            "unexpected"))
+    finally:
+        os.close(fd)
+    return mismatches
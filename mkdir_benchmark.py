@@ -0,0 +1,98 @@
+'''
+This is pyhon "main" script for latency benchmark of mkdir
+
+It runs benchmark cases (see helper.benchmark), prints summary,
+saves results as JSON and compares them with baseline.
+
+Optional parameters:
+--repetitions N, --warmup N - number of measured and warm-up invocations
+--output FILE - save results as JSON
+--baseline FILE - compare results with baseline, exit 1 on regression
+--alpha, --tolerance - significance level and accepted slowdown
+--update-baseline - save results as new baseline
+
+Created on Jun 17, 2021
+
+@author: Martin Koubek
+'''
+
+import argparse
+import os
+import sys
+
+from helper import benchmark
+from helper.storage import DirectoryStorage
+
+SANDBOX_PATH = "/tmp/mkdir_benchmark_%d" % os.getpid()
+
+
+def parse_arguments():
+    """
+    Parse command line arguments of this script
+    """
+    parser = argparse.ArgumentParser(description="Latency benchmark of mkdir")
+    parser.add_argument("--repetitions", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--baseline", default=benchmark.BASELINE_PATH,
+                        help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--alpha", type=float, default=0.01,
+                        help="significance level of regression test")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="accepted slowdown of median (0.2 = 20%%)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="save results as new baseline")
+    return parser.parse_args()
+
+
+def print_summary(results):
+    """
+    Print summary table (in microseconds)
+    """
+    print("%-16s %10s %10s %10s %10s %10s %21s" % (
+        "case", "min", "median", "p95", "p99", "max", "median 95% CI"))
+    for (name, summary) in sorted(results["cases"].items()):
+        print("%-16s %10.1f %10.1f %10.1f %10.1f %10.1f %10.1f-%10.1f" % (
+            name, summary["min"] / 1e3, summary["median"] / 1e3,
+            summary["p95"] / 1e3, summary["p99"] / 1e3,
+            summary["max"] / 1e3, summary["median_ci95"][0] / 1e3,
+            summary["median_ci95"][1] / 1e3))
+
+
+if __name__ == "__main__":
+    if not sys.platform.startswith('linux'):
+        print ("Benchmark must run on Linux OS")
+        sys.exit(0)
+
+    arguments = parse_arguments()
+    storage = DirectoryStorage()
+    storage.setup(SANDBOX_PATH)
+    try:
+        results = benchmark.run_benchmark(SANDBOX_PATH,
+                                          repetitions=arguments.repetitions,
+                                          warmup=arguments.warmup)
+    finally:
+        storage.cleanup(SANDBOX_PATH)
+
+    print_summary(results)
+    if arguments.output:
+        benchmark.save(results, arguments.output)
+
+    regressions = []
+    if os.path.exists(arguments.baseline) and not arguments.update_baseline:
+        for comparison in benchmark.compare(
+                results, benchmark.load(arguments.baseline),
+                arguments.alpha, arguments.tolerance):
+            print (comparison)
+            if comparison.regressed:
+                regressions.append(comparison)
+    if arguments.update_baseline:
+        benchmark.save(results, arguments.baseline)
+        print ("Baseline saved to", arguments.baseline)
+
+    if regressions:
+        print ("/**BENCHMARK FAILED: ", len(regressions),
+               " cases regressed**/")
+        sys.exit(1)
+    print ("/**BENCHMARK PASSED**/")
+    sys.exit(0)
@@ -0,0 +1,112 @@
+'''
+This is pyhon "main" script for scaling benchmark of mkdir
+
+It sweeps number of directories per invocation, depth of -p chain and
+length of directory name (see helper.scaling), prints table and summary
+where scaling breaks. Deep sweep goes beyond PATH_MAX and verifies every
+created chain.
+
+Optional parameters:
+--sweep NAME - run only selected sweep (count, depth, name_length, deep)
+--max-dirs N - maximal number of directories in count sweep
+--repetitions N - number of measurements of every point
+--csv FILE, --json FILE - save table
+
+Created on Jun 17, 2021
+
+@author: Martin Koubek
+'''
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+from helper import scaling
+from helper.storage import DirectoryStorage
+
+SANDBOX_PATH = "/tmp/mkdir_scaling_%d" % os.getpid()
+SWEEPS = ("count", "depth", "name_length", "deep")
+
+
+def parse_arguments():
+    """
+    Parse command line arguments of this script
+    """
+    parser = argparse.ArgumentParser(description="Scaling benchmark of mkdir")
+    parser.add_argument("--sweep", choices=SWEEPS, action="append",
+                        help="sweep to run (default: all)")
+    parser.add_argument("--max-dirs", type=int, default=100000)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--csv", help="save table as CSV")
+    parser.add_argument("--json", help="save table and summary as JSON")
+    return parser.parse_args()
+
+
+def run_sweep(name, arguments):
+    """
+    Run one sweep in fresh sandbox
+    """
+    storage = DirectoryStorage()
+    storage.setup(SANDBOX_PATH)
+    try:
+        if name == "count":
+            return scaling.sweep_count(SANDBOX_PATH, arguments.max_dirs,
+                                       arguments.repetitions)
+        if name == "depth":
+            return scaling.sweep_depth(SANDBOX_PATH,
+                                       repetitions=arguments.repetitions)
+        if name == "deep":
+            return scaling.sweep_deep(SANDBOX_PATH,
+                                      repetitions=arguments.repetitions)
+        return scaling.sweep_name_length(SANDBOX_PATH,
+                                         repetitions=arguments.repetitions)
+    finally:
+        storage.cleanup(SANDBOX_PATH)
+
+
+if __name__ == "__main__":
+    if not sys.platform.startswith('linux'):
+        print ("Benchmark must run on Linux OS")
+        sys.exit(0)
+
+    arguments = parse_arguments()
+    points = []
+    summaries = {}
+    print("%-12s %8s %8s %6s %12s %12s %12s %5s %5s" % (
+        "sweep", "size", "dirs", "calls", "median[us]", "per dir[us]",
+        "dirs/sec", "exit", "bad"))
+    for name in arguments.sweep or SWEEPS:
+        sweep_points = run_sweep(name, arguments)
+        for point in sweep_points:
+            print("%-12s %8d %8d %6d %12.1f %12.2f %12.0f %5d %5d" % (
+                point.sweep, point.size, point.directories,
+                point.invocations, point.median_ns / 1e3,
+                point.per_directory_ns / 1e3, point.throughput,
+                point.exit_code, point.mismatches))
+        points.extend(sweep_points)
+        summaries[name] = scaling.analyze(sweep_points)
+
+    print()
+    for (name, summary) in summaries.items():
+        print("%s: slope %s%s%s%s" % (
+            name,
+            "n/a" if summary["slope"] is None else "%.2f" % summary["slope"],
+            " - SUPER-LINEAR" if summary["super_linear"] else "",
+            "" if summary["breaks_at"] is None else
+            ", breaks at %d" % summary["breaks_at"],
+            "" if summary["fails_at"] is None else
+            ", fails at %d" % summary["fails_at"]))
+
+    if arguments.csv:
+        with open(arguments.csv, "w", newline="") as output:
+            writer = csv.DictWriter(output, scaling.ScalingPoint.FIELDS)
+            writer.writeheader()
+            for point in points:
+                writer.writerow(point.as_dict())
+    if arguments.json:
+        with open(arguments.json, "w") as output:
+            json.dump({"points": [point.as_dict() for point in points],
+                       "summary": summaries}, output, indent=1)
+    sys.exit(0)
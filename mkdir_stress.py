@@ -0,0 +1,91 @@
+'''
+This is pyhon "main" script for concurrency stress of mkdir
+
+Growing number of workers run mkdir -p on overlapping parent chains of
+shared tree (see helper.stress), every call shall succeed and the tree
+shall have expected modes. Throughput and tail latency are printed for
+every number of workers.
+
+Optional parameters:
+--workers N - number of workers (can be repeated, default 1 .. 256)
+--calls N - number of mkdir calls of every worker
+--mode MODE - value of --mode for every call
+--processes - workers are processes (default threads)
+--csv FILE, --json FILE - save table
+
+Created on Jun 17, 2021
+
+@author: Martin Koubek
+'''
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+from helper import stress
+from helper.storage import DirectoryStorage
+
+SANDBOX_PATH = "/tmp/mkdir_stress_%d" % os.getpid()
+
+
+def parse_arguments():
+    """
+    Parse command line arguments of this script
+    """
+    parser = argparse.ArgumentParser(
+        description="Concurrency stress of mkdir -p")
+    parser.add_argument("--workers", type=int, action="append",
+                        help="number of workers (default: %s)" % ", ".join(
+                            str(count) for count in stress.WORKER_COUNTS))
+    parser.add_argument("--calls", type=int, default=4)
+    parser.add_argument("--mode", help="value of --mode")
+    parser.add_argument("--processes", action="store_true",
+                        help="workers are processes instead of threads")
+    parser.add_argument("--csv", help="save table as CSV")
+    parser.add_argument("--json", help="save table as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    if not sys.platform.startswith('linux'):
+        print ("Stress must run on Linux OS")
+        sys.exit(0)
+
+    arguments = parse_arguments()
+    storage = DirectoryStorage()
+    storage.setup(SANDBOX_PATH)
+    try:
+        stress_results = stress.sweep(
+            SANDBOX_PATH, arguments.workers or stress.WORKER_COUNTS,
+            arguments.calls, arguments.mode, arguments.processes)
+    finally:
+        storage.cleanup(SANDBOX_PATH)
+
+    print("%8s %7s %7s %10s %12s %12s %12s %12s" % (
+        "workers", "calls", "failed", "mismatched", "calls/sec", "p50[us]",
+        "p99[us]", "max[us]"))
+    failed = False
+    for stress_result in stress_results:
+        row = stress_result.as_dict()
+        print("%8d %7d %7d %10d %12.0f %12.1f %12.1f %12.1f" % tuple(
+            row[field] for field in stress.StressResult.FIELDS))
+        for (directory, exit_code, stderr) in stress_result.failures[:5]:
+            print("  FAILED %s: exit code %d %s" % (directory, exit_code,
+                                                    stderr.strip()))
+        for mismatch in stress_result.mismatches[:5]:
+            print("  MISMATCH %s" % (mismatch,))
+        failed = failed or bool(stress_result.failures or
+                                stress_result.mismatches)
+
+    rows = [stress_result.as_dict() for stress_result in stress_results]
+    if arguments.csv:
+        with open(arguments.csv, "w", newline="") as output:
+            writer = csv.DictWriter(output, stress.StressResult.FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    if arguments.json:
+        with open(arguments.json, "w") as output:
+            json.dump(rows, output, indent=1)
+    sys.exit(1 if failed else 0)
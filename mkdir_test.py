@@ -4,36 +4,437 @@ This is pyhon "main" script
 It checks Linux OS and runs all tests in this folder(s)
 No parameter required.
 
+Optional parameters:
+--jobs N - run tests in N worker processes, every worker has its own
+           sandbox folder, so the tests do not step on each other
+--sandbox-base DIR - folder where unique sandbox folders are created
+                     (default: $MKDIR_TEST_SANDBOX_BASE or /tmp), sandboxes
+                     of crashed runs are reclaimed
+--backend - subprocess (real mkdir binary, default), syscall (in-process
+            os.mkdir, much faster) or differential (both, divergences
+            are reported at the end)
+--storage - sandbox storage: directory (default), tmpfs or filesystem
+            image (ext4, xfs, btrfs) - mount requires root
+--cache FILE - cache of passed tests, tests are not run again while
+               mkdir binary, environment and test source are unchanged
+--no-cache - run all tests (cache is not read nor updated)
+-k PATTERN - run only tests whose id matches the pattern (substring or
+             wildcard pattern, can be used more times)
+--module NAME - run only tests of the module (e.g. mode_tests), unknown
+                module is an error
+--json-lines FILE - stream one JSON object per finished test ("-" stdout)
+--junit FILE - write JUnit XML report (written as the tests finish, "-"
+               stdout - written at the end)
+--pass-fail - print "[PASS] <check>" / "[FAIL] <check, explanation>" lines
+--trace - record timing of every mkdir call (spawn, run, drain, decode)
+          and print the slowest tests and calls at the end
+
+Test ids are read from manifest (.mkdir_test_manifest.json), test modules
+are imported only when they are changed or selected. Run without any
+selected test fails (exit code 1).
+
 Created on Jun 17, 2021
 
 @author: Martin Koubek
 '''
 
-import unittest
+import time
+START_TIME = time.perf_counter()
+
+import argparse
+import concurrent.futures
+import functools
+import multiprocessing
+import os
 import sys
+import traceback
+import unittest
+
+from helper.backends import (DifferentialBackend, SubprocessBackend,
+                             SyscallBackend)
+from helper.cache import ResultCache, fingerprint
+from helper.manifest import Manifest, module_names, qualified_name
+from helper.report import (JsonLinesReporter, JUnitReporter,
+                           PassFailReporter, Probe, TestRecord)
+from helper.mkdir import MkDir
+from helper.sandbox import SandboxAllocator
+from helper.storage import STORAGES
+from helper.trace import Tracer
+
+BACKENDS = {
+    "subprocess": SubprocessBackend,
+    "syscall": SyscallBackend,
+    "differential": DifferentialBackend,
+    }
+
+TEST_CASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "test_cases")
+
+"""
+Flat list of all discovered tests. Workers are forked from main process,
+so they can address tests by index and no test object has to be pickled
+"""
+TESTS = []
+
+
+def parse_arguments():
+    """
+    Parse command line arguments of this script
+    """
+    parser = argparse.ArgumentParser(description="Automated tests of mkdir")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (default: 1)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        default="subprocess",
+                        help="how mkdir is executed (default: subprocess)")
+    parser.add_argument("--storage", choices=sorted(STORAGES),
+                        default="directory",
+                        help="where sandbox is created (default: directory)")
+    parser.add_argument("--sandbox-base", metavar="DIR",
+                        help="folder for sandbox folders (default: /tmp)")
+    parser.add_argument("--cache", default=".mkdir_test_cache.json",
+                        help="file with cached results of passed tests")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="run all tests, do not use cache")
+    parser.add_argument("-k", dest="patterns", action="append",
+                        help="run only tests matching the pattern")
+    parser.add_argument("--module", dest="modules", action="append",
+                        help="run only tests of the module")
+    parser.add_argument("--manifest", default=".mkdir_test_manifest.json",
+                        help="file with cached list of tests")
+    parser.add_argument("--json-lines", metavar="FILE",
+                        help="stream results as JSON lines (- for stdout)")
+    parser.add_argument("--junit", metavar="FILE",
+                        help="write results as JUnit XML (- for stdout)")
+    parser.add_argument("--pass-fail", action="store_true",
+                        help="print [PASS]/[FAIL] line for every test")
+    parser.add_argument("--trace", action="store_true",
+                        help="trace mkdir calls, report the slowest ones")
+    arguments = parser.parse_args()
+    known = module_names(TEST_CASES_PATH)
+    for module in arguments.modules or []:
+        if qualified_name(module, TEST_CASES_PATH) not in known:
+            parser.error("argument --module: unknown test module %r "
+                         "(choose from %s)" % (module, ", ".join(
+                             name.split(".")[-1] for name in known)))
+    return arguments
+
+
+def flatten(suite):
+    """
+    Helper function to get list of test cases from (nested) test suite
+    """
+    tests = []
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            tests.extend(flatten(test))
+        else:
+            tests.append(test)
+    return tests
+
+
+def run_test(index):
+    """
+    Run one test in worker process
+
+    outputs:
+    index - index of test in TESTS list
+    status - ok, FAIL, ERROR, skipped, expected failure, unexpected success
+    details - traceback (or skip reason)
+    measurement - (duration_ns, mkdir invocations, child CPU time)
+    divergences - divergences found by differential backend
+    worker - pid of worker
+    calls - mkdir calls traced during the test
+    """
+    divergences = getattr(MkDir.BACKEND, "divergences", [])
+    known_divergences = len(divergences)
+    result = unittest.TestResult()
+    probe = Probe(TESTS[index].id())
+    try:
+        TESTS[index](result)
+    except Exception:
+        return (index, "ERROR", traceback.format_exc(), probe.stop(), [],
+                os.getpid(), probe.traced_calls())
+    measurement = probe.stop()
+    divergences = [repr(d) for d in divergences[known_divergences:]]
+
+    for status, items in (("ERROR", result.errors),
+                          ("FAIL", result.failures),
+                          ("unexpected success",
+                           [(t, "") for t in result.unexpectedSuccesses]),
+                          ("expected failure", result.expectedFailures),
+                          ("skipped", result.skipped)):
+        if items:
+            return (index, status, items[0][1], measurement, divergences,
+                    os.getpid(), probe.traced_calls())
+    return (index, "ok", "", measurement, divergences, os.getpid(),
+            probe.traced_calls())
+
+
+class ParallelResult(object):
+    """
+    Results of parallel run, it provides the same counters as
+    unittest.TestResult that are used for final summary
+    """
+    def __init__(self):
+        self.errors = []
+        self.failures = []
+        self.testsRun = 0
+        self.passed = []
+
+
+class RecordingResult(unittest.TextTestResult):
+    """
+    Text result that records passed tests and their duration (tests
+    with divergences of differential backend are not recorded) and sends
+    every finished test to reporters
+    """
+    def __init__(self, stream, descriptions, verbosity, reporters=()):
+        super(RecordingResult, self).__init__(stream, descriptions,
+                                              verbosity)
+        self.reporters = reporters
+        self.passed = []
+        self.probe = None
+        self.status = "ok"
+        self.details = ""
+        self.known_divergences = 0
+
+    def startTest(self, test):
+        self.probe = Probe(test.id())
+        self.status = "ok"
+        self.details = ""
+        self.known_divergences = len(getattr(MkDir.BACKEND, "divergences",
+                                             []))
+        super(RecordingResult, self).startTest(test)
+
+    def set_status(self, status, details):
+        if self.status != "ERROR":
+            self.status = status
+            self.details = details
+
+    def addSuccess(self, test):
+        super(RecordingResult, self).addSuccess(test)
+        if len(getattr(MkDir.BACKEND, "divergences", [])) == \
+                self.known_divergences:
+            self.passed.append((test, None))
+
+    def addFailure(self, test, err):
+        super(RecordingResult, self).addFailure(test, err)
+        self.set_status("FAIL", self.failures[-1][1])
+
+    def addError(self, test, err):
+        super(RecordingResult, self).addError(test, err)
+        self.set_status("ERROR", self.errors[-1][1])
+
+    def addSubTest(self, test, subtest, err):
+        super(RecordingResult, self).addSubTest(test, subtest, err)
+        if err is not None:
+            if issubclass(err[0], test.failureException):
+                self.set_status("FAIL", self.failures[-1][1])
+            else:
+                self.set_status("ERROR", self.errors[-1][1])
+
+    def addSkip(self, test, reason):
+        super(RecordingResult, self).addSkip(test, reason)
+        self.set_status("skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        super(RecordingResult, self).addExpectedFailure(test, err)
+        self.set_status("expected failure", self.expectedFailures[-1][1])
+
+    def addUnexpectedSuccess(self, test):
+        super(RecordingResult, self).addUnexpectedSuccess(test)
+        self.set_status("unexpected success", "")
+
+    def stopTest(self, test):
+        super(RecordingResult, self).stopTest(test)
+        (duration_ns, invocations, cpu_time) = self.probe.stop()
+        if self.passed and self.passed[-1] == (test, None):
+            self.passed[-1] = (test, duration_ns / 1e9)
+        record = TestRecord(test.id(), self.status, duration_ns, invocations,
+                            cpu_time, self.details, test.shortDescription())
+        for reporter in self.reporters:
+            reporter.record(record)
+
+
+def split_cached(tests, cache, environment):
+    """
+    Split tests to the ones that passed in the same environment (reported
+    from cache) and the ones that have to run
+
+    outputs:
+    cached - list of cached tests
+    tests - list of tests to run
+    keys - dictionary test -> cache key
+    """
+    cached = []
+    to_run = []
+    keys = {}
+    for test in tests:
+        keys[test] = cache.key(environment, test)
+        if cache.get(keys[test]) is None:
+            to_run.append(test)
+        else:
+            cached.append(test)
+    return (cached, to_run, keys)
+
+
+def run_parallel(tests, jobs, reporters=(), tracer=None):
+    """
+    Run tests in pool of worker processes
+    Every test is sent to pool separately, so the run takes approximately
+    time of the slowest test when there are enough workers
+    (workers are not daemonic, so tests can start their own processes)
+    """
+    global TESTS
+    TESTS = tests
+    result = ParallelResult()
+    start_time = time.perf_counter()
+    context = multiprocessing.get_context("fork")
+    with concurrent.futures.ProcessPoolExecutor(
+            jobs, mp_context=context) as pool:
+        futures = [pool.submit(run_test, index)
+                   for index in range(len(tests))]
+        for future in concurrent.futures.as_completed(futures):
+            (index, status, details, measurement, divergences, worker,
+             calls) = future.result()
+            if tracer is not None:
+                tracer.extend(calls)
+                tracer.stop_test(tests[index].id(), measurement[0])
+            if divergences:
+                MkDir.BACKEND.divergences.extend(divergences)
+            test = tests[index]
+            description = test.shortDescription()
+            if description:
+                print(str(test) + "\n" + description + " ... " + status)
+            else:
+                print(str(test) + " ... " + status)
+            sys.stdout.flush()
+            record = TestRecord(test.id(), status, *measurement,
+                                details=details, description=description,
+                                worker=worker)
+            for reporter in reporters:
+                reporter.record(record)
+
+            result.testsRun += 1
+            if status == "ERROR":
+                result.errors.append((test, details))
+            elif status == "FAIL":
+                result.failures.append((test, details))
+            elif status == "ok" and not divergences:
+                result.passed.append((test, measurement[0] / 1e9))
+
+    for (flavour, items) in (("ERROR", result.errors),
+                             ("FAIL", result.failures)):
+        for (test, details) in items:
+            print("=" * 70)
+            print(flavour + ": " + str(test))
+            print("-" * 70)
+            print(details)
+    print("-" * 70)
+    print("Ran %d tests in %.3fs" % (result.testsRun,
+                                     time.perf_counter() - start_time))
+    print()
+    return result
+
 
 if __name__ == "__main__":
     if not sys.platform.startswith('linux'):
         print ("Tests must run on Linux OS")
         sys.exit(0)
-        
+
+    arguments = parse_arguments()
+    MkDir.BACKEND = BACKENDS[arguments.backend]()
+    from test_cases.base_test import BaseTest
+    BaseTest.STORAGE = STORAGES[arguments.storage]()
+    BaseTest.SANDBOXES = SandboxAllocator(arguments.sandbox_base)
+
     '''
-    Load all tests in a folder
+    Load selected tests - ids are taken from manifest, so only modules of
+    selected tests are imported
     '''
+    manifest = Manifest(arguments.manifest, TEST_CASES_PATH)
+    test_ids = manifest.select(arguments.modules, arguments.patterns)
+    manifest.save()
+    if not test_ids:
+        print ("/**TEST FAILED: no test selected (%d tests, check --module "
+               "and -k)**/" % manifest.total)
+        sys.exit(1)
     loader = unittest.TestLoader()
-    tests = loader.discover('.', pattern="*.py")
-    testRunner = unittest.runner.TextTestRunner(stream=sys.stdout, 
-                                                verbosity=2)
+    tests = flatten(loader.loadTestsFromNames(test_ids))
+
+    """
+    Reporters get every test as soon as it finishes
+    """
+    reporters = []
+    if arguments.json_lines:
+        reporters.append(JsonLinesReporter(
+            sys.stdout if arguments.json_lines == "-"
+            else open(arguments.json_lines, "w")))
+    if arguments.junit:
+        reporters.append(JUnitReporter(
+            sys.stdout if arguments.junit == "-"
+            else open(arguments.junit, "w", encoding="utf-8")))
+    if arguments.pass_fail:
+        reporters.append(PassFailReporter(sys.stdout))
+
+    """
+    Tests that passed in the same environment are taken from cache
+    """
+    cache = None
+    cached = []
+    if not arguments.no_cache:
+        cache = ResultCache(arguments.cache)
+        environment = fingerprint(arguments.backend, arguments.storage,
+                                  BaseTest.SANDBOXES.run_root())
+        (cached, tests, keys) = split_cached(tests, cache, environment)
+        for test in cached:
+            print(str(test) + " ... ok (cached)")
+            record = TestRecord(test.id(), "ok", cached=True,
+                                description=test.shortDescription())
+            for reporter in reporters:
+                reporter.record(record)
+    print("Startup: %.1f ms (manifest: %d modules cached, %d loaded; "
+          "%d of %d tests selected)" % (
+              (time.perf_counter() - START_TIME) * 1e3, manifest.hits,
+              manifest.misses, len(tests) + len(cached), manifest.total))
+    sys.stdout.flush()
 
     """
     Process results
     """
-    result = testRunner.run(tests)
+    tracer = Tracer() if arguments.trace else None
+    if tracer is not None:
+        tracer.__enter__()
+    if arguments.jobs > 1:
+        result = run_parallel(tests, arguments.jobs, reporters, tracer)
+    else:
+        testRunner = unittest.runner.TextTestRunner(
+            stream=sys.stdout, verbosity=2,
+            resultclass=functools.partial(RecordingResult,
+                                          reporters=reporters))
+        result = testRunner.run(unittest.TestSuite(tests))
+    for reporter in reporters:
+        reporter.close()
+    if tracer is not None:
+        tracer.__exit__(None, None, None)
+        print(tracer.report())
+        print()
+    if cache is not None:
+        for (test, duration) in result.passed:
+            cache.put(keys[test], test.id(), "ok", duration)
+        cache.save()
+        if cached:
+            print("%d tests reported from cache (use --no-cache to run "
+                  "them)" % len(cached))
+        result.testsRun += len(cached)
+    for divergence in getattr(MkDir.BACKEND, "divergences", []):
+        print ("DIVERGENCE: ", divergence)
     if len(result.errors) == 0 and len(result.failures) == 0 :
         print ("/**TEST PASSED: all ", result.testsRun, "tests passed**/")
         sys.exit(0)
     else:
-        print ("/**TEST FAILED: ", 
-               len(result.errors) + len(result.failures), " from ", 
+        print ("/**TEST FAILED: ",
+               len(result.errors) + len(result.failures), " from ",
                result.testsRun, " tests failed or was erronerous**/")
         sys.exit(1)
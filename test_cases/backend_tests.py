@@ -0,0 +1,109 @@
+"""
+Backend conformance testing
+
+In-process (syscall) backend shall behave the same way as the real mkdir
+binary. Every command is executed by both backends and results (exit code,
+stdout, stderr, created directories and their modes) are compared.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+
+from test_cases.base_test import BaseTest
+from helper.backends import DifferentialBackend
+from helper.mkdir import MkDir
+
+
+class BackendTest(BaseTest):
+    def setUp(self):
+        """
+        Setup function
+        create differential backend that is used in all tests below
+        """
+        super(BackendTest, self).setUp()
+        self.backend = DifferentialBackend()
+
+    def check(self, directory_list, arguments_list=[]):
+        """
+        Helper function - run command by both backends and check divergences
+        """
+        MkDir.run(directory_list, arguments_list, backend=self.backend)
+        self.assertEqual([], self.backend.divergences,
+                         "Backends diverge")
+
+    def test_mkdir(self):
+        """
+        Test creation of one and more directories
+        Expectation: both backends return the same result
+        """
+        self.check([os.path.join(self.DEFAULT_FOLDER_PATH, "test")])
+        self.check([os.path.join(self.DEFAULT_FOLDER_PATH, "1"),
+                    os.path.join(self.DEFAULT_FOLDER_PATH, "2")])
+
+    def test_mkdir_errors(self):
+        """
+        Test failing creation - existing directory, missing parent
+        Expectation: both backends return the same result
+        """
+        directory = os.path.join(self.DEFAULT_FOLDER_PATH, "test")
+        os.mkdir(directory)
+        self.check([directory])
+        self.check([os.path.join(self.DEFAULT_FOLDER_PATH, "a", "b")])
+        self.check([""])
+
+    def test_modes(self):
+        """
+        Test numeric and symbolic modes
+        Expectation: both backends return the same result
+        """
+        modes = [(MkDir.ArgumentsName.MODE, mode) for mode in (
+            "440", "777", "1777", "=r", "u+rwx,g-w,o=", "+X", "a=rwx,g-w",
+            "888", "a")]
+        modes += [(MkDir.ArgumentsName.MODE_LONG, mode) for mode in (
+            "+t", "o=t", "+t,o+w", "g+s,o-w", "u-w,+t")]
+        for (index, (name, mode)) in enumerate(modes):
+            self.check(
+                [os.path.join(self.DEFAULT_FOLDER_PATH, "test%d" % index)],
+                [MkDir.Arguments(name, mode)])
+
+    def test_parents_verbose(self):
+        """
+        Test parents and verbose arguments
+        Expectation: both backends return the same result
+        """
+        directory = os.path.join(self.DEFAULT_FOLDER_PATH, "a", "b", "c")
+        for arguments in (
+                [MkDir.Arguments(MkDir.ArgumentsName.PARENTS),
+                 MkDir.Arguments(MkDir.ArgumentsName.VERBOSE)],
+                [MkDir.Arguments(MkDir.ArgumentsName.MODE_LONG, '444'),
+                 MkDir.Arguments(MkDir.ArgumentsName.PARENTS_LONG),
+                 MkDir.Arguments(MkDir.ArgumentsName.VERBOSE_LONG)]):
+            self.check([directory], arguments)
+
+    def test_invalid_arguments(self):
+        """
+        Test invalid argument and missing operand
+        Expectation: both backends return the same result
+        """
+        self.check([os.path.join(self.DEFAULT_FOLDER_PATH, "test")],
+                   [MkDir.Arguments(MkDir.ArgumentsName.INVALID_ARG)])
+        self.check([], [MkDir.Arguments(MkDir.ArgumentsName.VERBOSE)])
+
+    def test_parents_blocked(self):
+        """
+        Test parents argument with file and dangling symlink in the chain,
+        trailing and doubled slashes
+        Expectation: both backends return the same result
+        """
+        open(os.path.join(self.DEFAULT_FOLDER_PATH, "file"), "w").close()
+        os.symlink("missing", os.path.join(self.DEFAULT_FOLDER_PATH,
+                                           "dangling"))
+        parents = [MkDir.Arguments(MkDir.ArgumentsName.PARENTS),
+                   MkDir.Arguments(MkDir.ArgumentsName.VERBOSE)]
+        for name in ("file/a/b", "dangling/a", "x//y/", "w/w/"):
+            self.check([os.path.join(self.DEFAULT_FOLDER_PATH, name)],
+                       parents)
+        self.check([os.path.join(self.DEFAULT_FOLDER_PATH, "m/m/")],
+                   parents + [MkDir.Arguments(MkDir.ArgumentsName.MODE,
+                                              "u=rwx")])
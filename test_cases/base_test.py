@@ -2,6 +2,8 @@
 This is base class for unittests.
 
 It helps to cleanup space. Unittest will have always cleanup starting point 
+Every test gets its own sandbox folder (see helper.sandbox), so more runs
+on the same host do not destroy sandboxes of each other
 Created on Jun 17, 2021
 
 @author: Martin Koubek
@@ -9,16 +11,24 @@ Created on Jun 17, 2021
 import unittest
 import os
 
+from helper.sandbox import SandboxAllocator
+from helper.storage import DirectoryStorage
+
 class BaseTest(unittest.TestCase):
-    DEFAULT_FOLDER_PATH = "/tmp/mkdir_test"
+    DEFAULT_FOLDER_PATH = None
+    SANDBOXES = SandboxAllocator()
+    STORAGE = DirectoryStorage()
     
     def setUp(self):
         """
+        Allocate unique sandbox path of the test (DEFAULT_FOLDER_PATH)
         Remove directory - in case of unittest crash and some mess remain
-        Create fresh directory
+        Create fresh directory (plain folder, tmpfs or filesystem image -
+        see helper.storage)
         """
-        self.__cleanup()
-        os.mkdir(self.DEFAULT_FOLDER_PATH)
+        self.DEFAULT_FOLDER_PATH = self.SANDBOXES.test_path(
+            self._testMethodName)
+        self.cleanup_report = self.STORAGE.setup(self.DEFAULT_FOLDER_PATH)
 
 
     def tearDown(self):
@@ -29,6 +39,8 @@ class BaseTest(unittest.TestCase):
 
     def __cleanup(self):
         """
-        Used rm -rf command to ensure, the folder is always removed
+        Remove the folder in-process (no rm -rf), directories without
+        permissions are made accessible, so the folder is always removed
+        Report of the last cleanup is kept in cleanup_report
         """
-        os.system("rm -rf " + self.DEFAULT_FOLDER_PATH)
\ No newline at end of file
+        self.cleanup_report = self.STORAGE.cleanup(self.DEFAULT_FOLDER_PATH)
@@ -0,0 +1,98 @@
+"""
+Cache of test results
+
+Passed result shall be reused only in the same environment - the same
+binary, backend, storage, user and source of helpers and of the test
+module. Anything else is a miss and the test runs again.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import importlib.util
+import os
+import sys
+
+from test_cases.base_test import BaseTest
+from helper.cache import ResultCache, fingerprint
+
+MODULE_SOURCE = """
+import unittest
+
+
+class CachedTest(unittest.TestCase):
+    def test_%s(self):
+        pass
+"""
+
+
+class CacheTest(BaseTest):
+    def load_test(self, name, version):
+        """
+        Helper function - test object from module written to sandbox
+        """
+        path = os.path.join(self.DEFAULT_FOLDER_PATH, name + ".py")
+        with open(path, "w") as output:
+            output.write(MODULE_SOURCE % version)
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        self.addCleanup(sys.modules.pop, name, None)
+        spec.loader.exec_module(module)
+        return module.CachedTest("test_%s" % version)
+
+    def test_hit_and_miss(self):
+        """
+        Store passed test and look it up by new cache (from file) in the
+        same and in different environment
+        Expectation: hit in the same environment, miss with other user,
+        locale, backend or storage
+        """
+        path = os.path.join(self.DEFAULT_FOLDER_PATH, "cache.json")
+        environment = fingerprint("subprocess", "directory",
+                                  self.DEFAULT_FOLDER_PATH)
+        self.assertEqual(os.geteuid(), environment["euid"])
+        self.assertEqual(os.environ.get("LANG", ""),
+                         environment["locale"]["LANG"])
+        test = self.load_test("cached_module", "one")
+        cache = ResultCache(path)
+        key = cache.key(environment, test)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, test.id(), "ok", 0.5)
+        cache.save()
+
+        cache = ResultCache(path)
+        self.assertEqual(("ok", 0.5), (cache.get(key)["status"],
+                                       cache.get(key)["duration"]))
+        self.assertEqual(key, cache.key(dict(environment), test))
+        for (field, value) in (("euid", environment["euid"] + 1),
+                               ("locale", dict(environment["locale"],
+                                               LC_ALL="de_DE.UTF-8")),
+                               ("backend", "syscall"),
+                               ("storage", "tmpfs")):
+            with self.subTest(field=field):
+                changed = dict(environment)
+                changed[field] = value
+                self.assertIsNone(cache.get(cache.key(changed, test)))
+
+    def test_invalidation(self):
+        """
+        Change source of test module, overfill cache
+        Expectation: changed module is a miss, the least recently used
+        entries are evicted
+        """
+        environment = {"backend": "subprocess"}
+        cache = ResultCache(os.path.join(self.DEFAULT_FOLDER_PATH,
+                                         "cache.json"), max_entries=2)
+        test = self.load_test("changed_module", "one")
+        key = cache.key(environment, test)
+        cache.put(key, test.id(), "ok", 0.1)
+        self.load_test("changed_module", "one_changed")
+        self.assertNotEqual(key, ResultCache(cache.path).key(environment,
+                                                             test))
+
+        cache.put("second", "second", "ok", 0.1)
+        cache.get(key)
+        cache.put("third", "third", "ok", 0.1)
+        self.assertIsNotNone(cache.get(key))
+        self.assertIsNone(cache.get("second"))
+        self.assertIsNotNone(cache.get("third"))
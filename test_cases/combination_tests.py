@@ -0,0 +1,73 @@
+"""
+Combination testing of mkdir options
+
+Options (short/long forms, modes, -p, -v, context, invalid arguments) and
+shapes of target directory are combined by covering arrays (see
+helper.combinations) - every pair (or t-tuple) of levels is tested at
+least once with far less cases than full cartesian product. Every case
+is run by MkDir.run with differential backend, so the real mkdir is
+compared with the in-process model too.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import itertools
+import os
+
+from test_cases.base_test import BaseTest
+from helper.backends import DifferentialBackend
+from helper.combinations import FACTORS, covering_array, generate_cases, \
+    product_size
+from helper.mkdir import MkDir
+
+
+class CombinationTest(BaseTest):
+    def check_cases(self, cases):
+        """
+        Helper function - run every case in its own folder (one subTest
+        per case)
+        """
+        backend = DifferentialBackend()
+        for (index, case) in enumerate(cases):
+            with self.subTest(case=repr(case)):
+                root = os.path.join(self.DEFAULT_FOLDER_PATH, "c%d" % index)
+                os.mkdir(root)
+                (directory_list, arguments_list) = case.prepare(root)
+                result = MkDir.run(directory_list, arguments_list,
+                                   backend=backend)
+                self.assertEqual([], case.check(result, directory_list[0]))
+                self.assertEqual([], backend.divergences, "Backends diverge")
+            del backend.divergences[:]
+
+    def test_covering_array(self):
+        """
+        Covering array of strength 2 and 3
+        Expectation: every t-tuple of levels is covered, array is much
+        smaller than cartesian product
+        """
+        factors = [len(levels) for levels in FACTORS.values()]
+        for strength in (2, 3):
+            rows = covering_array(factors, strength)
+            for combination in itertools.combinations(range(len(factors)),
+                                                      strength):
+                covered = set(tuple(row[f] for f in combination)
+                              for row in rows)
+                self.assertEqual(
+                    len(set(itertools.product(*[range(factors[f])
+                                                for f in combination]))),
+                    len(covered), "Not covered: %s" % (combination,))
+            self.assertLess(len(rows) * 10, product_size())
+
+    def test_pairwise(self):
+        """
+        All pairs of options and directory shapes
+        Expectation: results as computed by case, backends do not diverge
+        """
+        self.check_cases(generate_cases(strength=2))
+
+    def test_three_wise(self):
+        """
+        All triples of options and directory shapes
+        Expectation: results as computed by case, backends do not diverge
+        """
+        self.check_cases(generate_cases(strength=3))
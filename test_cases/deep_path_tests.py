@@ -0,0 +1,144 @@
+"""
+Testing of deep paths and PATH_MAX
+
+Interface tests check one component of NAME_MAX length, these tests check
+whole paths near and beyond PATH_MAX and chains thousands of levels deep:
+* path of PATH_MAX - 1 bytes is created, PATH_MAX bytes fails with
+  ENAMETOOLONG (without -p)
+* -p creates chains beyond PATH_MAX (component by component)
+* time per level does not grow with depth (no O(depth^2))
+
+Chains are prepared, verified and removed by fd-relative syscalls
+(helper.verify.verify_chain, helper.cleanup.remove_tree), so the checks
+do not hit ENAMETOOLONG themselves.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import errno
+import os
+
+from test_cases.base_test import BaseTest
+from helper.cleanup import remove_tree
+from helper.mkdir import MkDir
+from helper.scaling import slope, sweep_deep
+from helper.verify import verify_chain
+
+DIRECTORY_FLAGS = os.O_RDONLY | os.O_DIRECTORY
+
+
+class DeepPathTest(BaseTest):
+    QUADRATIC_SLOPE = 1.6
+    ATTEMPTS = 3
+
+    def chain_names(self, root, length):
+        """
+        Helper function - names of components, path root + "/" +
+        "/".join(names) is exactly length bytes long
+        """
+        name_max = os.pathconf(root, "PC_NAME_MAX")
+        left = length - len(os.fsencode(root))
+        names = []
+        while left > 0:
+            size = min(name_max, left - 1)
+            if 0 < left - 1 - size < 2:
+                size -= 2
+            names.append("n" * size)
+            left -= size + 1
+        return names
+
+    def make_parents(self, root, names):
+        """
+        Helper function - create chain of names by mkdirat (no full path)
+        """
+        fd = os.open(root, DIRECTORY_FLAGS)
+        try:
+            for name in names:
+                os.mkdir(name, dir_fd=fd)
+                child_fd = os.open(name, DIRECTORY_FLAGS, dir_fd=fd)
+                os.close(fd)
+                fd = child_fd
+        finally:
+            os.close(fd)
+
+    def test_path_max(self):
+        """
+        Create the last directory of path PATH_MAX - 1 and PATH_MAX bytes
+        long (parents exist)
+        Expectation: PATH_MAX - 1 is created, PATH_MAX fails with
+        ENAMETOOLONG, with -p both are created
+        """
+        path_max = os.pathconf(self.DEFAULT_FOLDER_PATH, "PC_PATH_MAX")
+        for (index, (length, parents)) in enumerate((
+                (path_max - 1, False), (path_max, False),
+                (path_max, True), (path_max * 2, True))):
+            with self.subTest(length=length, parents=parents):
+                root = os.path.join(self.DEFAULT_FOLDER_PATH, str(index))
+                os.mkdir(root)
+                names = self.chain_names(root, length)
+                directory = os.path.join(root, *names)
+                self.assertEqual(length, len(os.fsencode(directory)))
+                if not parents:
+                    self.make_parents(root, names[:-1])
+                arguments_list = [MkDir.Arguments(
+                    MkDir.ArgumentsName.PARENTS)] if parents else []
+
+                (exit_code, _, stderr) = MkDir.run([directory],
+                                                   arguments_list)
+                mismatches = verify_chain(root, names, exact=True)
+                if length < path_max or parents:
+                    self.assertEqual(0, exit_code, stderr)
+                    self.assertEqual([], mismatches)
+                else:
+                    self.assertEqual(1, exit_code)
+                    self.assertIn(os.strerror(errno.ENAMETOOLONG), stderr)
+                    self.assertEqual(["missing"],
+                                     [m.kind for m in mismatches])
+                    self.assertEqual(len(names), int(
+                        mismatches[0].path.split(":")[0]))
+
+    def test_deep_chain(self):
+        """
+        Create chain of 3000 levels by -p (beyond PATH_MAX), verify and
+        remove it
+        Expectation: every level created, nothing else, removed without
+        errors
+        """
+        names = ["d"] * 3000
+        directory = os.path.join(self.DEFAULT_FOLDER_PATH, *names)
+        (exit_code, _, stderr) = MkDir.run(
+            [directory], [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)])
+        self.assertEqual(0, exit_code, stderr)
+        self.assertEqual([], verify_chain(self.DEFAULT_FOLDER_PATH, names,
+                                          mode=None, exact=True))
+
+        report = remove_tree(os.path.join(self.DEFAULT_FOLDER_PATH, "d"))
+        self.assertEqual(0, report.errors)
+        self.assertEqual(len(names), report.entries)
+        self.assertEqual([], os.listdir(self.DEFAULT_FOLDER_PATH))
+
+    def test_depth_scaling(self):
+        """
+        Time of -p chain of 1000 .. 4000 levels (time per level grows in
+        steps at shorter chains - dentry cache effects - the last doubling
+        of depth is compared), measured again up to ATTEMPTS times when
+        noise of busy machine exceeds the limit
+        Expectation: every chain is created and verified, doubling of depth
+        does not double time per level (slope of log(the best time) /
+        log(depth) of the two deepest chains is far from 2.0 of quadratic
+        behaviour)
+        """
+        attempts = []
+        for _ in range(self.ATTEMPTS):
+            points = sweep_deep(self.DEFAULT_FOLDER_PATH, (1000, 2000, 4000),
+                                repetitions=2)
+            for point in points:
+                self.assertEqual(0, point.exit_code, point.size)
+                self.assertEqual(0, point.mismatches, point.size)
+            attempts.append(["%d: %.1f us/level" % (
+                point.size, point.min_ns / point.size / 1e3)
+                for point in points])
+            if slope(points[-2:], "min_ns") < self.QUADRATIC_SLOPE:
+                break
+        else:
+            self.fail("time per level grows with depth %s" % (attempts,))
@@ -6,20 +6,84 @@ Testing was devided to:
 * no permission 
 * no disk space
 * foder already exists
+* exhausted inodes / blocks - small tmpfs or ext4 image filled to exactly
+  0, 1 and N free inodes / blocks (helper.exhaustion)
 
 Created on Jun 17, 2021
 
 @author: Martin Koubek
 """
 
+import errno
 import os
 import subprocess
 
 from test_cases.base_test import BaseTest
+from helper.exhaustion import fill, run_exhausted
 from helper.mkdir import MkDir
+from helper.storage import LoopStorage, TmpfsStorage
 
 
 class FaultTest(BaseTest):
+    FREE_COUNTS = (0, 1, 3)
+
+    def check_exhaustion(self, storage, resource_name):
+        """
+        Helper function - mkdir of N + 1 directories and -p chain of N + 1
+        directories on filesystem with 0, 1 and N free inodes / blocks
+        (filesystem is mounted next to the sandbox folder)
+        Expectation: exactly as many directories as free resources are
+        created (in order of operands / components), the rest fails with
+        ENOSPC
+        """
+        if os.geteuid() != 0:
+            self.skipTest("Mount requires root")
+        root = self.DEFAULT_FOLDER_PATH + ".bounded"
+        self.addCleanup(storage.cleanup, root)
+        count = max(self.FREE_COUNTS) + 1
+        names = ["d%d" % index for index in range(count)]
+        chain = [os.path.join(*["c%d" % i for i in range(index + 1)])
+                 for index in range(count)]
+        for free in self.FREE_COUNTS:
+            for parents in (False, True):
+                with self.subTest(free=free, parents=parents):
+                    storage.setup(root)
+                    fill(root, **{resource_name: free})
+                    if parents:
+                        report = run_exhausted(
+                            root, [os.path.join(root, chain[-1])],
+                            [MkDir.Arguments(MkDir.ArgumentsName.PARENTS)])
+                        expected = chain[:free]
+                    else:
+                        report = run_exhausted(
+                            root, [os.path.join(root, name)
+                                   for name in names])
+                        expected = names[:free]
+                    self.assertEqual(expected, report.created, report)
+                    self.assertEqual(1, report.exit_code, report)
+                    self.assertIn(os.strerror(errno.ENOSPC), report.stderr)
+
+    def test_inodes_exhausted(self):
+        """
+        Test directory creation on tmpfs with limited number of inodes
+        Expectation: directories are created while there are free inodes
+        """
+        self.check_exhaustion(TmpfsStorage(size="1m", nr_inodes=64),
+                              "inodes")
+
+    def test_blocks_exhausted(self):
+        """
+        Test directory creation on ext4 image without free blocks (every
+        directory takes one block)
+        Expectation: directories are created while there are free blocks
+        """
+        if not LoopStorage.is_available("ext4"):
+            self.skipTest("mkfs.ext4 is not installed")
+        self.check_exhaustion(
+            LoopStorage("ext4", "8M", ["-m", "0", "-b", "1024", "-N", "64"],
+                        shared=False),
+            "blocks")
+
     def test_no_permission(self):
         """
         Test directory creation in directory without permision for writting 
@@ -16,6 +16,7 @@ mkdir command in version "mkdir (GNU coreutils) 8.25"
 Created on Jun 17, 2021
 @author: Martin Koubek
 """
+import asyncio
 import os
 
 from test_cases.base_test import BaseTest
@@ -68,8 +69,8 @@ class FunctionalTest(BaseTest):
         Setup function
         create test folder that is used in many tests below
         """
-        self.test_dir = os.path.join(self.DEFAULT_FOLDER_PATH, "func_test")
         super(FunctionalTest, self).setUp()
+        self.test_dir = os.path.join(self.DEFAULT_FOLDER_PATH, "func_test")
 
     def test_mkdir(self):
         """
@@ -101,6 +102,49 @@ class FunctionalTest(BaseTest):
         self.assertTrue(os.path.exists(dir2),
                         "Directory 2 was not created:" + stderr)
 
+    def test_mkdir_run_many(self):
+        """
+        Testing of many mkdir commands executed by pool of workers
+        Expectation: results are in the same order as commands
+        """
+        if getattr(MkDir.BACKEND, "STATEFUL", False):
+            self.skipTest("Stateful backend can not run in pool")
+        dir1 = os.path.join(self.DEFAULT_FOLDER_PATH, "1")
+        dir2 = os.path.join(self.DEFAULT_FOLDER_PATH, "2")
+        os.mkdir(dir1)
+
+        results = MkDir.run_many([
+            ([dir1], []),
+            ([dir2], [MkDir.Arguments(MkDir.ArgumentsName.VERBOSE)])
+            ])
+
+        self.assertEqual([1, 0], [result[0] for result in results],
+                         "Exit codes do not match commands:" + str(results))
+        self.assertTrue(len(results[1][1]) > 0,
+                        "Stdout is not used for verbose:" + results[1][2])
+        self.assertTrue(os.path.exists(dir2),
+                        "Directory was not created:" + results[1][2])
+
+    def test_mkdir_async(self):
+        """
+        Testing of many mkdir commands running concurrently by asyncio
+        Expectation: results are in the same order as commands
+        """
+        if getattr(MkDir.BACKEND, "STATEFUL", False):
+            self.skipTest("Stateful backend can not run in pool")
+        dir_list = [os.path.join(self.DEFAULT_FOLDER_PATH, str(idx))
+                    for idx in range(16)]
+        os.mkdir(dir_list[0])
+
+        results = asyncio.run(MkDir.agather(
+            [([directory], []) for directory in dir_list], limit=4))
+
+        self.assertEqual([1] + [0] * 15, [result[0] for result in results],
+                         "Exit codes do not match commands:" + str(results))
+        for directory in dir_list:
+            self.assertTrue(os.path.exists(directory),
+                            "Directory was not created:" + directory)
+
     def test_mode_r(self):
         """
         Create directory with mode read for user and group (using number), 
@@ -499,3 +543,26 @@ class FunctionalTest(BaseTest):
                          stderr)
         self.assertTrue(len(stdout) > 0, "Stdout is not used for verbose:" +
                         stderr)
+
+    def test_verbose_streaming(self):
+        """
+        Printout details about directory creation line by line as mkdir
+        runs, name that is not valid UTF-8 does not break decoding
+        Expectation: one verbose line for every created directory
+        """
+        parent_dir = os.path.join(self.test_dir, "parent")
+        invalid_dir = os.path.join(self.test_dir,
+                                   os.fsdecode(b"invalid_\xff"))
+        lines = []
+        exit_code = MkDir.run_streaming(
+            [parent_dir, invalid_dir],
+            [MkDir.Arguments(MkDir.ArgumentsName.PARENTS),
+             MkDir.Arguments(MkDir.ArgumentsName.VERBOSE)],
+            lambda stream, line: lines.append((stream, line)))
+
+        self.assertEqual(0, exit_code,
+                         "Exit code raise for folder creation:" + str(lines))
+        self.assertEqual(["stdout"] * 3, [stream for (stream, _) in lines],
+                         "Verbose lines are not valid:" + str(lines))
+        self.assertTrue(os.path.exists(invalid_dir),
+                        "Directory was not created:" + str(lines))
@@ -3,27 +3,125 @@ Testing of error injections
 
 Error or Fault injection is a testing technique which aids in understanding how a [virtual/real] system behaves when stressed in unusual ways.
 
-This testing was not done as mkdir command is very simple which makes this testing imposible.
+Faults are injected to mkdir process only (see helper.injection):
+    errno of mkdir(2)/mkdirat(2) - ENOSPC, EDQUOT, EMLINK, EIO, EINTR
+    (seccomp filter, no LD_PRELOAD)
+    resource limits - RLIMIT_NOFILE, RLIMIT_AS
+    CPU throttling - cgroup CPU quota (skipped if cgroup is not available)
+    killing of mkdir process at random points
 
-For complex software system, the following strategies would be used:
-    killing some of software system subprocess
-    TCP/UDP communication
-    unrealible connections
-    unreable counterpart of system
-    CPU/memory overloading
-    Disk out of space
-    Change of permissions
+Outcome and latency of every call is recorded by InjectionBackend.
 
 Created on Jun 17, 2021
 @author: Martin Koubek
 """
+import errno
+import os
+import resource
 
 from test_cases.base_test import BaseTest
+from helper.injection import CpuThrottleFault, ErrnoFault, \
+    InjectionBackend, KillFault, RlimitFault
+from helper.mkdir import MkDir
 
 
 class InjectionTest(BaseTest):
     """
-    Injection Tests are not implemented
-    https://en.wikipedia.org/wiki/Fault_injection'''
+    https://en.wikipedia.org/wiki/Fault_injection
     """
-    pass
+    ERRORS = (errno.ENOSPC, errno.EDQUOT, errno.EMLINK, errno.EIO,
+              errno.EINTR)
+
+    def run_fault(self, fault, directory_list, arguments_list=[]):
+        """
+        Helper function - run mkdir with fault (test is skipped when fault
+        can not be injected here)
+
+        outputs:
+        (exit_code, stdout, stderr), Outcome
+        """
+        reason = fault.available()
+        if reason is not None:
+            self.skipTest(reason)
+        with InjectionBackend(fault) as backend:
+            result = MkDir.run(directory_list, arguments_list,
+                               backend=backend)
+        return (result, backend.outcomes[-1])
+
+    def test_errno(self):
+        """
+        mkdir(2)/mkdirat(2) fail with errno, with and without -p
+        Expectation: exit code 1, error message with strerror, nothing
+        created
+        """
+        for error in self.ERRORS:
+            for arguments_list in ([], [MkDir.Arguments(
+                    MkDir.ArgumentsName.PARENTS)]):
+                with self.subTest(error=errno.errorcode[error],
+                                  parents=bool(arguments_list)):
+                    directory = os.path.join(self.DEFAULT_FOLDER_PATH,
+                                             errno.errorcode[error], "test")
+                    if not arguments_list:
+                        os.mkdir(os.path.dirname(directory))
+                    ((exit_code, _, stderr), outcome) = self.run_fault(
+                        ErrnoFault(error), [directory], arguments_list)
+                    self.assertEqual(1, exit_code, stderr)
+                    self.assertIn(os.strerror(error), stderr)
+                    self.assertFalse(os.path.exists(directory))
+                    self.assertEqual(0, outcome.created)
+                    self.assertGreater(outcome.duration_ns, 0)
+
+    def test_rlimit(self):
+        """
+        mkdir with no free file descriptors and with tiny / sufficient
+        address space
+        Expectation: it fails without creating directory, or it works
+        """
+        for (fault, works) in (
+                (RlimitFault(resource.RLIMIT_NOFILE, 3), False),
+                (RlimitFault(resource.RLIMIT_AS, 1 << 20), False),
+                (RlimitFault(resource.RLIMIT_AS, 256 << 20), True)):
+            with self.subTest(fault=fault.name):
+                directory = os.path.join(self.DEFAULT_FOLDER_PATH,
+                                         "test%d" % fault.value)
+                ((exit_code, _, stderr), outcome) = self.run_fault(
+                    fault, [directory])
+                self.assertEqual(works, exit_code == 0, stderr)
+                self.assertEqual(works, os.path.isdir(directory))
+                if not works:
+                    self.assertNotEqual("", stderr)
+
+    def test_cpu_throttle(self):
+        """
+        mkdir in cgroup with 1% of CPU
+        Expectation: directory is created, only latency grows
+        """
+        directory_list = [os.path.join(self.DEFAULT_FOLDER_PATH, "test%d" % i)
+                          for i in range(10)]
+        ((exit_code, _, stderr), outcome) = self.run_fault(
+            CpuThrottleFault(0.01), directory_list)
+        self.assertEqual(0, exit_code, stderr)
+        self.assertEqual(len(directory_list), outcome.created)
+
+    def test_kill(self):
+        """
+        mkdir killed by SIGKILL at random points of a long run
+        Expectation: exit by signal, directories are created in order of
+        operands - created ones are a prefix of the list
+        """
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                root = os.path.join(self.DEFAULT_FOLDER_PATH, "kill%d" % seed)
+                os.mkdir(root)
+                directory_list = [os.path.join(root, "test%d" % i)
+                                  for i in range(5000)]
+                ((exit_code, _, _), outcome) = self.run_fault(
+                    KillFault(0.005, seed), directory_list)
+                created = [os.path.isdir(d) for d in directory_list]
+                self.assertEqual(outcome.created, sum(created))
+                self.assertEqual([True] * outcome.created,
+                                 created[:outcome.created])
+                if outcome.killed:
+                    self.assertEqual(-9, exit_code)
+                else:
+                    self.assertEqual(0, exit_code)
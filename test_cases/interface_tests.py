@@ -11,10 +11,14 @@ Testing was devided to:
 Created on Jun 17, 2021
 @author: Martin Koubek
 """
+import errno
 import os
 
 from test_cases.base_test import BaseTest
+from helper.backends import quote
 from helper.mkdir import MkDir
+from helper import result
+from helper.verify import expect_all, verify_tree
 
 
 class InterfaceTest(BaseTest):
@@ -185,6 +189,100 @@ class InterfaceTest(BaseTest):
 
         self.assertEqual(0, exit_code, 
                          "Exit code raise for folder creation:" + stderr)
-        for directory in dir_list:
-            self.assertTrue(os.path.exists(directory),
-                            "Directory was not created:" + stderr)
+        self.assertEqual(
+            [],
+            verify_tree(self.DEFAULT_FOLDER_PATH,
+                        expect_all([os.path.basename(directory)
+                                    for directory in dir_list])),
+            "Directory was not created:" + stderr)
+
+    def test_mkdir_over_arg_max(self):
+        """
+        Test if directories are created when directory list does not fit
+        to argument limit - list is split to more mkdir commands (limit is
+        lowered to 20 directories, so the test does not depend on ARG_MAX
+        and size of storage)
+        Expectation: all directories created by 4 commands, status of every
+        directory is reported
+        """
+        name_length = 250
+        count = 61
+        dir_list = [os.path.join(self.DEFAULT_FOLDER_PATH,
+                                 str(idx).rjust(name_length, 'a'))
+                    for idx in range(count)]
+        os.mkdir(dir_list[-1])
+        reserve = MkDir.ARGUMENT_RESERVE
+        MkDir.ARGUMENT_RESERVE += MkDir.argument_limit() - 20 * (
+            len(os.fsencode(dir_list[0])) + 1 + MkDir.POINTER_SIZE)
+        invocations = MkDir.INVOCATIONS
+        try:
+            (exit_code, _, stderr, statuses) = MkDir().run_bulk(dir_list)
+        finally:
+            MkDir.ARGUMENT_RESERVE = reserve
+
+        self.assertEqual(4, MkDir.INVOCATIONS - invocations,
+                         "Directory list was not split by argument limit")
+        self.assertEqual(1, exit_code,
+                         "Exit code did not raise for existing folder:" +
+                         stderr)
+        self.assertEqual([True] * (count - 1) + [False], statuses,
+                         "Status of directories is not valid:" + stderr)
+        self.assertEqual(
+            [], verify_tree(self.DEFAULT_FOLDER_PATH, expect_all(
+                [os.path.basename(directory) for directory in dir_list])),
+            "Directory was not created:" + stderr)
+
+    def test_mkdir_structured_result(self):
+        """
+        Test if result of every directory is reported when more directories
+        are created in one command (some of them fail)
+        Expectation: failed directories reported with errno, created ones
+        with mode and verbose line
+        """
+        existing = os.path.join(self.DEFAULT_FOLDER_PATH, "existing")
+        missing = os.path.join(self.DEFAULT_FOLDER_PATH, "missing", "test")
+        created = os.path.join(self.DEFAULT_FOLDER_PATH, "test's")
+        os.mkdir(existing)
+        mkdir_result = MkDir.run(
+            [existing, missing, created],
+            [MkDir.Arguments(MkDir.ArgumentsName.VERBOSE)],
+            structured=True)
+
+        self.assertEqual(1, mkdir_result.exit_code,
+                         "Exit code did not raise for folder creation:" +
+                         mkdir_result.stderr)
+        self.assertEqual(
+            [("failed", errno.EEXIST), ("failed", errno.ENOENT),
+             ("created", None)],
+            [(d.state, d.errno) for d in mkdir_result.directories],
+            "Results of directories are not valid:" + mkdir_result.stderr)
+        self.assertEqual(os.stat(created).st_mode,
+                         mkdir_result.directories[2].mode,
+                         "Mode of created directory is not valid")
+        self.assertIsNotNone(mkdir_result.directories[2].verbose,
+                             "Verbose line was not found:" +
+                             mkdir_result.stdout)
+
+    def test_mkdir_result_other_error(self):
+        """
+        Test if result of directories is valid when mkdir fails without
+        "cannot create directory" message (e.g. chmod of created directory
+        fails)
+        Expectation: existing directory is not failed, missing one is
+        failed without errno
+        """
+        created = os.path.join(self.DEFAULT_FOLDER_PATH, "created")
+        missing = os.path.join(self.DEFAULT_FOLDER_PATH, "missing")
+        os.mkdir(created)
+        mkdir_result = result.parse(
+            MkDir.COMMAND, [created, missing], 1, "",
+            "mkdir: cannot set permissions of %s: Operation not "
+            "permitted\n" % quote(created))
+
+        self.assertEqual(
+            [("created", None), ("failed", None)],
+            [(d.state, d.errno) for d in mkdir_result.directories],
+            "Results of directories are not valid:" + mkdir_result.stderr)
+        self.assertEqual(os.stat(created).st_mode,
+                         mkdir_result.directories[0].mode,
+                         "Mode of created directory is not valid")
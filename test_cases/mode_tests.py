@@ -0,0 +1,97 @@
+"""
+Permission mode matrix testing
+
+Instead of one test per mode, whole space of -m/--mode values is generated
+(all octal modes and combinations of symbolic clauses) and expected mode of
+every directory is computed by oracle (helper.mode_matrix). Modes run in
+batches in one sandbox, every batch is one subTest and its mismatches are
+reported as a table.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+import stat
+import threading
+
+from test_cases.base_test import BaseTest
+from helper.mode import get_umask
+from helper.mode_matrix import format_table, mismatches, octal_modes, \
+    run_matrix, symbolic_clauses, symbolic_combinations
+
+
+class ModeMatrixTest(BaseTest):
+    BATCH_SIZE = 1024
+
+    def check_matrix(self, mode_strings, umask=None):
+        """
+        Helper function - run modes in batches, one subTest per batch
+        """
+        for start in range(0, len(mode_strings), self.BATCH_SIZE):
+            batch = mode_strings[start:start + self.BATCH_SIZE]
+            with self.subTest(umask=umask, first=batch[0], last=batch[-1]):
+                root = os.path.join(self.DEFAULT_FOLDER_PATH, "%s_%d" % (
+                    "current" if umask is None else "%03o" % umask, start))
+                os.mkdir(root)
+                failed = mismatches(run_matrix(root, batch, umask))
+                self.assertEqual([], failed, "\n" + format_table(failed))
+
+    def test_octal_modes(self):
+        """
+        All octal modes 000 - 777 and 0000 - 7777
+        Expectation: directory created exactly with given mode
+        """
+        self.check_matrix(octal_modes())
+
+    def test_symbolic_modes(self):
+        """
+        Symbolic clauses (e.g. g-x, +t) with different umask - clauses
+        without "who" are affected by umask
+        Expectation: directory created with mode computed by oracle,
+        invalid modes are refused
+        """
+        for umask in (0o022, 0o077, 0o000):
+            self.check_matrix(symbolic_clauses(), umask)
+
+    def test_symbolic_combinations(self):
+        """
+        Combinations of clauses (e.g. u+rwx,g-x,o=)
+        Expectation: directory created with mode computed by oracle
+        """
+        self.check_matrix(symbolic_combinations())
+
+    def test_invalid_modes(self):
+        """
+        Modes that are not valid (e.g. "r" has no operator)
+        Expectation: mkdir fails and directory is not created
+        """
+        self.check_matrix(["r", "", "u+z", "a+r,", "8", "17777", "u=1",
+                           "+rw x"])
+
+    def test_get_umask(self):
+        """
+        Read umask while other thread creates directories
+        Expectation: umask is read without change, every directory gets
+        mode given by umask
+        """
+        self.addCleanup(os.umask, os.umask(0o027))
+        self.assertEqual(0o027, get_umask())
+        stop = threading.Event()
+
+        def read_umask():
+            while not stop.is_set():
+                get_umask()
+
+        reader = threading.Thread(target=read_umask)
+        reader.start()
+        try:
+            paths = [os.path.join(self.DEFAULT_FOLDER_PATH, str(index))
+                     for index in range(1000)]
+            for path in paths:
+                os.mkdir(path)
+        finally:
+            stop.set()
+            reader.join()
+        self.assertEqual([], [path for path in paths if stat.S_IMODE(
+            os.stat(path).st_mode) != 0o750])
+        self.assertEqual(0o027, os.umask(0o027))
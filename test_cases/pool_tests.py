@@ -0,0 +1,117 @@
+"""
+Persistent pool of mkdir launcher processes
+
+Pool shall survive a worker that dies (its batch fails, other batches
+succeed, the worker is started again), forked processes shall not use
+pool of their parent and workers shall execute the selected backend.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import multiprocessing
+import os
+
+from test_cases.base_test import BaseTest
+from helper.backends import DifferentialBackend, SpawnBackend
+from helper.mkdir import MkDir
+from helper.pool import MkDirPool
+
+
+class DyingBackend(SpawnBackend):
+    """
+    Backend that kills its worker when directory name is "die"
+    """
+    def execute(self, command):
+        if os.path.basename(command[-1]) == "die":
+            os._exit(3)
+        return super(DyingBackend, self).execute(command)
+
+
+class PidBackend(object):
+    """
+    Backend that returns pid of the process that executed command
+    """
+    def execute(self, command):
+        return (0, str(os.getpid()), "")
+
+
+def _run_many_in_child(directory, queue):
+    results = MkDir.run_many([([directory], [])])
+    queue.put((results[0][0], MkDir.POOL.pid == os.getpid()))
+
+
+class PoolTest(BaseTest):
+    def test_worker_died(self):
+        """
+        Execute batches in pool with 2 workers, one worker dies in the
+        middle of its batch
+        Expectation: all commands of that batch fail (their results are
+        lost), the other batch succeeds, the next batches run in restarted
+        worker
+        """
+        commands = [[MkDir.COMMAND, os.path.join(self.DEFAULT_FOLDER_PATH,
+                                                  name)]
+                    for name in ("a", "die", "b", "c", "d", "c")]
+        with MkDirPool(2, DyingBackend()) as pool:
+            results = pool.execute_many(commands[:4])
+            self.assertEqual([1, 1, 0, 0], [result[0] for result in results])
+            self.assertIn("exited with 3", results[1][2])
+
+            results = pool.execute_many(commands[4:])
+            self.assertEqual([0, 1], [result[0] for result in results])
+        self.assertEqual(["a", "b", "c", "d"],
+                         sorted(os.listdir(self.DEFAULT_FOLDER_PATH)))
+
+    def test_fork(self):
+        """
+        Use MkDir.run_many in parent, in forked child and in parent again
+        Expectation: child creates its own pool, pool of parent still works
+        """
+        if getattr(MkDir.BACKEND, "STATEFUL", False):
+            self.skipTest("Stateful backend can not run in pool")
+        MkDir.run_many([([os.path.join(self.DEFAULT_FOLDER_PATH, "1")], [])])
+        pool = MkDir.POOL
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        process = context.Process(target=_run_many_in_child, args=(
+            os.path.join(self.DEFAULT_FOLDER_PATH, "2"), queue))
+        process.start()
+        self.assertEqual((0, True), queue.get(timeout=60))
+        process.join()
+        self.assertEqual(0, process.exitcode)
+
+        results = MkDir.run_many([
+            ([os.path.join(self.DEFAULT_FOLDER_PATH, "3")], [])])
+        self.assertEqual(0, results[0][0])
+        self.assertIs(pool, MkDir.POOL)
+        self.assertEqual(["1", "2", "3"],
+                         sorted(os.listdir(self.DEFAULT_FOLDER_PATH)))
+
+    def test_backend(self):
+        """
+        Use MkDir.run_many with explicit backend, with MkDir.BACKEND and
+        with stateful backend
+        Expectation: commands are executed by the backend in pool workers,
+        pool is created again for other backend, DifferentialBackend is
+        rejected
+        """
+        invocations = [([str(index)], []) for index in range(4)]
+        backend = PidBackend()
+        results = MkDir.run_many(invocations, backend)
+        self.assertEqual([0] * 4, [result[0] for result in results])
+        self.assertNotIn(str(os.getpid()), [result[1] for result in results])
+        pool = MkDir.POOL
+        self.assertIs(pool, MkDir.pool(backend))
+
+        default_backend = MkDir.BACKEND
+        MkDir.BACKEND = PidBackend()
+        try:
+            results = MkDir.run_many(invocations)
+        finally:
+            MkDir.BACKEND = default_backend
+        self.assertNotIn(str(os.getpid()), [result[1] for result in results])
+        self.assertIsNot(pool, MkDir.POOL)
+        self.assertEqual([], pool.processes)
+
+        self.assertRaises(ValueError, MkDir.run_many, invocations,
+                          DifferentialBackend())
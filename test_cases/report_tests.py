@@ -0,0 +1,120 @@
+"""
+Machine readable reports of test run
+
+Reports are read by CI, so they shall stay parseable whatever the test
+output is - JSON lines, JUnit XML (also with control characters and
+undecodable bytes in details, also written to pipe) and [PASS]/[FAIL]
+lines.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+
+from test_cases.base_test import BaseTest
+from helper.report import JsonLinesReporter, JUnitReporter, \
+    PassFailReporter, TestRecord
+
+DETAILS = "Traceback (most recent call last):\n  ...\n" \
+    "AssertionError: bad \x1b[31mcolor\x00 \udcff <&>"
+
+
+class ReportTest(BaseTest):
+    def records(self):
+        """
+        Helper function - one record of every status
+        """
+        return [TestRecord("test_cases.a.A.test_ok", "ok", 2500000, 3, 0.25,
+                           worker=7, description="Check ok"),
+                TestRecord("test_cases.a.A.test_fail", "FAIL", 1000, 1,
+                           details=DETAILS, cached=True, worker=7),
+                TestRecord("test_cases.a.A.test_error", "ERROR",
+                           details="ValueError: \ufffe", worker=7),
+                TestRecord("test_cases.a.B.test_skip", "skipped",
+                           details="no baseline", worker=7)]
+
+    def write(self, reporter):
+        """
+        Helper function - record all records and close reporter
+        """
+        for test_record in self.records():
+            reporter.record(test_record)
+        reporter.close()
+
+    def test_json_lines(self):
+        """
+        Report records as JSON lines
+        Expectation: one JSON object per record with all fields
+        """
+        path = os.path.join(self.DEFAULT_FOLDER_PATH, "report.jsonl")
+        self.write(JsonLinesReporter(open(path, "w")))
+        with open(path) as source:
+            lines = [json.loads(line) for line in source]
+        self.assertEqual(["ok", "FAIL", "ERROR", "skipped"],
+                         [line["status"] for line in lines])
+        self.assertEqual({"id": "test_cases.a.A.test_ok", "status": "ok",
+                          "duration_ns": 2500000, "mkdir_invocations": 3,
+                          "child_cpu_time": 0.25, "cached": False,
+                          "worker": 7}, lines[0])
+        self.assertTrue(lines[1]["cached"])
+
+    def test_junit(self):
+        """
+        Report records as JUnit XML to file and to pipe, details contain
+        characters that are not allowed in XML
+        Expectation: valid XML with counters, failure, error and skipped
+        elements, invalid characters are replaced
+        """
+        path = os.path.join(self.DEFAULT_FOLDER_PATH, "report.xml")
+        self.write(JUnitReporter(open(path, "w", encoding="utf-8")))
+        with open(path, "rb") as source:
+            from_file = source.read()
+        (read_end, write_end) = os.pipe()
+        self.write(JUnitReporter(open(write_end, "w", encoding="utf-8")))
+        with open(read_end, "rb") as source:
+            from_pipe = source.read()
+
+        for (output, data) in (("file", from_file), ("pipe", from_pipe)):
+            with self.subTest(output=output):
+                suite = ElementTree.fromstring(data)
+                self.assertEqual(
+                    {"tests": "4", "failures": "1", "errors": "1",
+                     "skipped": "1"},
+                    dict((key, suite.get(key)) for key in (
+                        "tests", "failures", "errors", "skipped")))
+                cases = suite.findall("testcase")
+                self.assertEqual(["test_ok", "test_fail", "test_error",
+                                  "test_skip"],
+                                 [case.get("name") for case in cases])
+                self.assertEqual("test_cases.a.A", cases[0].get("classname"))
+                self.assertEqual("0.002500", cases[0].get("time"))
+                failure = cases[1].find("failure")
+                self.assertEqual(
+                    "AssertionError: bad \ufffd[31mcolor\ufffd \ufffd <&>",
+                    failure.get("message"))
+                self.assertEqual(failure.get("message"),
+                                 failure.text.split("\n")[-1])
+                self.assertEqual("ValueError: \ufffd",
+                                 cases[2].find("error").get("message"))
+                self.assertEqual("no baseline",
+                                 cases[3].find("skipped").get("message"))
+
+    def test_pass_fail(self):
+        """
+        Report records as [PASS]/[FAIL] lines
+        Expectation: passed and skipped tests are [PASS] with description,
+        failed tests are [FAIL] with the last line of details
+        """
+        path = os.path.join(self.DEFAULT_FOLDER_PATH, "report.txt")
+        with open(path, "w", errors="backslashreplace") as output:
+            self.write(PassFailReporter(output))
+        with open(path) as source:
+            lines = source.read().splitlines()
+        self.assertEqual(["[PASS] Check ok",
+                          "[FAIL] test_cases.a.A.test_fail, AssertionError: "
+                          "bad \x1b[31mcolor\x00 \\udcff <&>",
+                          "[FAIL] test_cases.a.A.test_error, ValueError: "
+                          "\ufffe",
+                          "[PASS] test_cases.a.B.test_skip"], lines)
@@ -3,84 +3,89 @@ Resource utilization tests are test process aimed to determine the resource
 usage of a software product.
 
 Testing was devided to:
-* CPU
-* MEM
+* CPU - CPU time of mkdir process
+* MEM - memory touched by mkdir process
+* latency - see helper.benchmark
 
 Created on Jun 17, 2021
 @author: Martin Koubek
 """
 
 import os
-import time
-import subprocess
 
 from test_cases.base_test import BaseTest
+from helper import benchmark
 from helper.mkdir import MkDir
 
 
 class ResourceTest(BaseTest):
+    BASELINE_PATH = os.environ.get("MKDIR_BENCHMARK_BASELINE",
+                                   benchmark.BASELINE_PATH)
+    OUTPUT_PATH = os.environ.get("MKDIR_BENCHMARK_OUTPUT")
+    REPETITIONS = 30
+    WARMUP = 5
+    TIME_LIMIT_NS = 50 * 1000 * 1000
 
     def test_in_timelimit(self):
         """
         Test if directory is created in time
-        Expectation: directory created in 0.01 sec
+        Latency of mkdir is measured many times (single dir, multiple dirs,
+        -p deep chain, -m modes - see helper.benchmark) and compared with
+        baseline file MKDIR_BENCHMARK_BASELINE (benchmark_baseline.json in
+        repository root by default, it is created by mkdir_benchmark.py
+        --update-baseline on the tested host)
+        Results are saved to MKDIR_BENCHMARK_OUTPUT (if set)
+        Expectation: no statistically significant slowdown against baseline,
+        without baseline median of every case is under 50 ms
         """
-        start_time = time.time()
-        directory = os.path.join(self.DEFAULT_FOLDER_PATH, "test")
-        MkDir().run([directory])
+        baseline = None
+        if os.path.exists(self.BASELINE_PATH):
+            baseline = benchmark.load(self.BASELINE_PATH)
+        results = benchmark.run_benchmark(self.DEFAULT_FOLDER_PATH,
+                                          repetitions=self.REPETITIONS,
+                                          warmup=self.WARMUP)
+        if self.OUTPUT_PATH:
+            benchmark.save(results, self.OUTPUT_PATH)
 
-        self.assertLessEqual(time.time() - start_time, 0.01,
-                             "Directory creation takes too much time")
+        if baseline is None:
+            self.assertEqual([], benchmark.over_limit(results,
+                                                      self.TIME_LIMIT_NS),
+                             "Directory creation takes too much time "
+                             "(median in ns, no baseline %s)" %
+                             self.BASELINE_PATH)
+            return
+        comparisons = benchmark.compare(results, baseline)
+        regressions = [c for c in comparisons if c.regressed]
+        self.assertEqual([], regressions,
+                         "Directory creation takes too much time")
 
     def test_cpu_usage(self):
         """
         Test if directory is created without overloading CPU
-        Expectation: directory created and CPU do not change more then 1%
+        CPU time is measured for mkdir process only (user + system time)
+        Expectation: directory created in less then 10 ms of CPU time
         """
-        start_cpu = self.__get_cpu()
         directory = os.path.join(self.DEFAULT_FOLDER_PATH, "test")
-        MkDir().run([directory])
+        (exit_code, _, stderr, usage) = MkDir().run([directory], usage=True)
 
-        self.assertLessEqual(abs(self.__get_cpu() - start_cpu), 1,
-                             "Directory creation takes too much CPU")
+        self.assertEqual(0, exit_code,
+                         "Exit code raise for folder creation:" + stderr)
+        self.assertLessEqual(usage.cpu_time, 0.01,
+                             "Directory creation takes too much CPU:" +
+                             repr(usage))
 
     def test_mem_usage(self):
         """
         Test if directory is created without eating memory
-        Expectation: directory created and memory does not rise more then 10kB
+        Memory is measured for mkdir process only (pages touched by mkdir,
+        maximal resident set includes also memory of this process)
+        Expectation: directory created and mkdir touches less then 8 MB
         """
-        start_mem = self.__get_mem()
         directory = os.path.join(self.DEFAULT_FOLDER_PATH, "test")
-        MkDir().run([directory])
-
-        self.assertLessEqual(abs(self.__get_mem() - start_mem), 10,
-                             "Directory creation takes too much MEM")
-
-    def __get_cpu(self):
-        """
-        Helper function to get CPU
-        """
-        return float(self.__call_command(
-            r"grep 'cpu ' /proc/stat | awk '{usage=($2+$4)*100/($2+$4+$5)} "
-            "END {print usage}'")
-        )
+        (exit_code, _, stderr, usage) = MkDir().run([directory], usage=True)
 
-    def __get_mem(self):
-        """
-        Helper function to get memory size
-        """
-        return int(self.__call_command(
-            r"free -m | grep 'Mem' |awk '{print $3}'"))
-
-    def __call_command(self, command):
-        """
-        Helper function to call a command
-        Using SHEL=True used for more complex command. Definetly "shall"
-        could be set to False to avoid  complexity and overhead.
-        In this example, shell=True was used for simplicity
-        """
-        proc = subprocess.run(command,
-                              stdout=subprocess.PIPE,
-                              stderr=subprocess.PIPE,
-                              shell=True)
-        return  proc.stdout.decode().strip()
+        self.assertEqual(0, exit_code,
+                         "Exit code raise for folder creation:" + stderr)
+        self.assertLessEqual(usage.memory_touched, 8 * 1024 * 1024,
+                             "Directory creation takes too much MEM:" +
+                             repr(usage))
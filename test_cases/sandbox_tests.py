@@ -0,0 +1,105 @@
+"""
+Sandbox allocation
+
+Run folders are unique for every process (also for processes started at
+once), run folders of crashed runs are reclaimed and run folders of
+running processes are kept.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import time
+
+from test_cases.base_test import BaseTest
+from helper.sandbox import GRACE_PERIOD, LEASE, SandboxAllocator, \
+    process_start_time
+from helper.storage import mount
+
+
+def _allocate(base, queue):
+    allocator = SandboxAllocator(base)
+    queue.put(allocator.run_root())
+    allocator.release()
+
+
+class SandboxTest(BaseTest):
+    def write_lease(self, path, pid, host=None):
+        """
+        Helper function - run folder with lease
+        """
+        os.mkdir(path)
+        with open(os.path.join(path, LEASE), "w") as output:
+            json.dump({"host": host or socket.gethostname(), "pid": pid,
+                       "start_time": process_start_time(pid) or 1}, output)
+
+    def test_unique(self):
+        """
+        Allocate run folders in many processes at once
+        Expectation: every process has its own run folder, test paths are
+        unique, lease identifies the process
+        """
+        base = self.DEFAULT_FOLDER_PATH
+        allocator = SandboxAllocator(base)
+        paths = [allocator.test_path("test") for _ in range(3)]
+        self.assertEqual(3, len(set(paths)))
+        self.assertTrue(all(os.path.dirname(path) == allocator.run_root()
+                            for path in paths))
+        with open(os.path.join(allocator.run_root(), LEASE)) as source:
+            self.assertEqual(os.getpid(), json.load(source)["pid"])
+
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        processes = [context.Process(target=_allocate, args=(base, queue))
+                     for _ in range(8)]
+        for process in processes:
+            process.start()
+        roots = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        self.assertEqual(8, len(set(roots)))
+        self.assertNotIn(allocator.run_root(), roots)
+        allocator.release()
+        self.assertEqual([], os.listdir(base))
+
+    def test_reclaim(self):
+        """
+        Run folders of dead process (with mounted tmpfs when running as
+        root), of running process, of other host, without lease
+        Expectation: only folders of dead process and old folder without
+        lease are reclaimed
+        """
+        base = self.DEFAULT_FOLDER_PATH
+        proc = subprocess.Popen(["true"])
+        proc.wait()
+        dead = os.path.join(base, "mkdir_test_dead")
+        self.write_lease(dead, proc.pid)
+        os.makedirs(os.path.join(dead, "test_1", "a"))
+        if os.geteuid() == 0:
+            mount("tmpfs", os.path.join(dead, "test_1"), "tmpfs", "size=1m")
+        alive = os.path.join(base, "mkdir_test_alive")
+        self.write_lease(alive, os.getppid())
+        other_host = os.path.join(base, "mkdir_test_other")
+        self.write_lease(other_host, proc.pid, "other.host")
+        old = os.path.join(base, "mkdir_test_old")
+        os.mkdir(old)
+        os.utime(old, (time.time() - GRACE_PERIOD - 1,) * 2)
+        new = os.path.join(base, "mkdir_test_new")
+        os.mkdir(new)
+        foreign = os.path.join(base, "foreign")
+        os.mkdir(foreign)
+
+        allocator = SandboxAllocator(base)
+        allocator.run_root()
+        self.assertEqual(sorted([dead, old]), sorted(allocator.reclaimed))
+        self.assertEqual(sorted(["foreign", "mkdir_test_alive",
+                                 "mkdir_test_new", "mkdir_test_other",
+                                 os.path.basename(allocator.run_root())]),
+                         sorted(os.listdir(base)))
+        with open("/proc/self/mountinfo") as mountinfo:
+            self.assertNotIn(dead, mountinfo.read())
+        allocator.release()
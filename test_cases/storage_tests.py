@@ -0,0 +1,50 @@
+"""
+Storage of test sandbox
+
+Filesystem image of LoopStorage is mounted once per process, every setup
+shall still give an empty sandbox folder on that filesystem and cleanup
+shall remove content of the test from it.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+
+from test_cases.base_test import BaseTest
+from helper.cache import filesystem_type
+from helper.sandbox import mount_points
+from helper.storage import LoopStorage
+
+
+class StorageTest(BaseTest):
+    def test_loop_shared(self):
+        """
+        Setup and cleanup of three sandbox folders by shared ext4 storage
+        Expectation: one loop mount for all of them, every sandbox is empty
+        ext4 folder, content of finished sandbox is removed, release
+        unmounts the filesystem and removes its image
+        """
+        if os.geteuid() != 0:
+            self.skipTest("Mount requires root")
+        if not LoopStorage.is_available("ext4"):
+            self.skipTest("mkfs.ext4 is not installed")
+        storage = LoopStorage("ext4")
+        self.addCleanup(storage.release)
+        paths = [os.path.join(self.DEFAULT_FOLDER_PATH, "test_%d" % index)
+                 for index in range(3)]
+        for path in paths:
+            with self.subTest(path=os.path.basename(path)):
+                storage.setup(path)
+                self.assertEqual([], os.listdir(path))
+                self.assertEqual("ext4", filesystem_type(path))
+                os.makedirs(os.path.join(path, "a", "b"))
+                storage.cleanup(path)
+                self.assertFalse(os.path.exists(path))
+                self.assertEqual([], os.listdir(storage.mount_point))
+
+        self.assertEqual([storage.mount_point],
+                         mount_points(self.DEFAULT_FOLDER_PATH))
+        storage.release()
+        self.assertEqual([], mount_points(self.DEFAULT_FOLDER_PATH))
+        self.assertEqual([], [name for name in os.listdir(
+            self.DEFAULT_FOLDER_PATH) if not name.endswith(".pristine.img")])
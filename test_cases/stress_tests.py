@@ -0,0 +1,62 @@
+"""
+Concurrency stress testing
+
+Many workers run mkdir -p at once on overlapping parent chains of shared
+tree (see helper.stress). Races on parents (EEXIST of directory created by
+other worker) shall not make any call fail and -m shall be applied to
+every leaf no matter which worker created it.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+
+from test_cases.base_test import BaseTest
+from helper.stress import run_stress, sweep
+
+
+class StressTest(BaseTest):
+    def check(self, stress_result):
+        """
+        Helper function - no failed call, tree as expected, percentiles
+        are ordered
+        """
+        self.assertEqual([], stress_result.failures, stress_result)
+        self.assertEqual([], stress_result.mismatches, stress_result)
+        self.assertLessEqual(stress_result.percentile(50),
+                             stress_result.percentile(99))
+        self.assertLessEqual(stress_result.percentile(99),
+                             stress_result.percentile(100))
+        self.assertGreater(stress_result.throughput(), 0)
+
+    def test_threads(self):
+        """
+        1 .. 64 threads with mkdir -p on shared tree
+        Expectation: every call succeeds, tree contains all used chains
+        """
+        for stress_result in sweep(self.DEFAULT_FOLDER_PATH, (1, 8, 64)):
+            with self.subTest(workers=stress_result.workers):
+                self.check(stress_result)
+                self.assertEqual(stress_result.workers * 4,
+                                 stress_result.calls)
+
+    def test_processes(self):
+        """
+        32 forked processes with mkdir -p on shared tree
+        Expectation: every call succeeds, tree contains all used chains
+        """
+        self.check(run_stress(self.DEFAULT_FOLDER_PATH, 32, processes=True))
+
+    def test_mode(self):
+        """
+        32 threads with mkdir -p -m on shared tree (leaves are created by
+        several workers)
+        Expectation: every call succeeds, leaves have mode of -m, parents
+        have default mode
+        """
+        for (index, mode) in enumerate(("700", "u=rwx,g=rx,o=", "1750")):
+            with self.subTest(mode=mode):
+                root = os.path.join(self.DEFAULT_FOLDER_PATH, "m%d" % index)
+                os.mkdir(root)
+                self.check(run_stress(root, 32, calls=8, mode=mode,
+                                      fanout=2, depth=3))
@@ -0,0 +1,107 @@
+"""
+Tracing of mkdir calls
+
+Tracer keeps the last calls in ring buffer and every call shall get its
+own phases also when MkDir.run is called from more threads at once.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+import threading
+
+from test_cases.base_test import BaseTest
+from helper.backends import SubprocessBackend
+from helper.mkdir import MkDir
+from helper import trace
+from helper.trace import CallRecord, Tracer
+
+
+class MarkingBackend(object):
+    """
+    Backend that waits until all threads are in MkDir.run and stores
+    number of directory + 1 as spawn phase of the traced call
+    """
+    def __init__(self, threads):
+        self.barrier = threading.Barrier(threads, timeout=60)
+
+    def execute(self, command):
+        self.barrier.wait()
+        call = trace.current()
+        if call is not None:
+            call.spawn_ns = int(os.path.basename(command[-1])) + 1
+        return (0, "", "")
+
+
+class TraceTest(BaseTest):
+    def test_ring_buffer(self):
+        """
+        Add more calls than capacity of ring buffer
+        Expectation: the last calls are kept from the oldest one, calls
+        since start of test are limited by capacity
+        """
+        tracer = Tracer(capacity=3)
+        records = [CallRecord("test_%d" % index) for index in range(5)]
+        tracer.extend(records[:2])
+        self.assertEqual(records[:2], tracer.calls())
+        position = tracer.start_test("test")
+        tracer.extend(records[2:])
+        self.assertEqual(records[2:], tracer.calls())
+        self.assertEqual(records[2:], tracer.calls_since(position))
+        self.assertEqual(records[4:], tracer.calls_since(4))
+        self.assertEqual([], tracer.calls_since(5))
+        tracer.add(records[0])
+        self.assertEqual(records[3:] + records[:1], tracer.calls())
+
+    def test_report(self):
+        """
+        Trace calls of two tests
+        Expectation: every call is recorded with its test, exit code and
+        phases, report lists tests and calls
+        """
+        with Tracer() as tracer:
+            for (index, name) in enumerate(("first", "second")):
+                tracer.start_test(name)
+                MkDir.run([os.path.join(self.DEFAULT_FOLDER_PATH, name)],
+                          backend=SubprocessBackend())
+                MkDir.run([os.path.join(self.DEFAULT_FOLDER_PATH, name)],
+                          backend=SubprocessBackend())
+                tracer.stop_test(name, 10 ** 9 * (index + 1))
+        calls = tracer.calls()
+        self.assertEqual([("first", 0), ("first", 1), ("second", 0),
+                          ("second", 1)],
+                         [(call.test_id, call.exit_code) for call in calls])
+        for call in calls:
+            self.assertGreater(call.total_ns, 0)
+            self.assertGreaterEqual(call.total_ns, call.run_ns)
+        report = tracer.report()
+        self.assertIn("Traced 4 mkdir calls (4 kept)", report)
+        self.assertLess(report.index("second"), report.index("first"))
+
+    def test_threads(self):
+        """
+        Trace MkDir.run called from 16 threads at once, all calls are in
+        progress at the same time (backend waits for all of them)
+        Expectation: every call has its own record - phase set by backend
+        belongs to the command of the record
+        """
+        backend = MarkingBackend(16)
+
+        def worker(index):
+            MkDir.run([os.path.join(self.DEFAULT_FOLDER_PATH, str(index))],
+                      backend=backend)
+
+        with Tracer() as tracer:
+            threads = [threading.Thread(target=worker, args=(index,))
+                       for index in range(16)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        calls = tracer.calls()
+        self.assertEqual(16, len(calls))
+        self.assertEqual(list(range(16)), sorted(
+            int(os.path.basename(call.argv[-1])) for call in calls))
+        for call in calls:
+            self.assertEqual(int(os.path.basename(call.argv[-1])) + 1,
+                             call.spawn_ns, call.argv)
@@ -0,0 +1,175 @@
+"""
+Provisioning of directory trees
+
+MkDir.create_tree is checked with nested and path stream specs, with
+in-process and subprocess backends, in pool of workers, with failed
+subtrees and with continuation from checkpoint of killed run.
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import errno
+import os
+
+from test_cases.base_test import BaseTest
+from helper.backends import SyscallBackend
+from helper.mkdir import MkDir
+from helper.tree import tree_levels
+from helper.verify import Expected, verify_tree
+
+
+class KilledRun(Exception):
+    pass
+
+
+class TreeTest(BaseTest):
+    PATHS = ["tenant_%d/project_%d/dir_%d" % (index % 3, index % 12, index)
+             for index in range(240)]
+
+    def expected_tree(self):
+        """
+        Helper function - every directory of PATHS (with its parents)
+        """
+        return dict((path, Expected())
+                    for level in tree_levels(self.PATHS) for path in level)
+
+    def test_levels(self):
+        """
+        Deduplication of paths
+        Expectation: shared prefixes are listed once, levels are sorted
+        """
+        levels = tree_levels("a/b/c\na/b/d\n\na//b/e/\na/f\n")
+        self.assertEqual([["a"], ["a/b", "a/f"], ["a/b/c", "a/b/d", "a/b/e"]],
+                         levels)
+        self.assertEqual(tree_levels({"a": {"b": {"c": None, "d": {}, "e": 0},
+                                            "f": None}}), levels)
+        self.assertRaises(ValueError, tree_levels, ["../escape"])
+        self.assertRaises(ValueError, tree_levels, ["/absolute"])
+
+    def test_create_tree(self):
+        """
+        Create tree from path stream with every backend, sequentially and
+        in pool of workers
+        Expectation: every directory created once, one invocation per level
+        """
+        for backend in (None, SyscallBackend()):
+            for concurrent in (False, True):
+                if concurrent and getattr(backend or MkDir.BACKEND,
+                                          "STATEFUL", False):
+                    continue
+                with self.subTest(backend=backend, concurrent=concurrent):
+                    root = os.path.join(self.DEFAULT_FOLDER_PATH,
+                                        "%s%s" % (backend is None, concurrent))
+                    os.mkdir(root)
+                    tree_result = MkDir.create_tree(
+                        "\n".join(self.PATHS), root, backend=backend,
+                        concurrent=concurrent)
+                    self.assertEqual(255, tree_result.directories)
+                    self.assertEqual(255, tree_result.created)
+                    self.assertEqual([], tree_result.failed)
+                    self.assertGreater(tree_result.dirs_per_second(), 0)
+                    if not concurrent:
+                        self.assertEqual(3, tree_result.invocations)
+                    self.assertEqual([], verify_tree(
+                        root, self.expected_tree(), exact=True))
+
+    def test_existing_and_failed(self):
+        """
+        Create tree over existing directory and file in the way
+        Expectation: existing directories are counted, file in the way and
+        failed directory are reported and their subtrees are skipped
+        """
+        root = self.DEFAULT_FOLDER_PATH
+        os.makedirs(os.path.join(root, "tenant_0", "project_0"))
+        os.mkdir(os.path.join(root, "tenant_1"))
+        open(os.path.join(root, "tenant_1", "project_1"), "w").close()
+        os.mkdir(os.path.join(root, "tenant_2"), 0o500)
+        tree_result = MkDir.create_tree(
+            {"tenant_0": {"project_0": None},
+             "tenant_1": {"project_1": {"dir": None}},
+             "tenant_2": {"project_2": {"dir": {"deep": None}}}},
+            root, [MkDir.Arguments(MkDir.ArgumentsName.MODE, "700")])
+        self.assertEqual(4, tree_result.existed)
+        self.assertIn(("tenant_1/project_1", errno.ENOTDIR),
+                      tree_result.failed)
+        if os.geteuid() != 0:
+            self.assertIn(("tenant_2/project_2", errno.EACCES),
+                          tree_result.failed)
+            self.assertEqual(3, tree_result.skipped)
+        else:
+            self.assertEqual(1, tree_result.skipped)
+        self.assertEqual(tree_result.directories, tree_result.done())
+
+    def test_checkpoint(self):
+        """
+        Kill tree provisioning after some rounds and run it again
+        Expectation: the second run continues from checkpoint, the third
+        run does nothing
+        """
+        root = self.DEFAULT_FOLDER_PATH
+        checkpoint = os.path.join(root, "tree.checkpoint")
+        os.mkdir(os.path.join(root, "tree"))
+        rounds = []
+
+        def kill(tree_result):
+            rounds.append(tree_result.done())
+            if len(rounds) == 3:
+                raise KilledRun()
+
+        round_size = MkDir.TREE_ROUND
+        MkDir.TREE_ROUND = 100
+        try:
+            with self.assertRaises(KilledRun):
+                MkDir.create_tree(self.PATHS, os.path.join(root, "tree"),
+                                  checkpoint=checkpoint, progress=kill)
+            tree_result = MkDir.create_tree(
+                self.PATHS, os.path.join(root, "tree"), checkpoint=checkpoint)
+            self.assertEqual(rounds[-1], tree_result.resumed)
+            self.assertEqual(255 - rounds[-1], tree_result.created)
+            self.assertEqual(0, tree_result.existed)
+
+            tree_result = MkDir.create_tree(
+                self.PATHS, os.path.join(root, "tree"), checkpoint=checkpoint)
+            self.assertEqual(255, tree_result.resumed)
+            self.assertEqual(0, tree_result.invocations)
+        finally:
+            MkDir.TREE_ROUND = round_size
+        self.assertEqual([], verify_tree(os.path.join(root, "tree"),
+                                         self.expected_tree(), exact=True))
+
+    def test_checkpoint_failed(self):
+        """
+        Kill tree provisioning with file in the way after some rounds and
+        run it again
+        Expectation: the second run reports failure and skipped subtree of
+        the first run too, every directory is counted once
+        """
+        root = self.DEFAULT_FOLDER_PATH
+        checkpoint = os.path.join(root, "tree.checkpoint")
+        os.makedirs(os.path.join(root, "tree", "tenant_0"))
+        open(os.path.join(root, "tree", "tenant_0", "project_0"),
+             "w").close()
+        rounds = []
+
+        def kill(tree_result):
+            rounds.append(tree_result.done())
+            if len(rounds) == 3:
+                raise KilledRun()
+
+        round_size = MkDir.TREE_ROUND
+        MkDir.TREE_ROUND = 100
+        try:
+            with self.assertRaises(KilledRun):
+                MkDir.create_tree(self.PATHS, os.path.join(root, "tree"),
+                                  checkpoint=checkpoint, progress=kill)
+            tree_result = MkDir.create_tree(
+                self.PATHS, os.path.join(root, "tree"), checkpoint=checkpoint)
+        finally:
+            MkDir.TREE_ROUND = round_size
+        self.assertEqual([("tenant_0/project_0", errno.ENOTDIR)],
+                         tree_result.failed)
+        self.assertEqual(20, tree_result.skipped)
+        self.assertEqual(255, tree_result.done())
+        self.assertGreater(tree_result.resumed, 0)
+        self.assertEqual(255 - 1 - 20, tree_result.resumed +
+                         tree_result.created + tree_result.existed)
@@ -0,0 +1,66 @@
+"""
+Verification of directory tree
+
+helper.verify is used by other tests as post-condition check, so it shall
+report every difference - also expected entries under a component that is
+not a directory (they can not exist, scandir never reaches them).
+
+Created on Jun 17, 2021
+@author: Martin Koubek
+"""
+import os
+
+from test_cases.base_test import BaseTest
+from helper.verify import ABSENT, DIRECTORY, FILE, SYMLINK, Expected, \
+    verify_tree
+
+
+class VerifyTest(BaseTest):
+    def summary(self, spec):
+        """
+        Helper function - (path, kind, expected, actual) of mismatches
+        """
+        return [(mismatch.path, mismatch.kind, mismatch.expected,
+                 mismatch.actual)
+                for mismatch in verify_tree(self.DEFAULT_FOLDER_PATH, spec)]
+
+    def test_tree(self):
+        """
+        Verify tree with expected entries, wrong type, wrong mode and
+        missing entry
+        Expectation: every difference is reported once
+        """
+        os.makedirs(os.path.join(self.DEFAULT_FOLDER_PATH, "a", "b"))
+        os.mkdir(os.path.join(self.DEFAULT_FOLDER_PATH, "m"), 0o700)
+        os.chmod(os.path.join(self.DEFAULT_FOLDER_PATH, "m"), 0o700)
+        open(os.path.join(self.DEFAULT_FOLDER_PATH, "f"), "w").close()
+        self.assertEqual([], self.summary({"a/b": Expected(),
+                                           "m": Expected(mode=0o700),
+                                           "f": Expected(FILE),
+                                           "x": Expected(ABSENT)}))
+        self.assertEqual(
+            sorted([("a/c", "missing", None, None),
+                    ("f", "type", DIRECTORY, FILE),
+                    ("m", "mode", "0o755", "0o700")]),
+            sorted(self.summary({"a/c": Expected(), "f": Expected(),
+                                 "m": Expected(mode=0o755)})))
+
+    def test_blocked_chain(self):
+        """
+        Verify expected directories under regular file and symlink
+        Expectation: component that is not a directory is reported as type
+        mismatch (once), absent entries under it are as expected
+        """
+        open(os.path.join(self.DEFAULT_FOLDER_PATH, "a"), "w").close()
+        os.mkdir(os.path.join(self.DEFAULT_FOLDER_PATH, "target"))
+        os.symlink("target", os.path.join(self.DEFAULT_FOLDER_PATH, "l"))
+        for (spec, expected) in (
+                ({"a/b": Expected()}, [("a", "type", DIRECTORY, FILE)]),
+                ({"a/b/c": Expected(), "a/d": Expected()},
+                 [("a", "type", DIRECTORY, FILE)]),
+                ({"a": Expected(), "a/b": Expected()},
+                 [("a", "type", DIRECTORY, FILE)]),
+                ({"l/x": Expected()}, [("l", "type", DIRECTORY, SYMLINK)]),
+                ({"a/b": Expected(ABSENT)}, [])):
+            with self.subTest(spec=sorted(spec)):
+                self.assertEqual(expected, self.summary(spec))